@@ -8,13 +8,13 @@ warnings.filterwarnings(action='ignore', module='scipy', message='^internal gels
 
 import numpy as np
 from matplotlib import pyplot as plt
-import scipy.special
 from sklearn.externals.joblib import Parallel, delayed
 from sklearn.linear_model import LinearRegression
 from sklearn.metrics import r2_score
 
 from learning.piano.score import ScoreObject
 from learning.piano.algorithm.base import iter_notes_with_offset
+from learning.piano.smoothing import gaussian_filter
 
 
 USE_PITCH = True
@@ -50,19 +50,6 @@ def extract_onset(in_notes, out_notes, offset):
     return in_count, offset, out_count
 
 
-def gaussian_pdf(x, sigma):
-    return np.exp(-0.5 * (x/sigma)**2) / np.sqrt(2 * np.pi) / sigma
-
-
-def gaussian_cdf(x, sigma):
-    return 0.5 * (1 + scipy.special.erf(x / sigma / np.sqrt(2)))
-
-
-def gaussian(x1, x2, sigma):
-    return gaussian_cdf(x2, sigma) - gaussian_cdf(x1, sigma)
-    # return 0.5 * (gaussian_pdf(x1, sigma) + gaussian_pdf(x2, sigma)) * (x2-x1)
-
-
 def window_at(seq, offsets, durations, index, radius):
     '''Get the continuous window centred at the start of seq[i].'''
     centre = offsets[index]
@@ -81,14 +68,6 @@ def window_at(seq, offsets, durations, index, radius):
     return result
 
 
-def gaussian_filter(seq, offsets, durations, *, sigma):
-    result = np.empty_like(seq)
-    for i in range(len(seq)):
-        win = window_at(seq, offsets, durations, i, BLUR_SIZE * sigma)
-        result[i] = sum(x * gaussian(l, r, sigma) for x, (l, r) in win)
-    return result
-
-
 def median_filter(seq, offsets, durations, *, radius):
     result = np.empty_like(seq)
     for i in range(len(seq)):
@@ -119,7 +98,7 @@ def seq2basis(data):
         out_count /= durations
 
     # Decompose in_count into base * detail
-    base = gaussian_filter(in_count, offsets, durations, sigma=BLUR_RADIUS)
+    base = gaussian_filter(in_count, offsets, durations, sigma=BLUR_RADIUS, size=BLUR_SIZE)
     assert np.all(base != 0) and np.all(~np.isnan(base))
     base += 0.01  # Smoothing term
     detail = in_count / base
@@ -0,0 +1,137 @@
+'''
+Compares windowed CRF inference to inference on the whole score, in time and
+in the labels predicted, on the sample scores.
+
+Usage: python experiments/6_windowed_crf/main.py [--synthetic] [model file]
+
+The pairwise CRF system is trained on the samples unless a model file is
+given, and runs AD3 inference. With --synthetic, or if PyStruct is not
+installed, the note graphs of the pairwise CRF system get random submodular
+potentials instead, solved by min-cut, so that only the windowing is
+measured.
+'''
+import os
+import sys
+sys.path.insert(0, os.getcwd())
+
+import functools
+import time
+
+import numpy as np
+from tabulate import tabulate
+
+from learning.models.bar_windows import windowed_inference
+from learning.models.mincut import inference_mincut
+from learning.piano import alignment, contraction, structure
+from learning.piano.dataset import DEFAULT_SAMPLES
+from learning.piano.pre_processor import StructuralPreProcessor
+
+
+# (window_bars, context_bars); None is the whole score
+SETTINGS = [(None, 0), (4, 0), (4, 2), (8, 2), (16, 2), (16, 4)]
+WINDOW_JOBS = 1
+
+
+def predict_crf(system, entries, window_bars, context_bars):
+    crf = system.model.model
+    crf.window_bars, crf.context_bars = window_bars, context_bars
+    crf.window_jobs = WINDOW_JOBS
+
+    labels, times = [], []
+    for entry in entries:
+        start = time.time()
+        y_proba = system.model.predict_structured(entry.X)
+        times.append(time.time() - start)
+        labels.append(np.argmax(y_proba, axis=1))
+    return labels, times
+
+
+def get_synthetic_potentials(entry, rng):
+    features, E, F = entry.X
+    unary = np.zeros((len(features), 2))
+    unary[:, 1] = rng.randn(len(features))
+    # Reward keeping both notes of an edge, which keeps them submodular
+    pairwise = np.zeros((len(E), 2, 2))
+    pairwise[:, 1, 1] = np.abs(F).sum(axis=1) * rng.rand(len(E))
+    return unary, pairwise, E
+
+
+def predict_synthetic(entries, potentials, window_bars, context_bars):
+    labels, times = [], []
+    for entry, (unary, pairwise, E) in zip(entries, potentials):
+        start = time.time()
+        if window_bars is None:
+            y = inference_mincut(unary, pairwise, E)
+        else:
+            y = windowed_inference(
+                unary, pairwise, E, entry.X.bars, window_bars, context_bars,
+                inference_mincut, n_jobs=WINDOW_JOBS)
+        times.append(time.time() - start)
+        labels.append(y)
+    return labels, times
+
+
+args = sys.argv[1:]
+synthetic = '--synthetic' in args
+args = [a for a in args if a != '--synthetic']
+if synthetic and args:
+    sys.exit('A model file cannot be used with --synthetic')
+if not synthetic:
+    try:
+        from learning.system import PianoReductionSystem
+        from learning.systems import pairwise_crf
+    except ImportError:
+        if args:
+            sys.exit('PyStruct is needed to load a model file')
+        print('PyStruct is not installed, using synthetic potentials')
+        synthetic = True
+
+if synthetic:
+    # The note graphs of the pairwise CRF system, without its features
+    pre_processor = StructuralPreProcessor(
+        algorithms=[],
+        alignment=alignment.AlignMinOctaveMatching(),
+        contractions=[
+            contraction.ContractTies(),
+            contraction.ContractByPitchOnset(),
+            ],
+        structures=[
+            structure.OnsetNotes(),
+            structure.OnsetBadIntervalNotes(),
+            structure.OnsetDurationVaryingNotes(),
+            structure.AdjacentNotes(),
+            ],
+        )
+    entries = pre_processor.process(DEFAULT_SAMPLES, n_jobs=os.cpu_count())
+    rng = np.random.RandomState(0)
+    potentials = [get_synthetic_potentials(entry, rng)
+                  for entry in entries.entries]
+    predict = functools.partial(predict_synthetic, entries.entries, potentials)
+    truth = None
+else:
+    if args:
+        system = PianoReductionSystem.load(args[0])
+    else:
+        system = pairwise_crf.system
+    entries = system.pre_processor.process(
+        DEFAULT_SAMPLES, n_jobs=os.cpu_count())
+    if not args:
+        system.train(entries)
+    predict = functools.partial(predict_crf, system, entries.entries)
+    truth = [y.flatten() for y in entries.y]
+
+names = [os.path.basename(entry.name) for entry in entries.entries]
+whole, whole_times = predict(None, 0)
+
+rows = []
+for window_bars, context_bars in SETTINGS:
+    labels, times = predict(window_bars, context_bars)
+    for k, (name, y, t) in enumerate(zip(names, labels, times)):
+        rows.append((
+            name, window_bars or 'whole', context_bars, len(y), t,
+            whole_times[k] / t, np.mean(y == whole[k]),
+            np.mean(y == truth[k]) if truth else None))
+
+print(tabulate(rows, headers=(
+    'Score', 'Window bars', 'Context bars', 'Nodes', 'Time (s)', 'Speedup',
+    'Agreement with whole', 'Accuracy')))
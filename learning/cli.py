@@ -5,6 +5,7 @@ import sys
 import time
 import numpy as np
 from tabulate import tabulate
+from .piano.feature_store import get_default_store
 from .piano.post_processor import PostProcessor
 from .metrics import ModelMetrics, ScoreMetrics
 from .system import PianoReductionSystem
@@ -24,28 +25,45 @@ def configure_logger():
 class SystemCLI:
     def __init__(self, system):
         self.system = system
+        self.feature_store = None
+        self.feature_jobs = 1
+
+    def load_system(self, args):
+        self.system = PianoReductionSystem.load(
+            args.model or self.system.get_default_save_file())
+        self.configure_pre_processor()
+
+    def configure_pre_processor(self):
+        self.system.pre_processor.feature_store = self.feature_store
+        self.system.pre_processor.feature_jobs = self.feature_jobs
 
     def command_train(self, args):
-        self.system.train(args.sample)
+        self.system.train(args.sample, n_jobs=args.jobs)
         self.system.save(args.output or self.system.get_default_save_file())
 
     def command_reduce(self, args):
         if args.train:
             # Train model in place
-            self.system.train(args.sample)
+            self.system.train(args.sample, n_jobs=args.jobs)
             self.system.save(args.model or self.system.get_default_save_file())
         else:
-            self.system = PianoReductionSystem.load(
-                args.model or self.system.get_default_save_file())
+            self.load_system(args)
 
-        results = []
+        entries = []
         for f in args.file:
             in_path, _, out_path = f.partition(':')
-            entry = self.system.pre_processor.process_path_pair(in_path, out_path)
-            logging.info('Reducing {}'.format(entry.name))
+            entries.append(self.system.pre_processor.process_path_pair(in_path, out_path))
 
-            gen_score, y_proba, y_pred = self.system.reduce(entry)
+        if len(entries) > 1:
+            # Predict all files in one batch
+            logging.info('Reducing {}'.format(', '.join(entry.name for entry in entries)))
+            reductions = self.system.reduce_many(entries)
+        else:
+            logging.info('Reducing {}'.format(entries[0].name))
+            reductions = [self.system.reduce(entries[0])]
 
+        results = []
+        for f, entry, (gen_score, y_proba, y_pred) in zip(args.file, entries, reductions):
             if args.no_output:
                 pass
             elif args.output:
@@ -81,8 +99,7 @@ class SystemCLI:
         self.system.show((in_path, out_path))
 
     def command_info(self, args):
-        self.system = PianoReductionSystem.load(
-            args.model or self.system.get_default_save_file())
+        self.load_system(args)
         self.system.info()
 
     def command_crossval(self, args):
@@ -145,6 +162,11 @@ class SystemCLI:
         logging.info('Time elapsed: {}s'.format(time.time() - start))
 
     def main(self, args):
+        if not args.no_feature_cache:
+            self.feature_store = get_default_store()
+        self.feature_jobs = args.feature_jobs
+        self.configure_pre_processor()
+
         if args.command == 'train':
             self.command_train(args)
         elif args.command == 'reduce':
@@ -167,6 +189,15 @@ class SystemCLI:
                             help='A sample file pair, separated by a colon (:). '
                                  'If unspecified, the default set of samples will '
                                  'be used.')
+        parser.add_argument('--jobs', '-j', type=int, default=1,
+                            help='Number of worker processes used to '
+                                 'pre-process the sample files.')
+        parser.add_argument('--feature-jobs', type=int, default=1,
+                            help='Number of feature algorithms to run '
+                                 'concurrently on each score.')
+        parser.add_argument('--no-feature-cache', action='store_true',
+                            help='Always recompute the features instead of '
+                                 'loading them from the feature cache.')
         subparsers = parser.add_subparsers(dest='command', help='Command')
         subparsers.required = True
 
@@ -18,6 +18,23 @@ DATA_DIR = os.path.join(PROJECT_ROOT, "data")
 # temporary folder directory
 TEMP_DIR = os.path.join(PROJECT_ROOT, "temp")
 
+# preprocessed score cache directory
+SCORE_CACHE_DIR = os.path.join(PROJECT_ROOT, "cache", "scores")
+# maximum size of the score cache in bytes; set to 0 to disable the cache
+SCORE_CACHE_SIZE = 1024 ** 3
+
+# feature algorithm output cache directory
+FEATURE_CACHE_DIR = os.path.join(PROJECT_ROOT, "cache", "features")
+# maximum size of the feature cache in bytes; set to 0 to disable the cache
+FEATURE_CACHE_SIZE = 1024 ** 3
+
+# compiled chord flow model used by the tonal analysis
+TONAL_MODEL_PATH = os.path.join(PROJECT_ROOT, "cache", "tonal_model.bin")
+
+# number of worker processes the structured SVM learners use for inference
+# over examples, in training and prediction; -1 uses all CPUs
+CRF_JOBS = 1
+
 if not os.path.exists(LOG_DIR):
     os.mkdir(LOG_DIR)
 
@@ -28,3 +45,7 @@ if __name__ == "__main__":
     print("Tonal analysis directory: ", TONE_DIR)
     print("Flow dataset directory: ", DATA_DIR)
     print("Temporary folder directory: ", TEMP_DIR)
+    print("Score cache directory: ", SCORE_CACHE_DIR)
+    print("Feature cache directory: ", FEATURE_CACHE_DIR)
+    print("Tonal model path: ", TONAL_MODEL_PATH)
+    print("CRF inference jobs: ", CRF_JOBS)
@@ -0,0 +1,13 @@
+import pytest
+from . import config
+
+
+@pytest.fixture(autouse=True)
+def no_default_caches(monkeypatch):
+    '''
+    Disable the default on-disk score and feature caches, so that tests do
+    not write into the repository or depend on the state left by earlier
+    runs. Tests of the caches create their own in tmpdir.
+    '''
+    monkeypatch.setattr(config, 'SCORE_CACHE_SIZE', 0)
+    monkeypatch.setattr(config, 'FEATURE_CACHE_SIZE', 0)
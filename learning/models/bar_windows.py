@@ -0,0 +1,67 @@
+'''
+Cutting the note graph of a score into overlapping bar windows, for
+approximate inference on large scores.
+'''
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+
+def get_bar_windows(bars, window_bars, context_bars):
+    '''
+    Cuts the nodes into windows of window_bars consecutive bars, each extended
+    by context_bars bars on both sides. Returns a list of pairs (nodes, core)
+    of the nodes in a window and the mask of those in its central bars. Each
+    node is in the central bars of exactly one window.
+    '''
+    bars = np.asarray(bars)
+    windows = []
+    if not len(bars):
+        return windows
+    for start in range(bars.min(), bars.max() + 1, window_bars):
+        stop = start + window_bars
+        nodes = np.flatnonzero((bars >= start - context_bars) &
+                               (bars < stop + context_bars))
+        core = (bars[nodes] >= start) & (bars[nodes] < stop)
+        if core.any():
+            windows.append((nodes, core))
+    return windows
+
+
+def get_subgraph(nodes, edges, n_nodes):
+    '''
+    Returns the edges between the given nodes, numbered by position in nodes,
+    and the mask of those edges in edges.
+    '''
+    local = np.full(n_nodes, -1, dtype='int')
+    local[nodes] = np.arange(len(nodes))
+    sub_edges = local[edges]
+    keep = (sub_edges >= 0).all(axis=1)
+    return sub_edges[keep], keep
+
+
+def windowed_inference(unary_potentials, pairwise_potentials, edges, bars,
+                       window_bars, context_bars, inference, n_jobs=1):
+    '''
+    Approximate MAP inference that runs inference(unary_potentials,
+    pairwise_potentials, edges) on bar windows of the graph separately (see
+    get_bar_windows), with n_jobs worker processes, and keeps the labels of
+    the central bars of each window. Edges across windows are only seen
+    through the context bars, so more context gives labels closer to those
+    of the whole graph.
+    '''
+    windows = get_bar_windows(bars, window_bars, context_bars)
+    tasks = []
+    for nodes, _ in windows:
+        sub_edges, keep = get_subgraph(nodes, edges, len(unary_potentials))
+        tasks.append((unary_potentials[nodes], pairwise_potentials[keep], sub_edges))
+
+    if n_jobs == 1 or len(tasks) <= 1:
+        results = [inference(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            results = list(executor.map(inference, *zip(*tasks)))
+
+    y = np.zeros(len(unary_potentials), dtype='int')
+    for (nodes, core), labels in zip(windows, results):
+        y[nodes[core]] = np.asarray(labels)[core]
+    return y
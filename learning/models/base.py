@@ -41,6 +41,13 @@ class BaseModel(object):
         real_X, _, _ = X
         return self.predict(real_X)
 
+    def predict_many(self, Xs):
+        '''
+        Predict several structured inputs at once. Returns a list of what
+        predict_structured returns for each.
+        '''
+        return [self.predict_structured(X) for X in Xs]
+
     def describe(self):
         '''
         Returns a short description of the model.
@@ -0,0 +1,51 @@
+'''
+Exact MAP inference for binary pairwise models with submodular potentials,
+by reduction to a minimum cut.
+'''
+import numpy as np
+from . import mincut_ext
+
+
+SUBMODULAR_TOLERANCE = 1e-9
+
+
+def is_submodular(pairwise_potentials, tolerance=SUBMODULAR_TOLERANCE):
+    '''
+    Whether the pairwise potentials, of shape (n_edges, 2, 2) or (2, 2), are
+    binary and submodular. Potentials are maximised, so this is
+    P[0, 0] + P[1, 1] >= P[0, 1] + P[1, 0] for every edge.
+    '''
+    P = np.asarray(pairwise_potentials)
+    if P.shape[-2:] != (2, 2):
+        return False
+    P = P.reshape(-1, 2, 2)
+    return bool(np.all(P[:, 0, 0] + P[:, 1, 1] >=
+                       P[:, 0, 1] + P[:, 1, 0] - tolerance))
+
+
+def inference_mincut(unary_potentials, pairwise_potentials, edges):
+    '''
+    The labels y maximising the sum of unary_potentials[i, y[i]] and of
+    pairwise_potentials[k, y[i], y[j]] for each edge k = (i, j), for binary
+    labels and submodular pairwise potentials.
+    '''
+    unary_potentials = np.asarray(unary_potentials, dtype='float')
+    edges = np.asarray(edges, dtype='int64').reshape(-1, 2)
+    P = np.broadcast_to(pairwise_potentials, (len(edges), 2, 2))
+
+    # Minimise the energy -P. With energies A, B, C, D of the labels (0, 0),
+    # (0, 1), (1, 0) and (1, 1) of an edge (i, j), the energy of the edge is
+    # A + (C - A) y[i] + (D - C) y[j] + (B + C - A - D) (1 - y[i]) y[j]
+    A, B, C, D = -P[:, 0, 0], -P[:, 0, 1], -P[:, 1, 0], -P[:, 1, 1]
+    linear = unary_potentials[:, 0] - unary_potentials[:, 1]
+    np.add.at(linear, edges[:, 0], C - A)
+    np.add.at(linear, edges[:, 1], D - C)
+    weights = np.maximum(B + C - A - D, 0)
+
+    # Nodes labelled 1 are on the sink side, so the arc from the source to i
+    # is cut if y[i] = 1, the arc from i to the sink if y[i] = 0, and the arc
+    # from i to j if y[i] = 0 and y[j] = 1
+    sink_side = mincut_ext.min_cut(
+        len(unary_potentials), edges[:, 0], edges[:, 1], weights,
+        np.maximum(linear, 0), np.maximum(-linear, 0))
+    return sink_side.astype('int')
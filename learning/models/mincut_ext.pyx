@@ -0,0 +1,111 @@
+import cython
+import numpy as np
+from numpy cimport int64_t
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def min_cut(Py_ssize_t n, tails, heads, capacities, source_capacities,
+            sink_capacities):
+    '''
+    Minimum cut between a source and a sink in a graph of n nodes with arcs
+    tails[k] -> heads[k] of capacity capacities[k], arcs from the source to
+    each node i of capacity source_capacities[i], and arcs from each node i
+    to the sink of capacity sink_capacities[i]. Capacities are non-negative.
+
+    Uses Dinic's algorithm. Returns a boolean array, True for the nodes on
+    the sink side of the cut.
+    '''
+    cdef Py_ssize_t source = n, sink = n + 1, n_nodes = n + 2
+    nodes = np.arange(n)
+    tail = np.concatenate([np.asarray(tails, dtype='int64'),
+                           np.full(n, source, dtype='int64'), nodes])
+    head = np.concatenate([np.asarray(heads, dtype='int64'), nodes,
+                           np.full(n, sink, dtype='int64')])
+    capacity = np.concatenate([np.asarray(capacities, dtype='float64'),
+                               np.asarray(source_capacities, dtype='float64'),
+                               np.asarray(sink_capacities, dtype='float64')])
+    keep = capacity > 0
+    tail, head, capacity = tail[keep], head[keep], capacity[keep]
+
+    # Arc 2k is tail[k] -> head[k], and arc 2k + 1 its reverse, which has no
+    # capacity. Arcs are then sorted by their tail.
+    count = 2 * len(tail)
+    arc_tail = np.empty(count, dtype='int64')
+    arc_tail[0::2], arc_tail[1::2] = tail, head
+    arc_head = np.empty(count, dtype='int64')
+    arc_head[0::2], arc_head[1::2] = head, tail
+    arc_capacity = np.zeros(count, dtype='float64')
+    arc_capacity[0::2] = capacity
+
+    order = np.argsort(arc_tail, kind='mergesort')
+    position = np.empty(count, dtype='int64')
+    position[order] = np.arange(count)
+
+    cdef int64_t[:] frm = arc_tail[order]
+    cdef int64_t[:] to = arc_head[order]
+    cdef int64_t[:] reverse = position[order ^ 1]
+    cdef double[:] residual = arc_capacity[order]
+    cdef int64_t[:] first = np.searchsorted(
+        arc_tail[order], np.arange(n_nodes + 1)).astype('int64')
+
+    cdef int64_t[:] level = np.empty(n_nodes, dtype='int64')
+    cdef int64_t[:] queue = np.empty(n_nodes, dtype='int64')
+    cdef int64_t[:] current = np.empty(n_nodes, dtype='int64')
+    cdef int64_t[:] path = np.empty(n_nodes, dtype='int64')
+    cdef double eps = 1e-12 * max(1.0, capacity.max() if len(capacity) else 0.0)
+    cdef Py_ssize_t v, a, head_index, tail_index, depth, d
+    cdef double flow
+
+    while True:
+        # Breadth-first search for the levels of the residual graph
+        level[:] = -1
+        level[source] = 0
+        queue[0] = source
+        head_index, tail_index = 0, 1
+        while head_index < tail_index:
+            v = queue[head_index]
+            head_index += 1
+            for a in range(first[v], first[v + 1]):
+                if residual[a] > eps and level[to[a]] < 0:
+                    level[to[a]] = level[v] + 1
+                    queue[tail_index] = to[a]
+                    tail_index += 1
+        if level[sink] < 0:
+            break
+
+        # Augment along shortest paths until the level graph is blocked
+        current[:] = first[:n_nodes]
+        v, depth = source, 0
+        while True:
+            if v == sink:
+                flow = residual[path[0]]
+                for d in range(1, depth):
+                    flow = min(flow, residual[path[d]])
+                for d in range(depth):
+                    residual[path[d]] -= flow
+                    residual[reverse[path[d]]] += flow
+                v, depth = source, 0
+                continue
+
+            while current[v] < first[v + 1]:
+                a = current[v]
+                if residual[a] > eps and level[to[a]] == level[v] + 1:
+                    break
+                current[v] += 1
+
+            if current[v] < first[v + 1]:
+                path[depth] = current[v]
+                depth += 1
+                v = to[current[v]]
+            elif v == source:
+                break
+            else:
+                # Dead end, retreat
+                level[v] = -1
+                depth -= 1
+                v = frm[path[depth]]
+                current[v] += 1
+
+    # The nodes still reachable from the source are on its side
+    return np.asarray(level)[:n] < 0
@@ -1,21 +1,62 @@
-from collections import namedtuple
-from itertools import product
+from collections import Counter, namedtuple
+import functools
+import logging
 import numpy as np
+from .bar_windows import windowed_inference
 from .base import BaseModel
+from .mincut import inference_mincut, is_submodular
+from .. import config
+from pystruct.inference import inference_dispatch
 from pystruct.learners import NSlackSSVM
 from pystruct.models import EdgeFeatureGraphCRF
+from pystruct.models.utils import loss_augment_unaries
 import h5py
 
 
 Variable = namedtuple('Variable', ['id', 'name'])
 
+# Exact inference by minimum cut for binary labels with submodular pairwise
+# potentials, and the method used for other potentials
+MINCUT = 'mincut'
+MINCUT_FALLBACK = 'ad3'
+
+
+def dispatch_inference(unary_potentials, pairwise_potentials, edges,
+                       inference_method, **kwargs):
+    '''
+    PyStruct's inference_dispatch, which also accepts MINCUT. Min-cut gives
+    exact integral labels, which are returned even for relaxed inference.
+    '''
+    if inference_method == MINCUT:
+        return inference_mincut(unary_potentials, pairwise_potentials, edges)
+    return inference_dispatch(unary_potentials, pairwise_potentials, edges,
+                              inference_method, **kwargs)
+
 
 class MyGraphCRF(EdgeFeatureGraphCRF):
     '''
     A PyStruct Model class that chooses proper dimensions according to a
     pre-processor object, and implements parameter tying.
+
+    If window_bars is set, inference on inputs that carry the bar of each
+    node (see GraphInput) is cut into windows of window_bars bars with
+    context_bars bars of context on both sides, run by window_jobs worker
+    processes. Larger windows and more context are slower but closer to the
+    inference on the whole score. Windowed inference always returns integral
+    labels, even when relaxed inference is asked for.
+
+    inference_method is a PyStruct inference method, or MINCUT to solve
+    binary labels with submodular potentials exactly by minimum cut and
+    fall back to MINCUT_FALLBACK otherwise. inference_paths counts the
+    methods used, for the inference run in this process.
     '''
-    def __init__(self, pre_processor):
+    def __init__(self, pre_processor, window_bars=None, context_bars=2,
+                 window_jobs=1, inference_method='ad3'):
+        self.window_bars = window_bars
+        self.context_bars = context_bars
+        self.window_jobs = window_jobs
+        self.inference_paths = Counter()
+
         n_states = 3 if pre_processor.label_type == 'hand' else 2
         n_edge_features = sum(a.n_features for a in pre_processor.structures)
 
@@ -39,10 +80,13 @@ class MyGraphCRF(EdgeFeatureGraphCRF):
             pairwise_indices.append([[[i.id for i in row] for row in mat] for mat in var_mats])
 
         self.pairwise_indices = np.concatenate(pairwise_indices)
+        # Tied variable of each untied pairwise feature, in the order of the
+        # flattened (n_edge_features, n_states, n_states) edge features
+        self.pairwise_scatter = self.pairwise_indices.ravel()
 
         super().__init__(
             n_states=n_states, n_features=len(pre_processor.all_keys),
-            n_edge_features=n_edge_features, inference_method='ad3')
+            n_edge_features=n_edge_features, inference_method=inference_method)
 
     def get_unary_weights(self, w):
         return w[:self.n_states * self.n_features].reshape(self.n_features, self.n_states)
@@ -62,15 +106,56 @@ class MyGraphCRF(EdgeFeatureGraphCRF):
         return np.dot(edge_features, pairwise).reshape(
             edge_features.shape[0], self.n_states, self.n_states)
 
+    def is_windowed(self, x, return_energy=False):
+        return (self.window_bars is not None and not return_energy and
+                getattr(x, 'bars', None) is not None)
+
+    def get_inference_path(self, pairwise_potentials, return_energy=False):
+        '''
+        The inference method to use for the given potentials, counted in
+        inference_paths. MINCUT falls back to MINCUT_FALLBACK unless the
+        potentials are binary and submodular.
+        '''
+        method = self.inference_method
+        if method == MINCUT and (return_energy or not is_submodular(pairwise_potentials)):
+            method = MINCUT_FALLBACK
+        self.inference_paths[method if isinstance(method, str) else method[0]] += 1
+        return method
+
+    def inference(self, x, w, relaxed=False, return_energy=False):
+        self._check_size_w(w)
+        unary_potentials = self._get_unary_potentials(x, w)
+        return self._inference(x, unary_potentials, w, relaxed, return_energy)
+
+    def loss_augmented_inference(self, x, y, w, relaxed=False, return_energy=False):
+        self.inference_calls += 1
+        self._check_size_w(w)
+        unary_potentials = self._get_unary_potentials(x, w)
+        loss_augment_unaries(unary_potentials, np.asarray(y), self.class_weight)
+        return self._inference(x, unary_potentials, w, relaxed, return_energy)
+
+    def _inference(self, x, unary_potentials, w, relaxed, return_energy):
+        pairwise_potentials = self._get_pairwise_potentials(x, w)
+        edges = self._get_edges(x)
+        method = self.get_inference_path(pairwise_potentials, return_energy)
+        if self.is_windowed(x, return_energy):
+            return windowed_inference(
+                unary_potentials, pairwise_potentials, edges, x.bars,
+                self.window_bars, self.context_bars,
+                functools.partial(dispatch_inference, inference_method=method),
+                n_jobs=self.window_jobs)
+        return dispatch_inference(
+            unary_potentials, pairwise_potentials, edges, method,
+            relaxed=relaxed, return_energy=return_energy)
+
     def joint_feature(self, x, y):
         vec = super().joint_feature(x, y)
         unaries = vec[:self.n_states * self.n_features]
 
-        edge_features = vec[self.n_states * self.n_features:].reshape(
-            self.n_edge_features, self.n_states, self.n_states)
-        pairwise = np.zeros(len(self.pairwise_variables), dtype='float')
-        for i in product(*(range(i) for i in self.pairwise_indices.shape)):
-            pairwise[self.pairwise_indices[i]] += edge_features[i]
+        # Sum the untied pairwise features into their tied variables
+        pairwise = np.bincount(
+            self.pairwise_scatter, weights=vec[self.n_states * self.n_features:],
+            minlength=len(self.pairwise_variables))
 
         return np.concatenate([unaries, pairwise])
 
@@ -81,29 +166,58 @@ class PyStructCRF(BaseModel):
 
     There are unary and pairwise potentials. Note that pairwise potentials are
     directed.
+
+    The learner runs inference over examples with config.CRF_JOBS worker
+    processes, unless learner_kwargs sets n_jobs. The inference methods used
+    in training are logged; with worker processes, only the methods that the
+    learnt weights take on the training examples are known.
     '''
     def __init__(self, pre_processor, Model=MyGraphCRF, model_kwargs={},
                  learner_kwargs={}):
         super().__init__(pre_processor)
         self.model = Model(pre_processor, **model_kwargs)
+        learner_kwargs = {'n_jobs': config.CRF_JOBS, **learner_kwargs}
         self.learner = NSlackSSVM(self.model, max_iter=300, verbose=1, C=1.0,
                                   show_loss_every=50, **learner_kwargs)
 
     def fit_structured(self, X, y):
         y = [i.flatten() for i in y]
+        paths = getattr(self.model, 'inference_paths', None)
+        if paths is not None:
+            paths.clear()
         self.learner.fit(X, y)
+        if paths is None:
+            return
+
+        what = 'used in training'
+        if self.learner.n_jobs != 1:
+            # Inference ran in worker processes, which do not report counts
+            logging.info('Inference method counts of training are unavailable '
+                         'with n_jobs={}'.format(self.learner.n_jobs))
+            for x in X:
+                self.model.get_inference_path(
+                    self.model._get_pairwise_potentials(x, self.learner.w))
+            what = 'for the learnt weights on the training examples'
+        if paths:
+            logging.info('Inference methods {}: {}'.format(what, ', '.join(
+                '{} {}'.format(k, v) for k, v in sorted(paths.items()))))
 
     def evaluate_structured(self, X, y):
         y = [i.flatten() for i in y]
         return 1 - self.learner.score(X, y)
 
     def predict_structured(self, X):
+        return self.predict_many([X])[0]
+
+    def predict_many(self, Xs):
         # For compatibility with non-graphical models, we generate
         # probabilistic predictions rather than just the final label.
-        y_pred = self.learner.predict([X])[0]
-        y_proba = np.zeros((len(y_pred), self.model.n_states), dtype='float')
-        y_proba[np.arange(len(y_pred)), y_pred] = 1.0
-        return y_proba
+        results = []
+        for y_pred in self.learner.predict(list(Xs)):
+            y_proba = np.zeros((len(y_pred), self.model.n_states), dtype='float')
+            y_proba[np.arange(len(y_pred)), y_pred] = 1.0
+            results.append(y_proba)
+        return results
 
     def save(self, fp):
         with h5py.File(fp, 'w') as f:
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from .bar_windows import get_bar_windows, get_subgraph, windowed_inference
+
+
+def random_problem(rng, n, n_bars):
+    '''A submodular problem on a graph of edges within two adjacent bars'''
+    bars = np.sort(rng.randint(0, n_bars, n))
+    first, second = np.triu_indices(n, 1)
+    local = (np.abs(bars[first] - bars[second]) <= 1) & (rng.rand(len(first)) < 0.05)
+    edges = np.stack([first[local], second[local]], axis=1)
+    unary = rng.randn(n, 2)
+    pairwise = np.zeros((len(edges), 2, 2))
+    pairwise[:, 1, 1] = rng.rand(len(edges))
+    return unary, pairwise, edges, bars
+
+
+def test_get_bar_windows():
+    bars = np.array([0, 0, 1, 2, 3, 3, 5, 6, 7])
+    windows = get_bar_windows(bars, 2, 1)
+
+    # Every node is in the core of exactly one window
+    core_counts = np.zeros(len(bars), dtype='int')
+    for nodes, core in windows:
+        np.add.at(core_counts, nodes[core], 1)
+    assert core_counts.tolist() == [1] * len(bars)
+
+    nodes, core = windows[1]
+    assert nodes.tolist() == [2, 3, 4, 5]
+    assert bars[nodes[core]].tolist() == [2, 3, 3]
+    # Bar 4 is empty, so the window of bars 4-5 only has node 6 in its core
+    assert [bars[nodes[core]].tolist() for nodes, core in windows[2:]] == \
+        [[5], [6, 7]]
+
+    assert get_bar_windows(np.array([], dtype='int'), 2, 1) == []
+
+
+def test_get_subgraph():
+    edges = np.array([[0, 1], [1, 3], [2, 3], [3, 4]])
+    sub_edges, keep = get_subgraph(np.array([1, 3, 4]), edges, 5)
+    assert sub_edges.tolist() == [[0, 1], [1, 2]]
+    assert keep.tolist() == [False, True, False, True]
+
+
+def test_windowed_inference():
+    mincut = pytest.importorskip('learning.models.mincut')
+    rng = np.random.RandomState(0)
+    unary, pairwise, edges, bars = random_problem(rng, 300, 30)
+    whole = mincut.inference_mincut(unary, pairwise, edges)
+
+    # A window covering the whole score is the whole-graph inference
+    y = windowed_inference(unary, pairwise, edges, bars, 100, 0,
+                           mincut.inference_mincut)
+    assert y.tolist() == whole.tolist()
+
+    # Edges only span adjacent bars here, so one bar of context is enough
+    # to see all the edges of the core nodes, but it does not make the
+    # windows exact
+    y = windowed_inference(unary, pairwise, edges, bars, 4, 1,
+                           mincut.inference_mincut)
+    assert np.mean(y == whole) > 0.9
+
+    y2 = windowed_inference(unary, pairwise, edges, bars, 4, 1,
+                            mincut.inference_mincut, n_jobs=2)
+    assert y2.tolist() == y.tolist()
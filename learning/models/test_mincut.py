@@ -0,0 +1,52 @@
+import itertools
+import numpy as np
+import pytest
+
+pytest.importorskip('learning.models.mincut_ext', reason='mincut_ext is not built')
+
+from .mincut import inference_mincut, is_submodular
+
+
+def get_score(unary, pairwise, edges, y):
+    score = unary[np.arange(len(unary)), y].sum()
+    if len(edges):
+        score += pairwise[np.arange(len(edges)), y[edges[:, 0]], y[edges[:, 1]]].sum()
+    return score
+
+
+def test_inference_mincut():
+    rng = np.random.RandomState(0)
+    for _ in range(300):
+        n = rng.randint(1, 9)
+        edges = np.array([(i, j) for i in range(n) for j in range(i + 1, n)
+                          if rng.rand() < 0.4], dtype='int').reshape(-1, 2)
+        unary = rng.randn(n, 2)
+        pairwise = rng.randn(len(edges), 2, 2)
+        # Raise P[1, 1] until P[0, 0] + P[1, 1] >= P[0, 1] + P[1, 0]
+        excess = (pairwise[:, 0, 0] + pairwise[:, 1, 1] -
+                  pairwise[:, 0, 1] - pairwise[:, 1, 0])
+        pairwise[:, 1, 1] += np.maximum(-excess, 0) + rng.rand(len(edges))
+        assert is_submodular(pairwise)
+
+        y = inference_mincut(unary, pairwise, edges)
+        best = max(get_score(unary, pairwise, edges, np.array(labels))
+                   for labels in itertools.product((0, 1), repeat=n))
+        assert np.isclose(get_score(unary, pairwise, edges, y), best)
+
+
+def test_inference_mincut_without_edges():
+    unary = np.array([[0.0, 1.0], [2.0, -1.0], [0.5, 0.25]])
+    y = inference_mincut(unary, np.zeros((0, 2, 2)), np.zeros((0, 2), dtype='int'))
+    assert y.tolist() == [1, 0, 0]
+
+    assert inference_mincut(np.zeros((0, 2)), np.zeros((0, 2, 2)),
+                            np.zeros((0, 2), dtype='int')).tolist() == []
+
+
+def test_is_submodular():
+    # Repelling weights, i.e. a penalty when both notes are kept
+    assert is_submodular(np.array([[[0.0, 0.0], [0.0, 1.0]]]))
+    assert not is_submodular(np.array([[[0.0, 0.0], [0.0, -1.0]]]))
+    assert not is_submodular(np.array([[[0.0, 1.0], [1.0, 0.0]]]))
+    # Only binary labels
+    assert not is_submodular(np.zeros((1, 3, 3)))
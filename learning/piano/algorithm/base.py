@@ -1,4 +1,5 @@
 from music21 import chord
+import numpy as np
 
 
 class FeatureAlgorithm(object):
@@ -24,9 +25,22 @@ class FeatureAlgorithm(object):
         # Generate a default main key, for convenience
         return str(self.key_prefix) + '_' + str(type(self).__name__)
 
+    @property
+    def dependencies(self):
+        # Algorithms whose markings must exist before compute() is called
+        return []
+
     def run(self, score_obj):
         raise NotImplementedError()
 
+    def compute(self, score_obj):
+        '''
+        Create the markings of this algorithm, assuming the markings of its
+        dependencies already exist. run() is equivalent to running all the
+        dependencies and then compute().
+        '''
+        self.run(score_obj)
+
 
 def get_markings(n):
     return n.editorial.misc
@@ -40,5 +54,16 @@ def set_marking_in_general_note(n, key, value):
         get_markings(n)[key] = value
 
 
+def group_index(*columns):
+    '''
+    Given columns of equal length (e.g. from score_obj.note_table), returns
+    (index, n_groups), where index[i] is the group of the i-th row. Rows with
+    equal values in all columns belong to the same group.
+    '''
+    keys = np.column_stack(columns)
+    unique, index = np.unique(keys, axis=0, return_inverse=True)
+    return index.reshape(-1), len(unique)
+
+
 # Deprecated. Please import from learning.piano.util
 from ..util import iter_notes, iter_notes_with_offset
@@ -1,6 +1,5 @@
-from .base import FeatureAlgorithm, get_markings, iter_notes
+from .base import FeatureAlgorithm
 
-from music21 import stream
 import numpy as np
 
 
@@ -11,20 +10,24 @@ class BassLine(FeatureAlgorithm):
         '''
         In each bar, the part with the lowest median pitch space is marked.
         '''
-        for bar in score_obj.by_bar:
-            best_median, best_measures = float('inf'), set()
-            for measure in bar.recurse(
-                    skipSelf=False).getElementsByClass(stream.Measure):
-                pss = [n.pitch.ps for n in iter_notes(measure, recurse=True)]
-                median = np.median(pss) if pss else float('inf')
+        table = score_obj.note_table
+        if not len(table):
+            return
 
-                if median < best_median:
-                    best_median, best_measures = median, {measure}
-                elif median == best_median:
-                    best_measures.add(measure)
+        n_bars, n_parts = table.bar.max() + 1, table.part.max() + 1
+        measure = table.bar * n_parts + table.part
+        counts = np.bincount(measure, minlength=n_bars * n_parts)
+        starts = np.cumsum(counts) - counts
 
-            for measure in bar.recurse(
-                    skipSelf=False).getElementsByClass(stream.Measure):
-                mark = measure in best_measures
-                for n in iter_notes(measure, recurse=True):
-                    get_markings(n)[self.key] = mark
+        # The median of each measure from its sorted pitches, computed like
+        # np.median (the mean of the middle two for an even count)
+        pss = table.ps[np.lexsort((table.ps, measure))]
+        nonempty = counts > 0
+        lo = (starts + (counts - 1) // 2)[nonempty]
+        hi = (starts + counts // 2)[nonempty]
+        medians = np.full(len(counts), float('inf'))
+        medians[nonempty] = (pss[lo] + pss[hi]) / 2
+
+        best_median = medians.reshape(n_bars, n_parts).min(axis=1)
+        mark = medians[measure] == best_median[table.bar]
+        score_obj.annotate(mark, self.key)
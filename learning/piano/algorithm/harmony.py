@@ -1,8 +1,10 @@
-from .base import FeatureAlgorithm, get_markings
+from .base import FeatureAlgorithm
 from ...tonalanalysis.eventanalysis.chord_flow import FlowState
 from ...tonalanalysis.eventanalysis.event_analyzer import EventAnalyzer
 
-from music21 import chord, stream
+from music21 import stream
+from music21.common import opFrac
+import numpy as np
 
 
 _flow_state = None
@@ -32,42 +34,51 @@ class Harmony(FeatureAlgorithm):
         Use the results of tonal analysis to mark dissonance and chord notes.
         '''
         score = score_obj.score
+        table = score_obj.note_table
         event = EventAnalyzer(score, get_flow_state())
 
-        # Prepare Measure Data for EventAnalyzer
-        event.set_measure_by_score(score_obj)
+        # Prepare Measure Data for EventAnalyzer. Like set_measure_by_score,
+        # notes outside the voices of a measure with voices are left out.
+        rows = np.flatnonzero(table.measure_voice >= 0)
+        rows = rows[np.lexsort((table.measure_voice[rows], table.part[rows],
+                                table.bar[rows]))]
+        names = np.array(table.names, dtype=object)[table.name]
+        event.set_measure_by_arrays(
+            table.bar[rows], table.local_offset[rows], table.duration[rows],
+            names[rows], table.octave[rows],
+            number_of_measures=max(
+                len(part.getElementsByClass(stream.Measure))
+                for part in score.parts))
 
         # Start Event Analyze
         event.analyze_oo()
 
         # Mark Dissonance
-        for part in score.parts:
-            for midx, measure in enumerate(part.getElementsByClass(stream.Measure)):
-                for voice in measure.voices or [measure]:
-                    current_event_group = event.event_container.event_groups[midx]
-                    if not current_event_group.events:
-                        continue
-                    i = 0
-                    for n in voice.notes:
-                        # Some indices might not be used, since each voice
-                        # may not have notes onset at all events.
-                        while current_event_group.events[i].offset != n.offset:
-                            i = i + 1
+        events_at = [{e.offset: e for e in group.events}
+                     for group in event.event_container.event_groups]
+        marks = {sk: np.zeros(len(table), dtype='bool')
+                 for sk in self.sub_keys}
+        where = {sk: np.zeros(len(table), dtype='bool')
+                 for sk in self.sub_keys}
+        for i, b, offset, name in zip(
+                rows.tolist(), table.bar[rows].tolist(),
+                table.local_offset[rows].tolist(), names[rows].tolist()):
+            current_note = events_at[b][opFrac(offset)]
+            if not current_note.matched_chord:
+                continue
+            mc = current_note.matched_chord[0]
+            # Workaround for bug where tonal analyzer marks
+            # everything as dissonance
+            if not any(p in current_note.corrected_pitch_classes for p in mc):
+                continue
+            for pitch, sk in zip(mc, ('base', '3rd', '5th')):
+                if sk in self.sub_keys:
+                    marks[sk][i] = name == pitch
+                    where[sk][i] = True
+            if 'dissonance' in self.sub_keys:
+                marks['dissonance'][i] = name in current_note.dissonance
+                where['dissonance'][i] = True
 
-                        current_note = current_event_group.events[i]
-                        notes = iter(n) if isinstance(n, chord.Chord) else [n]
-                        if not current_note.matched_chord:
-                            continue
-                        mc = current_note.matched_chord[0]
-                        # Workaround for bug where tonal analyzer marks
-                        # everything as dissonance
-                        if not any(p in current_note.corrected_pitch_classes for p in mc):
-                            continue
-                        for j in notes:
-                            for pitch, sk in zip(mc, ('base', '3rd', '5th')):
-                                if sk in self.sub_keys:
-                                    get_markings(j)[self.key + '_' + sk] = \
-                                        j.pitch.name == pitch
-                            if 'dissonance' in self.sub_keys:
-                                get_markings(j)[self.key + '_dissonance'] = \
-                                    j.pitch.name in current_note.dissonance
+        for sk in self.sub_keys:
+            score_obj.annotate(marks[sk], self.key + '_' + sk,
+                               where=where[sk])
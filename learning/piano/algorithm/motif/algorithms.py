@@ -5,7 +5,6 @@ import math
 import numpy as np
 import re
 from copy import deepcopy
-from expiringdict import ExpiringDict
 
 def has_across_tie_to_next_note(curr_note, next_note):
     if curr_note is None or next_note is None:
@@ -63,22 +62,20 @@ def fix_probably_sustained_last_note(note_list):
             note_list[-1].name, quarterLength=1.0)
     return note_list
 
+class PreprocessedNoteList(list):
+    '''A note list returned by preprocess_note_list'''
+
 def preprocess_note_list(note_list):
-    if id(note_list) in preprocess_note_list.cache:
-        # print('cache hit')
-        return preprocess_note_list.cache.get(id(note_list))
+    # the sequence functions can be given a preprocessed note list directly
+    if isinstance(note_list, PreprocessedNoteList):
+        return note_list
 
     note_list = convert_chord_to_highest_note(note_list)
     note_list = merge_nearby_rest(note_list)
     note_list = merge_across_tie(note_list)
     note_list = fix_probably_sustained_last_note(note_list)
 
-    preprocess_note_list.cache[id(note_list)] = note_list
-    # print('cache miss')
-
-    return note_list
-
-preprocess_note_list.cache = ExpiringDict(max_len=1000, max_age_seconds=1)
+    return PreprocessedNoteList(note_list)
 
 class MotifAnalyzerAlgorithms(object):
 
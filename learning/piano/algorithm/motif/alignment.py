@@ -1,5 +1,12 @@
 import numpy as np
 
+try:
+    from . import alignment_ext
+except ImportError:
+    # Not built (see setup.py); align_all_pairs falls back to
+    # global_alignment_vec
+    alignment_ext = None
+
 
 LEN = 255
 dp = tuple([(0, 0)]*(LEN+1) for _ in range(2))
@@ -110,3 +117,84 @@ def align_one_to_many(first, seconds):
     assert len(first) <= LEN and all(len(s) <= LEN for s in seconds)
     scores, lengths = global_alignment_vec(first, seconds)
     return (lengths - scores) / lengths
+
+
+def encode_sequences(seqs):
+    '''
+    Encode sequences of hashable symbols as rows of a zero-padded int32
+    matrix, with equal symbols encoded equally (from 1).
+
+    Returns (matrix, lengths).
+    '''
+    lengths = np.array([len(seq) for seq in seqs], dtype='int32')
+    matrix = np.zeros((len(seqs), lengths.max(initial=0)), dtype='int32')
+    mapping = {}
+    for i, seq in enumerate(seqs):
+        matrix[i, :len(seq)] = [
+            mapping.setdefault(symbol, len(mapping) + 1) for symbol in seq]
+    return matrix, lengths
+
+
+def _align_rows_vec(seqs, lengths, start, stop, match, mismatch, indel):
+    # Same as alignment_ext.align_rows. global_alignment_vec only agrees with
+    # global_alignment for indel == 0.
+    scores = np.zeros((stop - start, stop), dtype='int32')
+    lens = np.zeros((stop - start, stop), dtype='int32')
+    rows = [seq[:length].tolist() for seq, length in zip(seqs, lengths)]
+    for a in range(max(start, 1), stop):
+        if indel == 0:
+            scores[a - start, :a], lens[a - start, :a] = global_alignment_vec(
+                rows[a], rows[:a], match=match, mismatch=mismatch)
+        else:
+            for b in range(a):
+                scores[a - start, b], lens[a - start, b] = global_alignment(
+                    rows[a], rows[b], match=match, mismatch=mismatch,
+                    indel=indel)
+    return scores, lens
+
+
+def align_all_pairs(seqs, match=1, mismatch=0, indel=0, block_size=1 << 22):
+    '''
+    Global alignment (see global_alignment) of every pair of sequences
+    seqs[i], seqs[j] with i > j. With the default scores, this is the same as
+    global_alignment_vec(seqs[i], seqs[:i]).
+
+    The sequences are encoded once with encode_sequences. Rows are aligned in
+    chunks of at most about `block_size` pairs, so that memory stays bounded;
+    for each chunk, yields (start, stop, scores, lengths) where scores[r, j]
+    and lengths[r, j] are for the pair (start + r, j), j < start + r.
+    '''
+    assert all(len(seq) <= LEN for seq in seqs)
+    matrix, lengths = encode_sequences(seqs)
+    align_rows = alignment_ext.align_rows if alignment_ext else _align_rows_vec
+
+    n = len(seqs)
+    rows_per_block = max(1, block_size // max(n, 1))
+    for start in range(0, n, rows_per_block):
+        stop = min(start + rows_per_block, n)
+        scores, lens = align_rows(
+            matrix, lengths, start, stop, match, mismatch, indel)
+        yield start, stop, scores, lens
+
+
+def align_pairs(seqs, first, second, match=1, mismatch=0, indel=0):
+    '''
+    Global alignment (see global_alignment) of seqs[first[k]] and
+    seqs[second[k]] for each k.
+
+    Returns (scores, lengths).
+    '''
+    assert all(len(seq) <= LEN for seq in seqs)
+    first = np.asarray(first, dtype='int32')
+    second = np.asarray(second, dtype='int32')
+    if alignment_ext:
+        matrix, lengths = encode_sequences(seqs)
+        return alignment_ext.align_pairs(
+            matrix, lengths, first, second, match, mismatch, indel)
+
+    scores = np.zeros(len(first), dtype='int32')
+    lens = np.zeros(len(first), dtype='int32')
+    for k, (a, b) in enumerate(zip(first.tolist(), second.tolist())):
+        scores[k], lens[k] = global_alignment(
+            seqs[a], seqs[b], match=match, mismatch=mismatch, indel=indel)
+    return scores, lens
@@ -0,0 +1,91 @@
+import cython
+import numpy as np
+from numpy cimport int32_t
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef (int32_t, int32_t) _align(
+        int32_t[:, :] seqs, Py_ssize_t a, Py_ssize_t n, Py_ssize_t b,
+        Py_ssize_t m, int match, int mismatch, int indel, int32_t[:, :] dp):
+    # global_alignment of rows a and b (of lengths n and m). dp has 4 rows of
+    # (score, length) for rows i + 1 and i of the first sequence.
+    cdef Py_ssize_t i, j
+    cdef Py_ssize_t prev = 0, cur = 2
+    cdef int32_t s, l, cs, cl, symbol
+
+    for j in range(m + 1):
+        dp[prev, j] = 0
+        dp[prev + 1, j] = m - j
+
+    for i in range(n - 1, -1, -1):
+        dp[cur, m] = 0
+        dp[cur + 1, m] = n - i
+        symbol = seqs[a, i]
+        for j in range(m - 1, -1, -1):
+            # Maximum (score, length) in lexicographic order
+            s = dp[prev, j] + indel
+            l = dp[prev + 1, j]
+            cs = dp[cur, j + 1] + indel
+            cl = dp[cur + 1, j + 1]
+            if cs > s or (cs == s and cl > l):
+                s, l = cs, cl
+            cs = dp[prev, j + 1] + (match if seqs[b, j] == symbol else mismatch)
+            cl = dp[prev + 1, j + 1]
+            if cs > s or (cs == s and cl > l):
+                s, l = cs, cl
+            dp[cur, j] = s
+            dp[cur + 1, j] = l + 1
+        prev, cur = cur, prev
+
+    return dp[prev, 0], dp[prev + 1, 0]
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def align_rows(int32_t[:, :] seqs, int32_t[:] lengths, Py_ssize_t start,
+               Py_ssize_t stop, int match, int mismatch, int indel):
+    '''
+    Global alignment of each sequence in rows [start, stop) of the padded
+    matrix seqs against every earlier sequence.
+
+    Returns (scores, lengths) of shape (stop - start, stop), where entry
+    [r, j] is global_alignment(seqs[start + r], seqs[j]) for j < start + r.
+    Other entries are 0.
+    '''
+    cdef int32_t[:, :] out_score = np.zeros((stop - start, stop), dtype='int32')
+    cdef int32_t[:, :] out_length = np.zeros((stop - start, stop), dtype='int32')
+    cdef int32_t[:, :] dp = np.empty((4, seqs.shape[1] + 1), dtype='int32')
+    cdef Py_ssize_t a, b
+
+    for a in range(start, stop):
+        for b in range(a):
+            out_score[a - start, b], out_length[a - start, b] = _align(
+                seqs, a, lengths[a], b, lengths[b], match, mismatch, indel, dp)
+
+    return np.asarray(out_score), np.asarray(out_length)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def align_pairs(int32_t[:, :] seqs, int32_t[:] lengths, int32_t[:] first,
+                int32_t[:] second, int match, int mismatch, int indel):
+    '''
+    Global alignment of the sequences in rows first[k] and second[k] of the
+    padded matrix seqs, for each k.
+
+    Returns (scores, lengths), where entry k is
+    global_alignment(seqs[first[k]], seqs[second[k]]).
+    '''
+    cdef Py_ssize_t count = first.shape[0]
+    cdef int32_t[:] out_score = np.zeros(count, dtype='int32')
+    cdef int32_t[:] out_length = np.zeros(count, dtype='int32')
+    cdef int32_t[:, :] dp = np.empty((4, seqs.shape[1] + 1), dtype='int32')
+    cdef Py_ssize_t k, a, b
+
+    for k in range(count):
+        a, b = first[k], second[k]
+        out_score[k], out_length[k] = _align(
+            seqs, a, lengths[a], b, lengths[b], match, mismatch, indel, dp)
+
+    return np.asarray(out_score), np.asarray(out_length)
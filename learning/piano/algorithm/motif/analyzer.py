@@ -5,13 +5,18 @@ import math
 import numpy as np
 
 from collections import defaultdict
+from functools import lru_cache
 from sklearn.cluster import DBSCAN, SpectralClustering, AgglomerativeClustering
-from intervaltree import Interval, IntervalTree
 
 from termcolor import colored
 
 from .notegram import Notegram
-from .similarity import get_dissimilarity_matrix
+from .part_elements import PartElementTable, get_windows
+from ...note_table import TIE_CODES
+from .clustering import IntervalIndex, sparse_complete_linkage
+from .similarity import (
+    EncodingCache, get_candidate_pairs, get_dissimilarity_matrix,
+    get_sequences, get_sparse_dissimilarity)
 
 NGRAM_SIZE = 4
 
@@ -20,64 +25,33 @@ Z_SCORE_THRESHOLD = 2
 
 MIN_CLUSTER_SIZE = 10
 
-def has_across_tie_to_next_note(curr_note, next_note):
-    if curr_note is None or next_note is None:
-        return False
-    if not isinstance(curr_note, music21.note.Note) or not isinstance(next_note, music21.note.Note):
-        return False
-    if curr_note.tie is None or next_note.tie is None:
-        return False
-    if curr_note.tie.type in ('start', 'continue'):
-        if next_note.tie.type in ('continue', 'stop'):
-            if curr_note.pitch.ps == next_note.pitch.ps:
-                return True
-    return False
-
-uninteresting_notes = set()
-
-def is_notegram_unintersting(notegram):
-    is_interesting = True
-    notesAndRests = list(n[1] for n in notegram)
-    # check if any note is marked as uninteresting previously
-    if any(id(n) in uninteresting_notes for n in notesAndRests):
-        is_interesting = False
-    else:
-        notes = list(n for n in notesAndRests if isinstance(n, music21.note.Note))
-        rhythms = [n.duration.quarterLength for n in notesAndRests]
-        pitches = [n.pitch.ps for n in notes if n.isRest is True]
-        # see if both equal rhythm and equal pitch
-        if len(set(rhythms)) == 1 and len(set(pitches)) == 1:
-            is_interesting = False
-        else:
-            # check if they can form a common chord
-            note_names = set(n.name for n in notes)
-            if len(set(rhythms)) == 1 and len(note_names) >= 3:
-                # form the chord and see if they are major/minor triad
-                chord = music21.chord.Chord(note_names)
-                chord = music21.chord.Chord.sortAscending(chord, inPlace=False)
-                if any([
-                    chord.isTriad(),
-                    chord.isAugmentedSixth(),
-                    chord.isAugmentedTriad(),
-                    chord.isDiminishedSeventh(),
-                    chord.isDiminishedTriad(),
-                    chord.isDominantSeventh(),
-                    chord.isFrenchAugmentedSixth(),
-                    chord.isGermanAugmentedSixth(),
-                    chord.isHalfDiminishedSeventh(),
-                    chord.isItalianAugmentedSixth(),
-                    chord.isSeventh(),
-                    chord.isSwissAugmentedSixth() 
-                ]):
-                    # print(chord.commonName) 
-                    is_interesting = False
-    
-    if is_interesting:
-        return False
-    else:
-        for note in notesAndRests:
-            uninteresting_notes.add(id(note))
-        return True
+@lru_cache(maxsize=1024)
+def is_common_chord(note_names):
+    # form the chord and see if they are major/minor triad
+    chord = music21.chord.Chord(list(note_names))
+    chord.sortAscending(inPlace=True)
+    return any(test() for test in (
+        chord.isTriad,
+        chord.isAugmentedSixth,
+        chord.isAugmentedTriad,
+        chord.isDiminishedSeventh,
+        chord.isDiminishedTriad,
+        chord.isDominantSeventh,
+        chord.isFrenchAugmentedSixth,
+        chord.isGermanAugmentedSixth,
+        chord.isHalfDiminishedSeventh,
+        chord.isItalianAugmentedSixth,
+        chord.isSeventh,
+        chord.isSwissAugmentedSixth
+    ))
+
+def format_rhythm(quarter_length):
+    return '{0:.1f}'.format(float(quarter_length))
+
+def is_index_overlapping(first, second):
+    if len(first) > len(second):
+        first, second = second, first
+    return first.overlap_ratio(second) >= OVERLAP_THRESHOLD
 
 class MotifAnalyzer(object):
 
@@ -90,7 +64,11 @@ class MotifAnalyzer(object):
             measure.removeByClass(
                 [music21.layout.PageLayout, music21.layout.SystemLayout])
 
-        self.notegram_groups = defaultdict(lambda: [])
+        # (note name, rhythm) symbols of the notegrams, and their codes
+        self.symbols = []
+        self.symbol_codes = {}
+        self.notegram_strings = {}
+        self.encoding_cache = EncodingCache()
 
         self.notegram_groups = defaultdict(lambda: [])
         for part in self.score.recurse().getElementsByClass('Part'):
@@ -100,141 +78,184 @@ class MotifAnalyzer(object):
         self.init_num_of_cluster = math.ceil(len(self.notegram_groups) / 10) # what should this be?
 
     def load_notegrams_by_part(self, part):
-
-        measures = list(part.getElementsByClass('Measure'))
-
-        vids = set(str(v.id) for measure in measures for v in measure.voices)
-        vids.add('1')  # Default voice
+        table = PartElementTable(part)
+
+        # (note name, rhythm) of each note as in str(notegram), before and
+        # after fix_probably_sustained_last_note
+        codes = np.array([self.get_symbol_code(name, format_rhythm(ql))
+                          for name, ql in zip(table.names, table.quarter_lengths)],
+                         dtype='int')
+        last_codes = np.where(
+            table.ql - (1.0 - 1e-2) >= 0.0,
+            [self.get_symbol_code(name, '1.0') for name in table.names],
+            codes)
+
+        # notes of uninteresting notegrams, which make the notegrams
+        # containing them uninteresting too
+        uninteresting = [False] * len(table)
 
         result = []
-        for vid in sorted(vids):
-            note_list = []
-            vid_list = []
-            for measure in measures:
-                if measure.voices:
-                    voice = next(
-                        (v for v in measure.voices if str(v.id) == vid), None)
-                    real_vid = vid
-                else:
-                    voice = measure
-                    real_vid = '1'
-
-                if voice is not None:
-                    for n in voice.notesAndRests:
-                        offset = measure.offset + n.offset
-                        note_list.append((offset, n))
-                        vid_list.append(real_vid)
-
-            notegram_it = zip(*[note_list[i:] for i in range(NGRAM_SIZE)])
-            vid_it = zip(*[vid_list[i:] for i in range(NGRAM_SIZE)])
-
-            for notegram, vidgram in zip(notegram_it, vid_it):
-
-                if vid not in vidgram:
-                    continue
-
-                # reject notegram if starting with a tie
-                if notegram[0][1].tie is not None and notegram[0][1].tie.type in ('continue', 'stop'):
-                    continue
-
-                # reject notegram containing a rest
-                if any(n[1].isRest for n in notegram):
-                    continue
-
-                # reject notegram containing >= quarter rest
-                if any((note[1].isRest and note[1].duration.quarterLength -
-                        (1.0 - 1e-2) >= 0.0) for note in notegram):
-                    continue
-
-                # reject notegram with note of 0 length (it should have been a Rest)
-                if any((note[1].duration.quarterLength < 1e-2) for note in notegram):
-                    continue
+        for vid in table.get_voice_ids():
+            sequence, in_voice = table.get_voice_sequence(vid)
+            if len(sequence) < NGRAM_SIZE:
+                continue
 
-                if is_notegram_unintersting(notegram):
+            windows = get_windows(sequence, NGRAM_SIZE)
+            valid = get_windows(in_voice, NGRAM_SIZE).any(axis=1)
+            # reject notegram if starting with a tie
+            valid &= ~np.isin(table.tie[windows[:, 0]],
+                              (TIE_CODES['continue'], TIE_CODES['stop']))
+            # reject notegram containing a rest
+            valid &= ~table.is_rest[windows].any(axis=1)
+            # reject notegram with note of 0 length (it should have been a Rest)
+            valid &= (table.ql[windows] >= 1e-2).all(axis=1)
+            windows = windows[valid]
+
+            ql = table.ql[windows]
+            equal_rhythm = (ql == ql[:, :1]).all(axis=1)
+
+            # notegrams with neither tied notes to merge nor ties to extend
+            # have their key made of the codes of their notes
+            plain = ~(table.is_tied(windows[:, :-1], windows[:, 1:]).any(axis=1) |
+                      table.tie_to_next[windows].any(axis=1))
+            keys = np.concatenate(
+                (codes[windows[:, :-1]], last_codes[windows[:, -1:]]), axis=1)
+
+            for window, is_equal_rhythm, is_plain, key in zip(
+                    windows.tolist(), equal_rhythm.tolist(), plain.tolist(),
+                    keys.tolist()):
+                if any(uninteresting[k] for k in window) or (
+                        is_equal_rhythm and self.is_chord_notegram(table, window)):
+                    for k in window:
+                        uninteresting[k] = True
                     continue
 
-                # if the notegram contain notes with tie, add more note at the end to make up for it
-                across_tie_count = 0
-                for _, curr_note in notegram:
-                    if has_across_tie_to_next_note(curr_note, curr_note.next(('Rest', 'Note'))):
-                        across_tie_count += 1
-
-                notegram = list(notegram)
-                curr_offset, curr_note = notegram[0]
-                last_offset, last_note = notegram[-1]
-                last_note = last_note.next(('Rest', 'Note'))
-                # add one more note for one tie added
-                while across_tie_count > 0:
-                    across_tie_count -= 1
-                    if isinstance(last_note, music21.note.Note):
-                        last_offset += last_note.quarterLength
-                        notegram.append((last_offset, last_note))
-                        if has_across_tie_to_next_note(last_note, last_note.next(('Rest', 'Note'))):
-                            across_tie_count += 1
-                        last_note = last_note.next(('Rest', 'Note'))
-                    else:
-                        break
-
-                notegram = tuple(notegram)
+                if is_plain:
+                    notegram = window
+                    offsets = [table.offsets[k] for k in window]
+                    key = tuple(key)
+                else:
+                    notegram, offsets = self.extend_across_ties(table, window)
+                    key = self.get_notegram_key(table, notegram)
 
                 result.append(Notegram(
-                    list(i[1] for i in notegram),
-                    list(i[0] for i in notegram)))
+                    [table.elements[k] for k in notegram], offsets,
+                    key=self.get_notegram_string(key)))
 
         return result
 
-    def is_clusters_overlapping(self, first, second):
-        first = sum((self.notegram_groups[i] for i in first), [])
-        second = sum((self.notegram_groups[i] for i in second), [])
-
-        if len(first) > len(second):
-            first, second = second, first
-
-        first = [(notegram.get_note_offset_by_index(
-            0), notegram.get_note_offset_by_index(-1))
-            for notegram in first]
-
-        second = [(notegram.get_note_offset_by_index(
-            0), notegram.get_note_offset_by_index(-1))
-            for notegram in second]
-
-        first_intervals = [Interval(*i) for i in first]
-        second_intervals = [Interval(*i) for i in second]
-
-        if len(first_intervals) > len(second_intervals):
-            first_intervals, second_intervals = second_intervals, first_intervals
-
-        count = 0
-        tree = IntervalTree(second_intervals)
-        for interval in first_intervals:
-            if tree.search(*interval):
-                count += 1
+    def is_chord_notegram(self, table, window):
+        # check if they can form a common chord
+        note_names = set(table.names[k] for k in window if table.is_note[k])
+        return len(note_names) >= 3 and is_common_chord(
+            tuple(sorted(note_names)))
+
+    def extend_across_ties(self, table, window):
+        '''
+        If the notegram contain notes with tie, add more note at the end to
+        make up for it. Returns the notes and their offsets.
+        '''
+        notegram = list(window)
+        offsets = [table.offsets[k] for k in window]
+        across_tie_count = int(np.count_nonzero(table.tie_to_next[window]))
+
+        last_note = table.next[window[-1]]
+        # add one more note for one tie added
+        while across_tie_count > 0:
+            across_tie_count -= 1
+            if last_note < 0 or not table.is_note[last_note]:
+                break
+            offsets.append(offsets[-1] + table.quarter_lengths[last_note])
+            notegram.append(last_note)
+            if table.tie_to_next[last_note]:
+                across_tie_count += 1
+            last_note = table.next[last_note]
+
+        return notegram, offsets
+
+    def get_notegram_key(self, table, notegram):
+        '''
+        The codes of (note name, rhythm) of the notegram after merging tied
+        notes, as in preprocess_note_list.
+        '''
+        names, qls = [], []
+        i = 0
+        while i < len(notegram):
+            k = notegram[i]
+            names.append(table.names[k])
+            qls.append(table.quarter_lengths[k])
+            if i + 1 < len(notegram) and table.is_tied(k, notegram[i + 1]):
+                qls[-1] += table.quarter_lengths[notegram[i + 1]]
+                i += 1
+            i += 1
 
-        return count / len(first_intervals) >= OVERLAP_THRESHOLD
+        if qls[-1] - (1.0 - 1e-2) >= 0.0:
+            qls[-1] = 1.0
+
+        return tuple(self.get_symbol_code(name, format_rhythm(ql))
+                     for name, ql in zip(names, qls))
+
+    def get_symbol_code(self, name, rhythm):
+        code = self.symbol_codes.get((name, rhythm))
+        if code is None:
+            code = self.symbol_codes[name, rhythm] = len(self.symbols)
+            self.symbols.append((name, rhythm))
+        return code
+
+    def get_notegram_string(self, key):
+        string = self.notegram_strings.get(key)
+        if string is None:
+            string = self.notegram_strings[key] = ';'.join(
+                self.symbols[code][0] + ',' + self.symbols[code][1]
+                for code in key)
+        return string
+
+    def get_interval_index(self, cluster):
+        notegrams = [notegram for notegram_group in cluster
+                     for notegram in self.notegram_groups[notegram_group]]
+        return IntervalIndex(
+            [notegram.get_note_offset_by_index(0) for notegram in notegrams],
+            [notegram.get_note_offset_by_index(-1) for notegram in notegrams])
 
-    def cluster(self, verbose=False):
+    def is_clusters_overlapping(self, first, second):
+        return is_index_overlapping(
+            self.get_interval_index(first), self.get_interval_index(second))
+
+    def cluster(self, verbose=False, mode='dense'):
+        '''
+        Cluster the notegram groups by complete linkage.
+
+        mode: 'dense' clusters over the dissimilarity of all pairs of groups.
+        'sparse' only computes the dissimilarity of candidate pairs (see
+        get_candidate_pairs) and clusters over them, in memory linear in the
+        number of candidates.
+        '''
         notegram_group_list = [i for _, i in self.notegram_groups.items()]
-        distance_matrix = get_dissimilarity_matrix(notegram_group_list)
-
-        if verbose:
-            print(distance_matrix)
-            print("-----------------------\n")
-
-        models = AgglomerativeClustering(n_clusters=self.init_num_of_cluster, affinity='precomputed', linkage='complete')
-        db = models.fit(distance_matrix)
+        if mode == 'sparse':
+            labels = self.sparse_cluster_labels(notegram_group_list, verbose)
+        elif mode == 'dense':
+            distance_matrix = get_dissimilarity_matrix(
+                notegram_group_list, cache=self.encoding_cache)
+
+            if verbose:
+                print(distance_matrix)
+                print("-----------------------\n")
+
+            models = AgglomerativeClustering(n_clusters=self.init_num_of_cluster, affinity='precomputed', linkage='complete')
+            labels = models.fit(distance_matrix).labels_
+        else:
+            raise ValueError('Unknown clustering mode {!r}'.format(mode))
 
         notegram_group_by_label = defaultdict(lambda: [])
-        for i, label in enumerate(db.labels_):
+        for i, label in enumerate(labels):
             if label == -1:
                 continue
             notegram_group_by_label[label].append(self.notegram_groups[i])
 
-        clusters = defaultdict(lambda: [])
-
-        for group in set(i for i in db.labels_) - {-1}:
-            for label, notegram_group in zip(db.labels_, self.notegram_groups):
-                if label == group:
-                    clusters[str(label)].append(notegram_group)
+        clusters = {str(group): [] for group in set(i for i in labels) - {-1}}
+        for label, notegram_group in zip(labels, self.notegram_groups):
+            if label != -1:
+                clusters[str(label)].append(notegram_group)
 
         num_of_group_in_cluster = defaultdict(lambda: 0)
         for label, cluster in clusters.items():
@@ -250,16 +271,20 @@ class MotifAnalyzer(object):
 
         clusters = { label: cluster for label, cluster in clusters.items() if num_of_group_in_cluster[label] >= MIN_CLUSTER_SIZE and (num_of_group_in_cluster[label] - mean) / sd >= Z_SCORE_THRESHOLD }
 
-        # merge overlapping clusters together
+        # merge overlapping clusters together, updating the interval index
+        # of the merged cluster in place
+        indexes = {label: self.get_interval_index(cluster)
+                   for label, cluster in clusters.items()}
         queue = list(clusters.keys())
 
         while len(queue) > 0:
             first_label = queue.pop(0)
             for second_label in queue:
-                if self.is_clusters_overlapping(clusters[first_label], clusters[second_label]):
+                if is_index_overlapping(indexes[first_label], indexes[second_label]):
                     if verbose:
                         print('Merging cluster', first_label, 'and', second_label)
                     clusters[first_label] += clusters[second_label]
+                    indexes[first_label].merge(indexes.pop(second_label))
                     del clusters[second_label]
                     queue.remove(second_label)
                     queue.append(first_label)
@@ -279,6 +304,19 @@ class MotifAnalyzer(object):
 
         return new_clusters
 
+    def sparse_cluster_labels(self, notegram_group_list, verbose=False):
+        sequences = get_sequences(notegram_group_list, self.encoding_cache)
+        first, second = get_candidate_pairs(sequences)
+        distances = get_sparse_dissimilarity(sequences, first, second)
+
+        if verbose:
+            print(len(first), 'candidate pairs of', len(notegram_group_list), 'groups')
+            print("-----------------------\n")
+
+        return sparse_complete_linkage(
+            len(notegram_group_list), first, second, distances,
+            self.init_num_of_cluster)
+
     def highlight_notegram_group(self, notegram_group, label):
         label_index = int(label)
         first_label = '(' + label + ')'
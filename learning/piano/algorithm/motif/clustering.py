@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+import heapq
+
+import numpy as np
+
+
+def sparse_complete_linkage(n, first, second, distances, n_clusters):
+    '''
+    Complete-linkage agglomerative clustering of n points given the distances
+    of some pairs (first[k], second[k]) only. The distance of the other pairs
+    is taken as infinite, so two clusters are only merged if the distances of
+    all pairs across them are given.
+
+    The closest clusters are merged until n_clusters remain or no clusters
+    can be merged. Returns the labels of the points, numbered from 0 in order
+    of appearance.
+    '''
+    # links[a][b] = (complete-linkage distance, number of pairs given)
+    # between clusters a and b, for clusters with at least one pair given
+    links = [{} for _ in range(n)]
+    for a, b, d in zip(np.asarray(first).tolist(), np.asarray(second).tolist(),
+                       np.asarray(distances).tolist()):
+        if a != b:
+            links[a][b] = links[b][a] = (d, 1)
+    size = [1] * n
+    parent = list(range(n))
+
+    heap = [(d, min(a, b), max(a, b))
+            for a in range(n) for b, (d, _) in links[a].items() if a < b]
+    heapq.heapify(heap)
+
+    remaining = n
+    while remaining > n_clusters and heap:
+        d, a, b = heapq.heappop(heap)
+        if links[a].get(b) != (d, size[a] * size[b]):
+            # Outdated or incomplete
+            continue
+
+        # Merge b into a
+        del links[a][b], links[b][a]
+        size[a] += size[b]
+        size[b] = 0
+        for c, (dc, count) in links[b].items():
+            del links[c][b]
+            if c in links[a]:
+                da, count_a = links[a][c]
+                dc, count = max(da, dc), count_a + count
+            links[a][c] = links[c][a] = (dc, count)
+            # Links of a to clusters not linked to b are now incomplete
+            if count == size[a] * size[c]:
+                heapq.heappush(heap, (dc, min(a, c), max(a, c)))
+        links[b] = {}
+        parent[b] = a
+        remaining -= 1
+
+    labels = np.empty(n, dtype='int')
+    roots = {}
+    for i in range(n):
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        labels[i] = roots.setdefault(root, len(roots))
+    return labels
+
+
+class IntervalIndex(object):
+    '''
+    A multiset of half-open intervals [begin, end) with begin < end, kept as
+    sorted arrays of their begins and ends so that overlaps can be counted
+    with binary searches.
+    '''
+
+    def __init__(self, begins, ends):
+        self.begins = np.asarray(begins, dtype='float64')
+        self.ends = np.asarray(ends, dtype='float64')
+        self.sorted_begins = np.sort(self.begins)
+        self.sorted_ends = np.sort(self.ends)
+
+    def __len__(self):
+        return len(self.begins)
+
+    def count_overlaps(self, begins, ends):
+        '''
+        Number of intervals overlapping each [begins[k], ends[k]), or 0 if
+        the query is empty.
+        '''
+        # Intervals ending at or before begin also begin before end, so they
+        # are subtracted from those beginning before end
+        counts = (np.searchsorted(self.sorted_begins, ends, 'left') -
+                  np.searchsorted(self.sorted_ends, begins, 'right'))
+        counts[np.asarray(begins) >= np.asarray(ends)] = 0
+        return counts
+
+    def overlap_ratio(self, other):
+        '''
+        Fraction of the intervals of self overlapping any interval of other.
+        '''
+        if not len(self):
+            return 0.0
+        overlapping = other.count_overlaps(self.begins, self.ends) > 0
+        return np.count_nonzero(overlapping) / len(self)
+
+    def merge(self, other):
+        '''Add the intervals of other'''
+        self.begins = np.concatenate((self.begins, other.begins))
+        self.ends = np.concatenate((self.ends, other.ends))
+        # The stable sort merges the two sorted runs in linear time
+        self.sorted_begins = np.sort(np.concatenate(
+            (self.sorted_begins, other.sorted_begins)), kind='stable')
+        self.sorted_ends = np.sort(np.concatenate(
+            (self.sorted_ends, other.sorted_ends)), kind='stable')
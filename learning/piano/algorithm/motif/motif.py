@@ -8,13 +8,19 @@ class Motif(FeatureAlgorithm):
     dtype = 'float'
     range = (0, None)
 
+    def __init__(self, *, clustering='dense'):
+        super().__init__()
+        assert clustering in ('dense', 'sparse')
+        self.clustering = clustering
+        self.args = [], {'clustering': self.clustering}
+
     def run(self, score_obj):
         '''
         For each score, find out the motif and mark it
         '''
         analyzer = MotifAnalyzer(score_obj.score)
 
-        clusters = analyzer.cluster()
+        clusters = analyzer.cluster(mode=self.clustering)
 
         for label, cluster in clusters.items():
             count = sum((len(analyzer.notegram_groups[notegram_group]) for notegram_group in cluster), 0)
@@ -23,12 +23,14 @@ def nice_rhythm_sequence_func(note_list):
 
 class Notegram(object):
 
-    def __init__(self, note_list, offset):
+    def __init__(self, note_list, offset, key=None):
         if len(note_list) != len(offset):
             raise ValueError(
                 'Length of note_list mismatches with length of offset')
         self.note_list = note_list
         self.offset = offset
+        # str(self) if already known
+        self.key = key
 
     def __len__(self):
         return len(self.note_list)
@@ -37,6 +39,8 @@ class Notegram(object):
         return id(self)
 
     def __str__(self):  # this determines how notegram are grouped together
+        if self.key is not None:
+            return self.key
         note_list = self.note_list
         note_list = preprocess_note_list(note_list)
         return ';'.join(i[0] + ',' + i[1] for i in zip(
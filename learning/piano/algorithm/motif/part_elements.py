@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+import music21
+import numpy as np
+
+from ...note_table import TIE_CODES
+
+DEFAULT_VOICE = '1'
+
+
+def get_windows(a, size):
+    '''
+    A read-only view of the windows a[i:i + size] of the 1-d array a, one per
+    row.
+    '''
+    a = np.ascontiguousarray(a)
+    count = max(len(a) - size + 1, 0)
+    return np.lib.stride_tricks.as_strided(
+        a, (count, size), (a.strides[0], a.strides[0]), writeable=False)
+
+
+class PartElementTable(object):
+    '''
+    The notes, chords and rests of a part as arrays, read once from music21.
+    Elements are numbered in order of measure, voice and position in the
+    voice, and are only needed again to mark the notes found. Ties are coded
+    as in learning.piano.note_table.
+    '''
+
+    def __init__(self, part):
+        self.elements = []
+        self.offsets = []
+        # For each measure, the range of elements of each voice, or of the
+        # measure itself if it has no voices
+        self.measure_ranges = []
+
+        for measure in part.getElementsByClass('Measure'):
+            if measure.voices:
+                ranges = {}
+                for voice in measure.voices:
+                    start = len(self.elements)
+                    self.add_elements(measure, voice)
+                    ranges.setdefault(str(voice.id), (start, len(self.elements)))
+                self.measure_ranges.append(ranges)
+            else:
+                start = len(self.elements)
+                self.add_elements(measure, measure)
+                self.measure_ranges.append((start, len(self.elements)))
+
+        n = len(self.elements)
+        self.is_note = np.zeros(n, dtype='bool')
+        self.is_rest = np.zeros(n, dtype='bool')
+        is_note_or_rest = np.zeros(n, dtype='bool')
+        self.tie = np.zeros(n, dtype='int8')
+        self.ps = np.full(n, np.nan)
+        self.quarter_lengths = []
+        # Note names, with chords represented by their bass note
+        self.names = []
+        for k, element in enumerate(self.elements):
+            self.is_note[k] = isinstance(element, music21.note.Note)
+            self.is_rest[k] = element.isRest
+            is_note_or_rest[k] = isinstance(
+                element, (music21.note.Note, music21.note.Rest))
+            if element.tie is not None:
+                self.tie[k] = TIE_CODES.get(element.tie.type, 0)
+            if self.is_note[k]:
+                self.ps[k] = element.pitch.ps
+                self.names.append(element.name)
+            elif isinstance(element, music21.chord.Chord):
+                self.names.append(element.bass().name)
+            else:
+                self.names.append('R')
+            self.quarter_lengths.append(element.duration.quarterLength)
+        self.ql = np.array(self.quarter_lengths, dtype='float64')
+
+        self.next = self.get_next_elements(is_note_or_rest)
+        self.tie_to_next = np.zeros(n, dtype='bool')
+        has_next = self.next >= 0
+        self.tie_to_next[has_next] = self.is_tied(
+            np.flatnonzero(has_next), self.next[has_next])
+
+    def __len__(self):
+        return len(self.elements)
+
+    def add_elements(self, measure, container):
+        for element in container.notesAndRests:
+            self.elements.append(element)
+            self.offsets.append(measure.offset + element.offset)
+
+    def get_next_elements(self, is_note_or_rest):
+        '''
+        The index of element.next(('Rest', 'Note')) of each element, or -1.
+        This is the next note or rest in the voice (or measure) of the
+        element, otherwise the next one in the flattened part.
+        '''
+        n = len(self.elements)
+
+        # Order of the flattened part, by music21 sort tuple
+        order = sorted(range(n), key=lambda k: (
+            self.offsets[k], self.elements[k].priority,
+            self.elements[k].classSortOrder,
+            0 if self.elements[k].duration.isGrace else 1, k))
+        next_in_part = np.full(n, -1)
+        following = -1
+        for k in reversed(order):
+            next_in_part[k] = following
+            if is_note_or_rest[k]:
+                following = k
+
+        result = next_in_part.copy()
+        for ranges in self.measure_ranges:
+            for start, stop in (ranges.values() if isinstance(ranges, dict)
+                                else [ranges]):
+                following = -1
+                for k in range(stop - 1, start - 1, -1):
+                    if following >= 0:
+                        result[k] = following
+                    if is_note_or_rest[k]:
+                        following = k
+        return result
+
+    def is_tied(self, first, second):
+        '''
+        Whether the notes first are tied to the notes second (of the same
+        pitch).
+        '''
+        return (self.is_note[first] & self.is_note[second] &
+                np.isin(self.tie[first],
+                        (TIE_CODES['start'], TIE_CODES['continue'])) &
+                np.isin(self.tie[second],
+                        (TIE_CODES['continue'], TIE_CODES['stop'])) &
+                (self.ps[first] == self.ps[second]))
+
+    def get_voice_ids(self):
+        vids = set(vid for ranges in self.measure_ranges
+                   if isinstance(ranges, dict) for vid in ranges)
+        vids.add(DEFAULT_VOICE)
+        return sorted(vids)
+
+    def get_voice_sequence(self, vid):
+        '''
+        The elements of voice vid, taking the measures without voices as
+        the default voice. Returns the element indices and whether each
+        element is actually in voice vid.
+        '''
+        sequence, in_voice = [], []
+        for ranges in self.measure_ranges:
+            if isinstance(ranges, dict):
+                if vid not in ranges:
+                    continue
+                start, stop = ranges[vid]
+                real_vid = vid
+            else:
+                start, stop = ranges
+                real_vid = DEFAULT_VOICE
+            sequence.extend(range(start, stop))
+            in_voice.extend([real_vid == vid] * (stop - start))
+        return (np.array(sequence, dtype='int'),
+                np.array(in_voice, dtype='bool'))
@@ -2,8 +2,10 @@
 
 import numpy as np
 
-from .algorithms import MotifAnalyzerAlgorithms
-from .alignment import align_sequences, align_one_to_many
+from collections import OrderedDict
+
+from .algorithms import MotifAnalyzerAlgorithms, preprocess_note_list
+from .alignment import align_sequences, align_all_pairs, align_pairs
 
 sequence_func_list = [
     (MotifAnalyzerAlgorithms.note_sequence_func, 1),
@@ -15,6 +17,16 @@ sequence_func_list = [
     (MotifAnalyzerAlgorithms.rhythm_transition_sequence_func, 1),
 ]
 
+# Candidate pairs (see get_candidate_pairs) come from buckets of groups with
+# equal sequences, or equal sequences with one symbol deleted. Buckets larger
+# than these sizes only pair each group with its BUCKET_WINDOW neighbours in
+# sorted order.
+MAX_BUCKET_SIZE = 1000
+MAX_EDIT_BUCKET_SIZE = 50
+BUCKET_WINDOW = 10
+
+ENCODING_CACHE_SIZE = 10000
+
 def get_dissimilarity(first, second):
     # get a single notegram to represent the whole group
     first_note_list = first[0].get_note_list()
@@ -30,20 +42,61 @@ def get_dissimilarity(first, second):
     # return sum((i ** 2 for i in score), 0) ** 0.5 # squared sum
     return 1.0 / sum((1.0 / (i + 0.1) for i in score), 0)
 
-def get_dissimilarity_matrix(notegram_group_list, vectorize=True):
+def get_content_key(note_list):
+    '''
+    What the sequences of sequence_func_list depend on in a preprocessed note
+    list: the rests, names, pitches and lengths of the notes, and the notes
+    equal to the first one (see note_vector_sequence_func).
+    '''
+    reference = note_list[0]
+    return tuple(
+        (n.isRest, None if n.isRest else n.name,
+         None if n.isRest else n.pitch.ps, n.duration.quarterLength,
+         n == reference)
+        for n in note_list)
+
+class EncodingCache(object):
+    '''
+    The sequences of every encoding in sequence_func_list of note lists,
+    keyed by content. Keeps at most maxsize entries, dropping the least
+    recently used.
+    '''
+
+    def __init__(self, maxsize=ENCODING_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, note_list):
+        # preprocess once for all the encodings
+        note_list = preprocess_note_list(note_list)
+        key = get_content_key(note_list)
+        sequences = self.entries.get(key)
+        if sequences is None:
+            sequences = self.entries[key] = [
+                func(note_list) for func, _ in sequence_func_list]
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        else:
+            self.entries.move_to_end(key)
+        return sequences
+
+def get_dissimilarity_matrix(notegram_group_list, vectorize=True, cache=None):
     n = len(notegram_group_list)
 
     scores = np.zeros((len(sequence_func_list), n, n))
 
-    for k, (func, multiplier) in enumerate(sequence_func_list):
-        seqs = [func(group[0].get_note_list()) for group in notegram_group_list]
-
+    sequences = get_sequences(notegram_group_list, cache)
+    for k, ((_, multiplier), seqs) in enumerate(
+            zip(sequence_func_list, sequences)):
         if vectorize:
-            jseqs = seqs[:]
-            while len(jseqs) > 1:
-                i = len(jseqs) - 1
-                iseq = jseqs.pop()
-                scores[k, i, 0:i] = align_one_to_many(iseq, jseqs) * multiplier
+            for start, stop, s, lens in align_all_pairs(seqs):
+                lower = np.arange(stop) < np.arange(start, stop)[:, np.newaxis]
+                d = np.divide(lens - s, lens, out=np.zeros(lens.shape),
+                              where=lower)
+                scores[k, start:stop, :stop][lower] = d[lower] * multiplier
         else:
             for i, iseq in enumerate(seqs):
                 for j, jseq in enumerate(seqs):
@@ -58,3 +111,85 @@ def get_dissimilarity_matrix(notegram_group_list, vectorize=True):
     D = D + D.T - np.diag(np.diag(D))
 
     return D
+
+
+def get_sequences(notegram_group_list, cache=None):
+    '''
+    For each encoding in sequence_func_list, the sequence of each group.
+    '''
+    if cache is None:
+        cache = EncodingCache()
+    encodings = [cache.get(group[0].get_note_list())
+                 for group in notegram_group_list]
+    return [[sequences[k] for sequences in encodings]
+            for k in range(len(sequence_func_list))]
+
+def get_candidate_pairs(sequences, max_bucket_size=MAX_BUCKET_SIZE,
+                        max_edit_bucket_size=MAX_EDIT_BUCKET_SIZE,
+                        window=BUCKET_WINDOW):
+    '''
+    Pairs of groups (first[k], second[k]), first[k] > second[k], that are
+    likely to be similar, given the sequences from get_sequences.
+
+    For each encoding, a group is put in the bucket of its sequence, and in
+    edit buckets for its sequence and its sequence with one symbol deleted,
+    so that sequences one substitution or insertion apart share a bucket.
+    Groups in a bucket
+    are paired, but in buckets with more groups than max_bucket_size (or
+    max_edit_bucket_size for deletions), each group is only paired with the
+    next `window` groups ordered by their note and rhythm sequences.
+
+    An equal sequence brings the dissimilarity of two groups below that of
+    most other pairs, so complete linkage over these pairs mostly finds the
+    clusters found over all pairs.
+    '''
+    n = len(sequences[0])
+    order = sorted(range(n), key=lambda i: (sequences[0][i], sequences[1][i]))
+    rank = np.empty(n, dtype='int')
+    rank[order] = np.arange(n)
+
+    buckets = {}
+    for k, seqs in enumerate(sequences):
+        for i, seq in enumerate(seqs):
+            if not seq:
+                continue
+            seq = tuple(seq)
+            buckets.setdefault((k, False, seq), []).append(i)
+            keys = {seq}
+            keys.update(seq[:j] + seq[j + 1:] for j in range(len(seq)))
+            for key in keys:
+                buckets.setdefault((k, True, key), []).append(i)
+
+    first, second = [], []
+    for (_, edit, _), members in buckets.items():
+        if len(members) < 2:
+            continue
+        members = np.array(members)
+        if len(members) > (max_edit_bucket_size if edit else max_bucket_size):
+            members = members[np.argsort(rank[members], kind='stable')]
+            for offset in range(1, window + 1):
+                first.append(members[offset:])
+                second.append(members[:-offset])
+        else:
+            a, b = np.triu_indices(len(members), 1)
+            first.append(members[a])
+            second.append(members[b])
+
+    first = np.concatenate(first or [np.zeros(0, dtype='int')])
+    second = np.concatenate(second or [np.zeros(0, dtype='int')])
+    pairs = np.unique(np.maximum(first, second) * n + np.minimum(first, second))
+    return (pairs // n).astype('int32'), (pairs % n).astype('int32')
+
+def get_sparse_dissimilarity(sequences, first, second):
+    '''
+    The dissimilarity of the groups first[k] and second[k], given the
+    sequences from get_sequences, as in get_dissimilarity_matrix before it
+    is made symmetric.
+    '''
+    scores = np.zeros((len(sequence_func_list), len(first)))
+    for k, (seqs, (_, multiplier)) in enumerate(zip(sequences, sequence_func_list)):
+        s, lens = align_pairs(seqs, first, second)
+        scores[k] = (lens - s) / lens * multiplier
+
+    # Smoothed harmonic mean
+    return 1.0 / np.sum(1.0 / (scores + 0.1), axis=0)
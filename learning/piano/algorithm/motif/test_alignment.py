@@ -0,0 +1,48 @@
+import random
+
+import numpy as np
+import pytest
+
+from . import alignment
+from .alignment import align_all_pairs, global_alignment, global_alignment_vec
+
+
+@pytest.fixture(params=['ext', 'vec'])
+def kernel(request, monkeypatch):
+    if request.param == 'ext':
+        if alignment.alignment_ext is None:
+            pytest.skip('alignment_ext is not built')
+    else:
+        monkeypatch.setattr(alignment, 'alignment_ext', None)
+
+
+def random_sequences(count, seed=0):
+    rng = random.Random(seed)
+    return [[rng.choice('abcd') for _ in range(rng.randint(1, 10))]
+            for _ in range(count)]
+
+
+@pytest.mark.parametrize('scores', [(1, 0, 0), (2, 1, 0), (3, 0, 1)])
+def test_align_all_pairs(kernel, scores):
+    seqs = random_sequences(25)
+    match, mismatch, indel = scores
+    seen = 0
+    for start, stop, s, lens in align_all_pairs(seqs, *scores, block_size=60):
+        assert s.shape == lens.shape == (stop - start, stop)
+        for r in range(stop - start):
+            for j in range(start + r):
+                assert (s[r, j], lens[r, j]) == global_alignment(
+                    seqs[start + r], seqs[j], match=match, mismatch=mismatch,
+                    indel=indel)
+        seen = stop
+    assert seen == len(seqs)
+
+
+def test_align_all_pairs_vec(kernel):
+    seqs = random_sequences(20, seed=1)
+    for start, stop, s, l in align_all_pairs(seqs, block_size=1):
+        for r in range(max(start, 1) - start, stop - start):
+            i = start + r
+            vs, vl = global_alignment_vec(seqs[i], seqs[:i])
+            assert np.array_equal(s[r, :i], vs)
+            assert np.array_equal(l[r, :i], vl)
@@ -0,0 +1,63 @@
+import numpy as np
+
+from .clustering import IntervalIndex, sparse_complete_linkage
+from .similarity import get_candidate_pairs
+
+
+def all_pairs(points):
+    first, second = np.tril_indices(len(points), -1)
+    return first, second, np.abs(points[first] - points[second])
+
+
+def test_sparse_complete_linkage():
+    points = np.array([0.0, 0.1, 0.3, 5.0, 5.2, 9.0])
+    first, second, distances = all_pairs(points)
+
+    labels = sparse_complete_linkage(len(points), first, second, distances, 3)
+    assert labels.tolist() == [0, 0, 0, 1, 1, 2]
+
+    labels = sparse_complete_linkage(len(points), first, second, distances, 1)
+    assert labels.tolist() == [0] * 6
+
+
+def test_sparse_complete_linkage_missing_pairs():
+    points = np.array([0.0, 0.1, 0.3, 5.0])
+    first, second, distances = all_pairs(points)
+
+    # Without the pair (2, 0), 2 cannot join the cluster of 0 and 1, and the
+    # clusters stop merging before reaching n_clusters
+    keep = ~((first == 2) & (second == 0))
+    labels = sparse_complete_linkage(
+        len(points), first[keep], second[keep], distances[keep], 1)
+    assert labels.tolist() == [0, 0, 1, 1]
+
+
+def test_get_candidate_pairs():
+    notes = [list('CDEF'), list('CDEG'), list('GABC'), list('CDF')]
+    rhythms = [['1.0'] * 4, ['0.5'] * 4, ['2.0'] * 4, ['1.0'] * 3]
+    first, second = get_candidate_pairs([notes, rhythms])
+    # CDEG and CDF are two edits apart
+    assert sorted(zip(first.tolist(), second.tolist())) == [(1, 0), (3, 0)]
+
+    # Groups in a large bucket are only paired with their neighbours
+    first, second = get_candidate_pairs(
+        [[list('CDEF')] * 5, [['1.0']] * 5], max_bucket_size=3,
+        max_edit_bucket_size=3, window=1)
+    assert sorted(zip(first.tolist(), second.tolist())) == [
+        (1, 0), (2, 1), (3, 2), (4, 3)]
+
+
+def test_interval_index():
+    index = IntervalIndex([0, 2, 4], [2, 3, 8])
+    counts = index.count_overlaps(
+        np.array([1, 2, 3, 8, 5]), np.array([2, 4, 4, 9, 5]))
+    assert counts.tolist() == [1, 1, 0, 0, 0]
+
+    other = IntervalIndex([1, 7], [2, 9])
+    assert other.overlap_ratio(index) == 1.0
+    assert index.overlap_ratio(other) == 2 / 3
+
+    index.merge(IntervalIndex([8], [10]))
+    assert len(index) == 4
+    assert index.count_overlaps(np.array([8.5]), np.array([9])).tolist() == [1]
+    assert index.overlap_ratio(other) == 3 / 4
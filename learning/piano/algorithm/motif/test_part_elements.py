@@ -0,0 +1,68 @@
+import music21
+
+from .analyzer import MotifAnalyzer
+from .notegram import Notegram
+from .part_elements import PartElementTable
+
+
+def parse_part(notation):
+    return music21.converter.parse('tinyNotation: 4/4 ' + notation)
+
+
+def assert_next(table):
+    for k, element in enumerate(table.elements):
+        following = element.next(('Rest', 'Note'))
+        assert table.next[k] == (
+            table.elements.index(following) if following is not None else -1)
+
+
+def test_part_element_table():
+    part = parse_part('C4 D4~ D4 E4 F4 r4 B4 G4')
+    measure = part.getElementsByClass('Measure')[1]
+    measure.replace(measure.notes[1], music21.chord.Chord(['E4', 'C4']))
+    table = PartElementTable(part)
+
+    assert table.names == ['C', 'D', 'D', 'E', 'F', 'R', 'C', 'G']
+    assert table.offsets == [0, 1, 2, 3, 4, 5, 6, 7]
+    assert table.tie_to_next.tolist() == [
+        False, True, False, False, False, False, False, False]
+    # next skips the chord, as element.next(('Rest', 'Note')) does
+    assert_next(table)
+
+
+def test_part_element_table_voices():
+    part = parse_part('C4 D4 E4 F4 G4 A4 B4 c4 d1')
+    # Two voices in the middle measure, the second starting with a rest
+    measure = part.getElementsByClass('Measure')[1]
+    upper = music21.stream.Voice(id='1')
+    lower = music21.stream.Voice(id='2')
+    for n in list(measure.notes):
+        offset = n.offset
+        measure.remove(n)
+        upper.insert(offset, n)
+    lower.insert(0, music21.note.Rest(quarterLength=2))
+    lower.insert(2, music21.note.Note('C3', quarterLength=2))
+    measure.insert(0, upper)
+    measure.insert(0, lower)
+    table = PartElementTable(part)
+
+    assert table.names == ['C', 'D', 'E', 'F', 'G', 'A', 'B', 'C', 'R', 'C',
+                           'D']
+    assert table.offsets == [0, 1, 2, 3, 4, 5, 6, 7, 4, 6, 8]
+    assert table.get_voice_ids() == ['1', '2']
+    sequence, in_voice = table.get_voice_sequence('2')
+    assert sequence.tolist() == [0, 1, 2, 3, 8, 9, 10]
+    assert in_voice.tolist() == [False] * 4 + [True] * 2 + [False]
+    assert_next(table)
+
+
+def test_notegram_keys():
+    score = music21.stream.Score()
+    score.insert(0, parse_part('C8 D8 E4~ E4 F4 G4 A8 B8 c4 d2'))
+    score.atSoundingPitch = True
+    analyzer = MotifAnalyzer(score)
+
+    assert analyzer.notegram_groups
+    for key, notegram_group in analyzer.notegram_groups.items():
+        for notegram in notegram_group:
+            assert key == str(Notegram(notegram.note_list, notegram.offset))
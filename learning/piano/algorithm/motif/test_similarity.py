@@ -0,0 +1,28 @@
+import music21
+
+from .similarity import EncodingCache, sequence_func_list
+
+
+def parse_note_list(notation):
+    score = music21.converter.parse('tinyNotation: 4/4 ' + notation)
+    return list(score.recurse().getElementsByClass(('Note', 'Rest')))
+
+
+def test_encoding_cache():
+    cache = EncodingCache(maxsize=2)
+    note_list = parse_note_list('C4 D8~ D8 r4 F4')
+
+    sequences = cache.get(note_list)
+    assert sequences == [func(note_list) for func, _ in sequence_func_list]
+
+    # Keyed by content, not by the note list
+    assert cache.get(parse_note_list('C4 D8~ D8 r4 F4')) is sequences
+    assert len(cache) == 1
+
+    # Different octave, different pitch sequences
+    assert cache.get(parse_note_list('c4 d8~ d8 r4 f4')) is not sequences
+    assert len(cache) == 2
+
+    cache.get(parse_note_list('C4 E4 G4 c4'))
+    assert len(cache) == 2
+    assert cache.get(note_list) is not sequences
@@ -1,7 +1,6 @@
-from .base import FeatureAlgorithm, get_markings, iter_notes
+from .base import FeatureAlgorithm, group_index
 
-from music21 import stream
-from collections import Counter
+import numpy as np
 
 
 class Occurrence(FeatureAlgorithm):
@@ -12,18 +11,18 @@ class Occurrence(FeatureAlgorithm):
         For each measure in each voice, the notes with the pitch class(es) that
         appears the most are marked, unless the max frequency is <= 1.
         '''
-        for bar in score_obj.by_bar:
-            measures = bar.recurse(skipSelf=False).getElementsByClass(stream.Measure)
-            for measure in measures:
-                for voice in measure.voices or [measure]:
-                    counter = Counter(n.name for n in iter_notes(voice))
-                    counter.setdefault('C', 0)  # so that max doesn't fail
-                    max_freq = max(counter.values())
+        table = score_obj.note_table
+        if not len(table):
+            return
 
-                    if max_freq > 1:
-                        pitch_classes = {ps for ps, freq in counter.items()
-                                         if freq == max_freq}
-                    else:
-                        pitch_classes = set()
-                    for n in iter_notes(voice):
-                        get_markings(n)[self.key] = n.name in pitch_classes
+        voice, _ = group_index(table.bar, table.part, table.measure_voice)
+        pitch, n_pitches = group_index(voice, table.name)
+
+        # Frequency of each (voice, pitch name), and the max in each voice
+        freq = np.bincount(pitch, minlength=n_pitches)
+        max_freq = np.zeros(voice.max() + 1, dtype=freq.dtype)
+        np.maximum.at(max_freq, voice, freq[pitch])
+
+        mark = (freq[pitch] == max_freq[voice]) & (max_freq[voice] > 1)
+        # Notes outside the voices of a measure with voices are not visited
+        score_obj.annotate(mark, self.key, where=table.measure_voice >= 0)
@@ -1,63 +1,40 @@
-from .base import FeatureAlgorithm, get_markings
+from .base import FeatureAlgorithm, group_index
+from ..smoothing import gaussian_filter
 
 import numpy as np
-import scipy.special
 
 
 BLUR_RADIUS = 4.0  # Standard deviation of Gaussian filter
 BLUR_SIZE = 5  # Size of Gaussian filter in sigmas
 
 
-def window_at(seq, offsets, durations, index, radius):
-    '''Get the continuous window centred at the start of seq[i].'''
-    centre = offsets[index]
-    result = []
-    for j in reversed(range(0, index)):
-        if offsets[j] + durations[j] - centre <= -radius:
-            break
-        result.append(
-            (seq[j], (max(-radius, offsets[j] - centre), offsets[j] + durations[j] - centre)))
-    result.reverse()
-
-    for j in range(index, len(seq)):
-        if offsets[j] - centre >= radius:
-            break
-        result.append(
-            (seq[j], (offsets[j] - centre, min(radius, offsets[j] + durations[j] - centre))))
-
-    return result
-
-
-def gaussian_cdf(x, sigma):
-    return 0.5 * (1 + scipy.special.erf(x / sigma / np.sqrt(2)))
-
-
-def gaussian_filter(seq, offsets, durations, *, sigma):
-    result = np.empty_like(seq)
-    for i in range(len(seq)):
-        win = window_at(seq, offsets, durations, i, BLUR_SIZE * sigma)
-        result[i] = sum(x * (gaussian_cdf(r, sigma) - gaussian_cdf(l, sigma)) for x, (l, r) in win)
-    return result
-
-
 class OutputCountEstimate(FeatureAlgorithm):
     dtype = 'float'
     range = (0.0, None)
 
     def run(self, score_obj):
-        it = list(score_obj.iter_offsets())
-        offsets = np.asarray([offset for offset, _ in it])
-        notes_list = [notes for _, notes in it]
+        table = score_obj.note_table
+        if not len(table):
+            return
+
+        # Onsets in the order of score_obj.iter_offsets()
+        onset, n_onsets = group_index(table.bar, table.local_offset)
+        offsets = np.empty(n_onsets)
+        offsets[onset] = table.offset
 
         durations = np.empty_like(offsets)
         durations[:-1] = offsets[1:] - offsets[:-1]
         durations[-1] = 4.0  # Assume a value for simplicity
 
-        in_counts = np.asarray(
-            [len({n.pitch.ps for n in notes}) for notes in notes_list], dtype='float')
+        # Number of distinct pitches in each onset
+        pitch, n_pitches = group_index(onset, table.ps)
+        pitch_onset = np.empty(n_pitches, dtype='int')
+        pitch_onset[pitch] = onset
+        in_counts = np.bincount(pitch_onset, minlength=n_onsets).astype('float')
         in_rates = in_counts / durations
 
-        base = gaussian_filter(in_rates, offsets, durations, sigma=BLUR_RADIUS)
+        base = gaussian_filter(in_rates, offsets, durations,
+                               sigma=BLUR_RADIUS, size=BLUR_SIZE)
         base += 0.01  # Smoothing term
         detail = in_rates / base
 
@@ -65,6 +42,4 @@ class OutputCountEstimate(FeatureAlgorithm):
         out_rates = 1.61 * base**0.545 * detail**0.759
         out_counts = out_rates * durations
 
-        for notes, out_count in zip(notes_list, out_counts):
-            for n in notes:
-                get_markings(n)[self.key] = out_count
+        score_obj.annotate(out_counts[onset], self.key)
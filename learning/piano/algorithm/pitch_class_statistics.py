@@ -1,7 +1,6 @@
-from .base import FeatureAlgorithm, get_markings, iter_notes
+from .base import FeatureAlgorithm
 
 import numpy as np
-from collections import Counter
 
 
 PITCH_CLASSES = list(range(12))
@@ -16,18 +15,20 @@ class PitchClassStatistics(FeatureAlgorithm):
         '''
         In each bar, a histogram of the pitch classes is constructed.
         '''
-        for bar in score_obj.by_bar:
-            counter = Counter(
-                n.pitch.pitchClass for n in iter_notes(bar, recurse=True))
-
-            histogram = [counter[i] for i in PITCH_CLASSES]
-
-            # Normalize the histogram
-            norm = np.linalg.norm(histogram)
-            norm = norm or 1  # Avoid division by zero
-            histogram = [x / norm for x in histogram]
-
-            marks = dict(zip(self.all_keys, histogram))
-
-            for n in iter_notes(bar, recurse=True):
-                get_markings(n).update(marks)
+        table = score_obj.note_table
+        if not len(table):
+            return
+
+        n_bars = table.bar.max() + 1
+        histograms = np.bincount(
+            table.bar * len(PITCH_CLASSES) + table.pitch_class,
+            minlength=n_bars * len(PITCH_CLASSES))
+        histograms = histograms.reshape(n_bars, len(PITCH_CLASSES))
+
+        # Normalize the histograms
+        norms = np.linalg.norm(histograms, axis=1)
+        norms[norms == 0] = 1  # Avoid division by zero
+        histograms = histograms / norms[:, np.newaxis]
+
+        for key, pc in zip(self.all_keys, PITCH_CLASSES):
+            score_obj.annotate(histograms[table.bar, pc], key)
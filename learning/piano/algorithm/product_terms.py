@@ -42,10 +42,17 @@ class ProductTerms(FeatureAlgorithm):
     def all_keys(self):
         return [*self.base_keys, *self.composite_keys]
 
+    @property
+    def dependencies(self):
+        return self.algos
+
     def run(self, score_obj):
         for algo in self.algos:
             algo.run(score_obj)
 
+        self.compute(score_obj)
+
+    def compute(self, score_obj):
         for key, factors in self.composite_key_defs.items():
             for n in score_obj:
                 value = get_markings(n).get(factors[0], 0)
@@ -1,6 +1,6 @@
-from .base import FeatureAlgorithm, get_markings, iter_notes
+from .base import FeatureAlgorithm
 
-from music21 import stream
+import numpy as np
 
 
 class SustainedRhythm(FeatureAlgorithm):
@@ -11,22 +11,17 @@ class SustainedRhythm(FeatureAlgorithm):
         In each bar, the non-empty part(s) with the least number of notes is
         marked.
         '''
-        for bar in score_obj.by_bar:
-            best_note_count, best_measures = 10 ** 9, set()
+        table = score_obj.note_table
+        if not len(table):
+            return
 
-            # Each part has only one measure
-            for measure in bar.recurse(
-                    skipSelf=False).getElementsByClass(stream.Measure):
-                count = sum(1 for _ in iter_notes(measure, recurse=True))
-                if not count:
-                    continue
-                if count < best_note_count:
-                    best_note_count, best_measures = count, {measure}
-                elif count == best_note_count:
-                    best_measures.add(measure)
+        # counts[bar, part] = no. of notes in the measure
+        n_bars, n_parts = table.bar.max() + 1, table.part.max() + 1
+        counts = np.bincount(table.bar * n_parts + table.part,
+                             minlength=n_bars * n_parts)
+        counts = counts.reshape(n_bars, n_parts)
 
-            for measure in bar.recurse(
-                    skipSelf=False).getElementsByClass(stream.Measure):
-                mark = measure in best_measures
-                for n in iter_notes(measure, recurse=True):
-                    get_markings(n)[self.key] = mark
+        nonempty = np.where(counts > 0, counts, np.iinfo(counts.dtype).max)
+        best_note_count = nonempty.min(axis=1)
+        mark = counts[table.bar, table.part] == best_note_count[table.bar]
+        score_obj.annotate(mark, self.key)
@@ -1,6 +1,6 @@
-from .base import FeatureAlgorithm, get_markings, iter_notes
+from .base import FeatureAlgorithm, group_index
 
-from collections import Counter, defaultdict
+import numpy as np
 
 
 class VerticalDoubling(FeatureAlgorithm):
@@ -11,17 +11,12 @@ class VerticalDoubling(FeatureAlgorithm):
         In each offset, notes with a pitch class that appears at least twice is
         marked.
         '''
-        for bar in score_obj.by_bar:
-            # counters[offset][pitch_class] =
-            #   no. of times pitch_class occurs at offset
-            counters = defaultdict(lambda: Counter())
-            for n in iter_notes(bar, recurse=True):
-                counters[n.offset][n.name] += 1
+        table = score_obj.note_table
+        if not len(table):
+            return
 
-            pitch_classes = {}
-            for offset, counter in counters.items():
-                pitch_classes[offset] = {pc for pc, freq in counter.items()
-                                         if freq >= 2}
-
-            for n in iter_notes(bar, recurse=True):
-                get_markings(n)[self.key] = n.name in pitch_classes[n.offset]
+        # Offsets are n.offset, which is 0 for all notes in chords
+        pitch, n_pitches = group_index(
+            table.bar, table.site_offset, table.name)
+        freq = np.bincount(pitch, minlength=n_pitches)
+        score_obj.annotate(freq[pitch] >= 2, self.key)
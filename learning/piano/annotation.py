@@ -0,0 +1,282 @@
+from collections.abc import MutableMapping
+from fractions import Fraction
+import numpy as np
+
+
+BOOL = 'bool'
+INT = 'int'
+FLOAT = 'float'
+CATEGORICAL = 'categorical'
+
+
+def value_kind(value):
+    '''
+    Returns the column kind that can hold the given value.
+    '''
+    if isinstance(value, (bool, np.bool_)):
+        return BOOL
+    if isinstance(value, np.integer) or (
+            isinstance(value, int) and -2 ** 63 <= value < 2 ** 63):
+        return INT
+    if isinstance(value, (float, np.floating, Fraction)):
+        return FLOAT
+    return CATEGORICAL
+
+
+class AnnotationColumn(object):
+    '''
+    A typed column of annotations, one entry per note. Bool, int and float
+    values are stored in NumPy arrays directly; any other value (strings,
+    None, lists, ...) is stored as an index into self.categories.
+    '''
+    def __init__(self, size, kind):
+        self.kind = kind
+        self.present = np.zeros(size, dtype='bool')
+        if kind == BOOL:
+            self.values = np.zeros(size, dtype='bool')
+        elif kind == INT:
+            self.values = np.zeros(size, dtype='int64')
+        elif kind == FLOAT:
+            self.values = np.zeros(size, dtype='float')
+        else:
+            self.values = np.zeros(size, dtype='int32')
+            self.categories = []
+            self._codes = {}
+
+    def encode(self, value):
+        try:
+            code = self._codes.get((type(value), value))
+        except TypeError:  # Unhashable, e.g. a list
+            for code, c in enumerate(self.categories):
+                if type(c) is type(value) and c == value:
+                    return code
+            code = None
+        else:
+            if code is not None:
+                return code
+            self._codes[(type(value), value)] = len(self.categories)
+        self.categories.append(value)
+        return len(self.categories) - 1
+
+    def encode_array(self, values):
+        '''
+        Returns the codes of the values of a NumPy array, encoding each
+        distinct value once.
+        '''
+        uniques, inverse = np.unique(values, return_inverse=True)
+        codes = np.array([self.encode(v) for v in uniques.tolist()], dtype='int32')
+        return codes[inverse.reshape(-1)]
+
+    def get(self, i):
+        if self.kind == BOOL:
+            return bool(self.values[i])
+        elif self.kind == INT:
+            return int(self.values[i])
+        elif self.kind == FLOAT:
+            return float(self.values[i])
+        else:
+            return self.categories[self.values[i]]
+
+    def set(self, i, value):
+        if self.kind == CATEGORICAL:
+            self.values[i] = self.encode(value)
+        else:
+            self.values[i] = value
+        self.present[i] = True
+
+    def accepts(self, value):
+        return self.kind == CATEGORICAL or value_kind(value) == self.kind
+
+    def to_categorical(self):
+        '''
+        Returns a categorical copy of this column.
+        '''
+        col = AnnotationColumn(len(self.present), CATEGORICAL)
+        if self.kind == CATEGORICAL:
+            for i in np.flatnonzero(self.present):
+                col.set(i, self.get(i))
+        else:
+            col.values[self.present] = col.encode_array(self.values[self.present])
+            col.present[:] = self.present
+        return col
+
+    def to_arrays(self):
+        '''
+        Returns a dict of NumPy arrays representing this column, suitable for
+        np.savez, or None if the categories cannot be stored without pickling.
+        '''
+        arrays = {
+            'kind': np.array(self.kind),
+            'values': self.values,
+            'present': self.present,
+            }
+        if self.kind == CATEGORICAL:
+            types = set(type(c) for c in self.categories)
+            if not types <= {int} and not types <= {str}:
+                return None
+            arrays['categories'] = np.array(self.categories)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        col = cls(len(arrays['present']), str(arrays['kind']))
+        col.values[:] = arrays['values']
+        col.present[:] = arrays['present']
+        if col.kind == CATEGORICAL:
+            for value in arrays['categories'].tolist():
+                col.encode(value)
+        return col
+
+    def to_array(self):
+        if self.kind == CATEGORICAL:
+            categories = np.empty(len(self.categories), dtype='object')
+            categories[:] = self.categories
+            return categories[self.values] if len(categories) \
+                else np.empty(len(self.values), dtype='object')
+        return self.values
+
+
+class AnnotationStore(object):
+    '''
+    Dense storage for the per-note annotations (features, labels and flags)
+    of a ScoreObject, with one typed column per key indexed by note index.
+    '''
+    def __init__(self, size):
+        self.size = size
+        self.columns = {}
+
+    def __contains__(self, key):
+        return key in self.columns
+
+    def _column_for(self, key, value):
+        col = self.columns.get(key)
+        if col is None:
+            col = self.columns[key] = AnnotationColumn(
+                self.size, value_kind(value))
+        elif not col.accepts(value):
+            col = self.columns[key] = col.to_categorical()
+        return col
+
+    def get(self, i, key):
+        col = self.columns.get(key)
+        if col is None or not col.present[i]:
+            raise KeyError(key)
+        return col.get(i)
+
+    def set(self, i, key, value):
+        self._column_for(key, value).set(i, value)
+
+    def delete(self, i, key):
+        col = self.columns.get(key)
+        if col is None or not col.present[i]:
+            raise KeyError(key)
+        col.present[i] = False
+
+    def keys_at(self, i):
+        return [key for key, col in self.columns.items() if col.present[i]]
+
+    def extract(self, key, dtype, **kwargs):
+        '''
+        Returns the column as a new array of the given dtype.
+
+        default: The value to use for notes without the annotation. If not
+            specified, a KeyError is raised for missing annotations.
+        '''
+        col = self.columns.get(key)
+        if col is None or not col.present.all():
+            if 'default' not in kwargs:
+                raise KeyError(key)
+            out = np.full(self.size, kwargs['default'], dtype=dtype)
+            if col is not None:
+                out[col.present] = col.to_array()[col.present]
+            return out
+        return col.to_array().astype(dtype)
+
+    def annotate(self, vector, key, where=None):
+        '''
+        Set the annotation for every note. None entries are skipped.
+
+        where: If given, a boolean mask of the notes to annotate.
+        '''
+        vector = np.asarray(vector)
+        assert len(vector) == self.size, 'Vector length mismatch'
+        if where is None:
+            where = np.ones(self.size, dtype='bool')
+
+        kind = {'b': BOOL, 'i': INT, 'f': FLOAT}.get(vector.dtype.kind)
+        if vector.dtype.kind == 'u' and vector.dtype.itemsize < 8:
+            kind = INT
+        col = self.columns.get(key)
+        if kind and (col is None or col.kind == kind):
+            if col is None:
+                col = self.columns[key] = AnnotationColumn(self.size, kind)
+            col.values[where] = vector[where]
+            col.present[where] = True
+        elif kind:
+            # Into a column of another kind, which becomes categorical
+            if col.kind != CATEGORICAL:
+                col = self.columns[key] = col.to_categorical()
+            col.values[where] = col.encode_array(vector[where])
+            col.present[where] = True
+        else:
+            values = vector.tolist()
+            for i in np.flatnonzero(where).tolist():
+                if values[i] is not None:
+                    self.set(i, key, values[i])
+
+
+class MarkingsView(MutableMapping):
+    '''
+    A dict-like view of the annotations of a single note, installed as
+    n.editorial.misc so that code reading and writing the markings of a note
+    keeps working.
+    '''
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, key):
+        return self.store.get(self.index, key)
+
+    def __setitem__(self, key, value):
+        self.store.set(self.index, key, value)
+
+    def __delitem__(self, key):
+        self.store.delete(self.index, key)
+
+    def __iter__(self):
+        return iter(self.store.keys_at(self.index))
+
+    def __len__(self):
+        return len(self.store.keys_at(self.index))
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    # Copies (e.g. Scoreboard writer deep-copying the score) and pickles get
+    # a plain dict detached from the store
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return dict(self)
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+def attach_annotation_store(notes):
+    '''
+    Create an AnnotationStore for the given list of notes and install a
+    MarkingsView as the editorial.misc of each note. Existing markings are
+    imported into the store.
+    '''
+    store = AnnotationStore(len(notes))
+    for i, n in enumerate(notes):
+        misc = n.editorial.misc
+        if isinstance(misc, MarkingsView):
+            misc = dict(misc)
+        for key, value in misc.items():
+            store.set(i, key, value)
+        n.editorial.misc = MarkingsView(store, i)
+    return store
@@ -46,38 +46,33 @@ class ContractByPitchOnset(ContractionAlgorithm):
                     yield (score_obj.index(first), score_obj.index(n))
 
 
+def _find(parent, u):
+    # Find the root of u, halving the path on the way
+    while parent[u] != u:
+        parent[u] = parent[parent[u]]
+        u = parent[u]
+    return u
+
+
 def flatten_contractions(contractions, n):
     '''
     Flatten contractions.
 
     contractions: Iterator of (u, v) pairs indicating v is to be merged to u.
 
-    Returns a list of length n indicating the parent of the ith note.
+    Returns a list of length n indicating the parent of the ith note, which is
+    the smallest index in its connected component.
     '''
-    adj = [[] for _ in range(n)]
+    # Union-find, where the root of each set is always its smallest element
+    parent = list(range(n))
     for u, v in contractions:
-        adj[u].append(v)
-        adj[v].append(u)
-
-    P = [None] * n
-
-    for s in range(n):
-        if P[s] is not None:
-            continue
-
-        # Flood fill with BFS
-        queue = [s]
-        while queue:
-            u = queue.pop(0)
-            if P[u] is not None:
-                continue
-            P[u] = s
+        ru, rv = _find(parent, u), _find(parent, v)
+        if ru < rv:
+            parent[rv] = ru
+        elif rv < ru:
+            parent[ru] = rv
 
-            for v in adj[u]:
-                if P[v] is None:
-                    queue.append(v)
-
-    return P
+    return [_find(parent, u) for u in range(n)]
 
 
 def compute_contraction_mapping(P):
@@ -87,69 +82,183 @@ def compute_contraction_mapping(P):
 
     Returns (mapping, new length).
     '''
-    mapping = {}
-    C = []
-    for g in P:
-        if g not in mapping:
-            mapping[g] = len(mapping)
-        C.append(mapping[g])
+    P = np.asarray(P, dtype='int')
+    if not len(P):
+        return [], 0
+
+    # Number the groups by their first appearance
+    _, first, inverse = np.unique(P, return_index=True, return_inverse=True)
+    rank = np.empty(len(first), dtype='int')
+    rank[np.argsort(first, kind='stable')] = np.arange(len(first))
+
+    return rank[inverse].tolist(), len(first)
+
 
-    return C, len(mapping)
+def max_aggregator(x):
+    # A module-level function (not a lambda) so that mappings can be pickled
+    return np.max(x, axis=0)
+
+
+def _as_ufunc(aggregator):
+    '''
+    Returns the ufunc whose reduce is equivalent to the aggregator, or None.
+    '''
+    if aggregator is max_aggregator:
+        return np.maximum
+    if isinstance(aggregator, np.ufunc):
+        return aggregator
+    return None
 
 
 class IndexMapping:
-    '''A many-to-one/zero mapping.'''
+    '''
+    A many-to-one/zero mapping.
+
+    aggregator: How to combine the rows mapped to the same output. Either a
+        ufunc such as np.maximum or np.add, whose reduce is applied to the
+        rows, or a function taking a list of rows. Defaults to the maximum.
+    '''
     def __init__(self, mapping, output_size=None, aggregator=None):
         self.mapping = [m if m != -1 else None for m in mapping]
+        self.array = np.array([-1 if m is None else m for m in self.mapping],
+                              dtype='int')
 
         self.input_size = len(mapping)
         if output_size is None:
-            self.output_size = max((m + 1 for m in self.mapping if m is not None), default=0)
+            self.output_size = int(self.array.max()) + 1 if len(self.array) else 0
         else:
             self.output_size = output_size
 
-        self.aggregator = aggregator or (lambda x: np.max(x, axis=0))
+        self.aggregator = aggregator or max_aggregator
+        self.ufunc = _as_ufunc(self.aggregator)
+
+        # Input indices sorted by group, and the start of each group
+        valid = np.flatnonzero(self.array >= 0)
+        self.order = valid[np.argsort(self.array[valid], kind='stable')]
+        self.counts = np.bincount(self.array[valid], minlength=self.output_size)
+        self.starts = np.concatenate([[0], np.cumsum(self.counts)[:-1]]) \
+            if self.output_size else np.empty(0, dtype='int')
+
+    @property
+    def groups(self):
+        return [self.order[s:s + c].tolist()
+                for s, c in zip(self.starts, self.counts)]
 
-        self.groups = [[] for _ in range(self.output_size)]
-        for i, o in enumerate(self.mapping):
-            if o is not None:
-                self.groups[o].append(i)
+    def _reduce(self, items, order, starts, counts):
+        '''
+        Aggregate items[order] over the groups given by starts and counts.
+        Returns the results of the non-empty groups.
+        '''
+        nonempty = counts > 0
+        if self.ufunc is not None:
+            try:
+                values = np.asarray(items)
+            except ValueError:  # Ragged
+                values = None
+            if values is not None and values.dtype != object:
+                return self.ufunc.reduceat(
+                    values[order], starts[nonempty], axis=0)
+        return [self.aggregator([items[i] for i in order[s:s + c]])
+                for s, c in zip(starts[nonempty], counts[nonempty])]
 
     def map_matrix(self, matrix, default=None):
         assert len(matrix) == self.input_size
 
-        if isinstance(matrix, list):
+        is_list = isinstance(matrix, list)
+        if is_list:
             result = [None] * self.output_size
         else:
             result = np.empty((self.output_size, *matrix.shape[1:]), dtype=matrix.dtype)
-        for g, indices in enumerate(self.groups):
-            if indices:
-                result[g] = self.aggregator([matrix[i] for i in indices])
-            else:
+
+        nonempty = self.counts > 0
+        reduced = self._reduce(matrix, self.order, self.starts, self.counts)
+        if is_list:
+            for g, r in zip(np.flatnonzero(nonempty).tolist(), reduced):
+                result[g] = r
+            for g in np.flatnonzero(~nonempty).tolist():
                 result[g] = default
+        else:
+            if isinstance(reduced, list):
+                for g, r in zip(np.flatnonzero(nonempty), reduced):
+                    result[g] = r
+            else:
+                result[nonempty] = reduced
+            if not nonempty.all():
+                result[~nonempty] = default
 
         return result
 
+    def _group_edges(self, edges, first_appearance):
+        '''
+        Maps the edges, dropping those with a removed vertex and self-loops,
+        and groups the duplicated edges. Returns the unique undirected edges
+        (ordered by their first appearance, or sorted) and the grouping of
+        the input rows as (order, starts, counts).
+        '''
+        new_edges = self.array[edges]
+        keep = (new_edges >= 0).all(axis=1)  # Vertex does not exist in output
+        new_edges.sort(axis=1)
+        keep &= new_edges[:, 0] != new_edges[:, 1]  # Prohibit self-loops
+        kept = np.flatnonzero(keep)
+
+        unique, first, inverse = np.unique(
+            new_edges[kept].reshape(-1, 2), axis=0,
+            return_index=True, return_inverse=True)
+        group = inverse.reshape(-1)
+        if first_appearance:
+            rank = np.empty(len(first), dtype='int')
+            rank[np.argsort(first, kind='stable')] = np.arange(len(first))
+            group = rank[group]
+            unique = unique[np.argsort(rank)]
+
+        order = kept[np.argsort(group, kind='stable')]
+        counts = np.bincount(group, minlength=len(unique))
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype('int')
+        return unique, order, starts, counts
+
     def map_structure(self, structure):
-        groups = defaultdict(list)
-        for edge, feature in structure.items():
-            new_edge = self.mapping[edge[0]], self.mapping[edge[1]]
-            if new_edge[0] is None or new_edge[1] is None:  # Vertex does not exist in output
-                continue
-            new_edge = tuple(sorted(new_edge))
-            if new_edge[0] == new_edge[1]:  # Prohibit self-loops
-                continue
-            groups[new_edge].append(feature)
-
-        return {k: self.aggregator(v) for k, v in groups.items()}
+        if not structure:
+            return {}
+
+        edges = np.array(list(structure.keys()), dtype='int').reshape(-1, 2)
+        features = list(structure.values())
+
+        unique, order, starts, counts = self._group_edges(
+            edges, first_appearance=True)
+        if not len(unique):
+            return {}
+        reduced = self._reduce(features, order, starts, counts)
+
+        return {tuple(e): r for e, r in zip(unique.tolist(), reduced)}
+
+    def map_edges(self, E, F):
+        '''
+        The array version of map_structure. Returns a pair (E, F) of the sorted
+        unique edges in the output and their aggregated features.
+        '''
+        E = np.asarray(E, dtype='int').reshape(-1, 2)
+        F = np.asarray(F, dtype='float')
+        if F.ndim == 1:
+            F = F.reshape(-1, 1)
+
+        unique, order, starts, counts = self._group_edges(
+            E, first_appearance=False)
+        if not len(unique):
+            return unique, np.empty((0, F.shape[1]), dtype='float')
+        reduced = self._reduce(F, order, starts, counts)
+
+        return unique, np.asarray(reduced, dtype='float').reshape(
+            len(unique), F.shape[1])
 
     def unmap_matrix(self, matrix, default=None):
         assert len(matrix) == self.output_size
         matrix = np.asarray(matrix)
 
-        result = np.empty((self.input_size, *matrix.shape[1:]), dtype=matrix.dtype)
-        for i, o in enumerate(self.mapping):
-            result[i, ...] = matrix[o] if o is not None else default
+        result = matrix[np.maximum(self.array, 0)] if len(matrix) \
+            else np.empty((self.input_size, *matrix.shape[1:]), dtype=matrix.dtype)
+        missing = self.array < 0
+        if missing.any():
+            result[missing] = default
 
         return result
 
@@ -1,4 +1,3 @@
-import copy
 from .alignment import align_all_notes
 from .contraction import IndexMapping
 from .score import ScoreObject
@@ -11,7 +10,7 @@ def create_contracted_score_obj(entry, structure_data):
     the contracted annotations.
     '''
 
-    obj_copy = ScoreObject(copy.deepcopy(entry.input.score))
+    obj_copy = ScoreObject(entry.input.score)
     for n in obj_copy.notes:
         if entry.mapping.is_contracted(obj_copy.index(n)):
             n.editorial.misc['hand'] = None
@@ -19,7 +18,7 @@ def create_contracted_score_obj(entry, structure_data):
             n.editorial.misc['hand'] = RIGHT_HAND if n.pitch.ps >= 60 else LEFT_HAND
 
     contracted = MultipartReducer(obj_copy.score).reduce()
-    contracted_obj = ScoreObject(contracted)
+    contracted_obj = ScoreObject(contracted, copy=False)
     contracted = contracted_obj.score
 
     # Attach markings
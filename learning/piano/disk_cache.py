@@ -0,0 +1,108 @@
+import hashlib
+import logging
+import os
+import tempfile
+
+
+logger = logging.getLogger('learning.piano.disk_cache')
+
+
+def hash_file(fp):
+    '''
+    Returns the SHA-1 hex digest of the file content.
+    '''
+    h = hashlib.sha1()
+    with open(fp, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def hash_key(*parts):
+    '''
+    Returns a file name safe digest of the repr of the given parts.
+    '''
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+class DiskCache(object):
+    '''
+    A directory of cache files with a total size cap. When the cap is
+    exceeded, the least recently used files are evicted.
+    '''
+    suffix = '.cache'
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def read(self, key):
+        '''
+        Returns the content of the entry as bytes, or None on a miss.
+        '''
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        os.utime(path)  # Mark as recently used
+        return data
+
+    def write(self, key, data):
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Write atomically so that concurrent readers never see partial files
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+
+        self.evict()
+
+    def discard(self, key):
+        logger.warning('Discarding corrupted cache entry {}'.format(
+            self.path(key)))
+        self._remove(self.path(key))
+
+    def evict(self):
+        '''
+        Remove least recently used entries until the cache fits in max_size.
+        '''
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            logger.info('Evicting cache entry {}'.format(path))
+            self._remove(path)
+            total -= size
+
+    def clear(self):
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                self._remove(os.path.join(self.directory, name))
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,210 @@
+import ast
+import hashlib
+import importlib.util
+import io
+import logging
+import music21
+import numpy as np
+from .. import config
+from .annotation import AnnotationColumn
+from .disk_cache import DiskCache, hash_key
+from .score_cache import PREPROCESS_VERSION
+from .util import dump_algorithm
+
+
+logger = logging.getLogger('learning.piano.feature_store')
+
+# Bump this when the storage format changes
+FEATURE_STORE_VERSION = 1
+
+
+# Modules of this package are followed when looking for the code of an
+# algorithm
+PACKAGE = __name__.split('.')[0]
+
+
+def find_module(name):
+    try:
+        spec = importlib.util.find_spec(name)
+    except (ImportError, ValueError):
+        return None
+    if spec is None or not spec.has_location:
+        return None
+    return spec
+
+
+def iter_imports(name, spec):
+    '''
+    Yields the names of the modules imported anywhere in a module, including
+    inside functions, with relative imports resolved.
+    '''
+    is_package = spec.submodule_search_locations is not None
+    package = name if is_package else name.rpartition('.')[0]
+    with open(spec.origin, 'rb') as f:
+        tree = ast.parse(f.read())
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                yield alias.name
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module or ''
+            if node.level:
+                base = importlib.util.resolve_name('.' * node.level + base, package)
+            for alias in node.names:
+                # "from package import module" imports the module
+                sub = base + '.' + alias.name
+                yield sub if find_module(sub) else base
+
+
+def get_code_modules(algo):
+    '''
+    Returns the sorted names of the modules of this package that the
+    algorithm may run: the modules defining its class and base classes, the
+    score object, and every module of this package they import, directly
+    or not. Sub-algorithms (e.g. of ProductTerms) are included.
+    '''
+    pending = [cls.__module__ for cls in type(algo).__mro__]
+    pending.append(__name__.rpartition('.')[0] + '.score')
+    for sub in getattr(algo, 'algos', []):
+        pending.extend(get_code_modules(sub))
+
+    modules = {}
+    while pending:
+        name = pending.pop()
+        if name in modules or not name.startswith(PACKAGE + '.'):
+            continue
+        spec = find_module(name)
+        if spec is None:
+            continue
+        modules[name] = spec
+        if spec.origin.endswith('.py'):
+            pending.extend(iter_imports(name, spec))
+    return sorted(modules)
+
+
+def code_version(algo):
+    '''
+    Returns a digest of the code of the modules the algorithm may run (see
+    get_code_modules), so that cached features are invalidated when any of
+    them is edited. Algorithms can also bump a `version` class attribute,
+    e.g. for changes in other packages.
+    '''
+    h = hashlib.sha1()
+    h.update(repr(getattr(algo, 'version', None)).encode('utf-8'))
+    for sub in getattr(algo, 'algos', []):
+        h.update(repr(getattr(sub, 'version', None)).encode('utf-8'))
+    for name in get_code_modules(algo):
+        h.update(name.encode('utf-8'))
+        with open(find_module(name).origin, 'rb') as f:
+            h.update(hashlib.sha1(f.read()).digest())
+    return h.hexdigest()
+
+
+class FeatureStore(DiskCache):
+    '''
+    An on-disk cache of the marking columns created by each feature algorithm,
+    keyed by (input content hash, dump_algorithm(algo), code version).
+
+    Columns are stored by their position in algo.all_keys, so that entries
+    can be reused when the algorithm gets another key prefix in a different
+    system configuration.
+    '''
+    suffix = '.npz'
+
+    def __init__(self, directory=None, max_size=None):
+        super().__init__(
+            directory or config.FEATURE_CACHE_DIR,
+            max_size if max_size is not None else config.FEATURE_CACHE_SIZE)
+        self.hits = 0
+        self.misses = 0
+        self._versions = {}
+
+    def key(self, score_obj, algo):
+        if score_obj.content_hash is None:  # Not created from a file
+            return None
+        dump = dump_algorithm(algo)
+        # The code version depends on the sub-algorithms, so it is cached per
+        # configuration rather than per class
+        version = self._versions.get(repr(dump))
+        if version is None:
+            version = self._versions[repr(dump)] = code_version(algo)
+        return hash_key(
+            score_obj.content_hash, dump, version, FEATURE_STORE_VERSION,
+            PREPROCESS_VERSION, music21.VERSION_STR)
+
+    def load(self, score_obj, algo):
+        '''
+        Restore the markings of the algorithm into the score object. Returns
+        whether the entry was found.
+        '''
+        key = self.key(score_obj, algo)
+        data = self.read(key) if key else None
+        if data is None:
+            self.misses += 1
+            return False
+
+        try:
+            with np.load(io.BytesIO(data)) as npz:
+                arrays = dict(npz.items())
+            columns = {}
+            for j, k in enumerate(algo.all_keys):
+                prefix = '{}/'.format(j)
+                if prefix + 'kind' not in arrays:
+                    continue  # The algorithm did not create this marking
+                col = AnnotationColumn.from_arrays(
+                    {name[len(prefix):]: v for name, v in arrays.items()
+                     if name.startswith(prefix)})
+                if len(col.present) != len(score_obj):
+                    raise ValueError('Length mismatch')
+                columns[k] = col
+        except Exception:
+            self.discard(key)
+            self.misses += 1
+            return False
+
+        score_obj.annotations.columns.update(columns)
+        self.hits += 1
+        return True
+
+    def save(self, score_obj, algo):
+        '''
+        Store the markings created by the algorithm. Algorithms with markings
+        that cannot be stored without pickling are skipped.
+        '''
+        key = self.key(score_obj, algo)
+        if not key:
+            return
+
+        arrays = {}
+        for j, k in enumerate(algo.all_keys):
+            col = score_obj.annotations.columns.get(k)
+            if col is None:
+                continue
+            col_arrays = col.to_arrays()
+            if col_arrays is None:
+                logger.info('Not caching {}: marking {} is not storable'
+                            .format(type(algo).__name__, k))
+                return
+            for name, v in col_arrays.items():
+                arrays['{}/{}'.format(j, name)] = v
+
+        buf = io.BytesIO()
+        np.savez(buf, **arrays)
+        self.write(key, buf.getvalue())
+
+
+_default_store = None
+
+
+def get_default_store():
+    '''
+    Returns the default FeatureStore, or None if it is disabled
+    (config.FEATURE_CACHE_SIZE set to 0).
+    '''
+    global _default_store
+    if not config.FEATURE_CACHE_SIZE:
+        return None
+    if _default_store is None:
+        _default_store = FeatureStore()
+    return _default_store
@@ -0,0 +1,139 @@
+from music21 import chord, stream
+import numpy as np
+
+
+TIE_TYPES = (None, 'start', 'continue', 'stop')
+TIE_CODES = {t: i for i, t in enumerate(TIE_TYPES)}
+
+
+class NoteTable(object):
+    '''
+    A columnar view of all notes in a score, in the order used in the matrix
+    representation (i.e. the order of iter_notes(score, recurse=True)).
+
+    Each column is a NumPy array of length len(table), so that feature
+    algorithms can work on whole arrays instead of walking the music21 object
+    tree note by note:
+
+    - ps: MIDI pitch space value (float)
+    - pitch_class: 0-11
+    - name: index into self.names (spelled pitch name without octave)
+    - octave
+    - offset: absolute offset in quarter lengths
+    - local_offset: offset relative to the enclosing measure
+    - site_offset: n.offset, i.e. relative to the enclosing measure or voice
+      (0 for notes in a chord)
+    - duration: quarter length
+    - part: index into score.parts
+    - voice: index into the part's voices, as in ScoreObject.voices_by_part
+    - measure_voice: index into measure.voices, 0 in measures without voices
+      and -1 for notes outside the voices of a measure that has voices
+    - bar: index into ScoreObject.by_bar
+    - tie: index into TIE_TYPES
+    - chord: running index of the enclosing chord, or -1 for single notes
+    '''
+    def __init__(self, score):
+        self.notes = []
+        self.names = []
+
+        name_codes = {}
+        columns = {k: [] for k in (
+            'ps', 'pitch_class', 'name', 'octave', 'offset', 'local_offset',
+            'site_offset', 'duration', 'part', 'bar', 'tie', 'chord',
+            'measure_voice')}
+        voice_ids = []
+
+        part_index = {id(p): i for i, p in enumerate(score.parts)}
+        measure_index = {}
+        for part in score.parts:
+            for i, m in enumerate(part.getElementsByClass(stream.Measure)):
+                measure_index[id(m)] = i
+
+        voice_slots = {}
+
+        def get_voice_slots(measure):
+            slots = voice_slots.get(id(measure))
+            if slots is None:
+                slots = voice_slots[id(measure)] = {
+                    id(v): i for i, v in enumerate(measure.voices)}
+            return slots
+
+        chord_count = 0
+        for el in score.recurse(skipSelf=False).notes:
+            site = el.activeSite
+            if isinstance(site, stream.Voice):
+                voice, measure = site, site.activeSite
+                local_offset = voice.offset + el.offset
+                vid = str(voice.id)
+                measure_voice = get_voice_slots(measure)[id(voice)]
+            else:
+                measure = site
+                local_offset = el.offset
+                vid = '1'
+                measure_voice = -1 if get_voice_slots(measure) else 0
+            part = measure.activeSite
+            offset = part.offset + measure.offset + local_offset
+
+            if isinstance(el, chord.Chord):
+                members = list(el)
+                chord_idx = chord_count
+                chord_count += 1
+            else:
+                members = [el]
+                chord_idx = -1
+
+            for n in members:
+                p = n.pitch
+                if p.name not in name_codes:
+                    name_codes[p.name] = len(self.names)
+                    self.names.append(p.name)
+                tie = n.tie if n.tie is not None else el.tie
+
+                self.notes.append(n)
+                columns['ps'].append(p.ps)
+                columns['pitch_class'].append(p.pitchClass)
+                columns['name'].append(name_codes[p.name])
+                columns['octave'].append(p.implicitOctave)
+                columns['offset'].append(offset)
+                columns['local_offset'].append(local_offset)
+                columns['site_offset'].append(n.offset)
+                columns['duration'].append(n.duration.quarterLength)
+                columns['part'].append(part_index[id(part)])
+                columns['bar'].append(measure_index[id(measure)])
+                columns['tie'].append(
+                    TIE_CODES.get(tie.type if tie is not None else None, 0))
+                columns['chord'].append(chord_idx)
+                columns['measure_voice'].append(measure_voice)
+                voice_ids.append(vid)
+
+        int_columns = ('pitch_class', 'name', 'octave', 'part', 'bar', 'tie',
+                       'chord', 'measure_voice')
+        for key, values in columns.items():
+            dtype = np.int32 if key in int_columns else np.float64
+            setattr(self, key, np.array(values, dtype=dtype))
+
+        # Voices are numbered by their sorted ids within each part, matching
+        # _group_by_voices in score.py
+        voice_codes = []
+        for part in score.parts:
+            vids = set()
+            for m in part.getElementsByClass(stream.Measure):
+                vids.update(str(v.id) for v in m.voices)
+                # Notes directly in the measure are in voice '1'
+                if not m.voices or m.notes:
+                    vids.add('1')
+            voice_codes.append({vid: i for i, vid in enumerate(sorted(vids))})
+        self.voice = np.array(
+            [voice_codes[p][vid] for p, vid in zip(self.part, voice_ids)],
+            dtype=np.int32)
+
+        self._index = {id(n): i for i, n in enumerate(self.notes)}
+
+    def __len__(self):
+        return len(self.notes)
+
+    def index(self, n):
+        '''
+        Returns the index of a note.
+        '''
+        return self._index[id(n)]
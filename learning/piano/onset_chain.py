@@ -21,6 +21,7 @@ from .pre_processor import ContractingPreProcessor
 from .algorithm.output_count_estimate import OutputCountEstimate
 from .structure import AdjacentNotes
 from . import onset_chain_ext
+from .onset_labels import get_label_vectors
 from scoreboard import writer as writerlib
 
 
@@ -63,7 +64,9 @@ class OnsetStruct:
         onsets = []
         onset_lookup = {}
 
-        cls.count_algo.run(score_obj)
+        # The estimate only depends on the score, so it is computed once
+        if cls.count_algo.key not in score_obj.annotations:
+            cls.count_algo.run(score_obj)
 
         for offset, notes in score_obj.iter_offsets():
             # Create a struct for each onset
@@ -109,19 +112,10 @@ class OnsetStruct:
         Generate valid label vectors for this onset. Up to `count` vectors
         should be generated.
 
-        Returns: int ndarray of shape (note_count, k) where k <= count
-            Each row is a label vector.
+        Returns: read-only int ndarray of shape (k, note_count) where
+            k <= count. Each row is a label vector.
         '''
-        out = []
-        for i in range(2 ** self.note_count):
-            if len(out) == count:
-                break
-            if bin(i).count('1') <= self.max_kept:
-                value = []
-                for j in range(self.note_count):
-                    value.append(int(bool((1 << j) & i)))
-                out.append(value)
-        return np.asarray(out)
+        return get_label_vectors(self.note_count, self.max_kept, count)
 
     def get_vertical_potentials(self, Y, w):
         '''
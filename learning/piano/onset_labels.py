@@ -0,0 +1,38 @@
+'''
+Enumeration of the label vectors of the notes of an onset, for the onset
+chain model.
+'''
+from functools import lru_cache
+import numpy as np
+
+
+@lru_cache(maxsize=None)
+def get_label_vectors(note_count, max_kept, count):
+    '''
+    The label vectors of note_count notes with at most max_kept notes kept, in
+    increasing order of the integer whose bit j is the label of note j. Up to
+    `count` vectors are generated.
+
+    Returns: read-only int8 ndarray of shape (k, note_count), shared by the
+        calls with the same arguments
+    '''
+    if max_kept < 0:
+        labels = np.zeros((0, note_count), dtype='int8')
+        labels.setflags(write=False)
+        return labels
+
+    # levels[k] holds the vectors with at most k of the first b notes kept,
+    # which are those with at most k of the first b - 1 notes kept, followed
+    # by those with at most k - 1 of them and note b - 1 kept
+    levels = [np.zeros((1, note_count), dtype='int8')] * (max_kept + 1)
+    for b in range(note_count):
+        next_levels = [levels[0]]
+        for k in range(1, max_kept + 1):
+            kept = levels[k - 1][:count - len(levels[k])].copy()
+            kept[:, b] = 1
+            next_levels.append(np.concatenate([levels[k], kept]))
+        levels = next_levels
+
+    labels = levels[max_kept][:count]
+    labels.setflags(write=False)
+    return labels
@@ -1,11 +1,14 @@
-from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 import copy
 import logging
+import multiprocessing
 import numpy as np
 import os
+from .scheduler import FeatureScheduler
 from .score import ScoreObject
 from .util import dump_algorithm, ensure_algorithm
 from .contraction import ContractionMapping
+from .structure import merge_structures
 from scoreboard import writer as writerlib
 
 
@@ -19,18 +22,46 @@ class PreProcessedEntry:
         self.y = y
         self.name = '<Untitled>'
 
+    def compact(self):
+        '''
+        Return a copy without the score objects, which is cheap to pickle and
+        contains everything needed for training.
+        '''
+        ret = copy.copy(self)
+        for attr in ('input', 'output', 'parent'):
+            if hasattr(ret, attr):
+                setattr(ret, attr, None)
+        return ret
+
 
 class PreProcessedList:
-    def __init__(self, entries):
+    def __init__(self, entries, failures=()):
         self.entries = list(entries)
         self.X = [entry.X for entry in self.entries]
         self.y = [entry.y for entry in self.entries]
+        # List of (path pair, error message) for the files that failed
+        self.failures = list(failures)
 
     @property
     def __repr__(self):
         return repr((self.X, self.y))
 
 
+class GraphInput(tuple):
+    '''
+    The (features, edges, edge_features) input of a graphical model. It also
+    carries the bar of each node, so that models can cut the graph into bar
+    windows, and otherwise behaves as a plain tuple.
+    '''
+    def __new__(cls, features, edges, edge_features, bars=None):
+        self = super().__new__(cls, (features, edges, edge_features))
+        self.bars = bars
+        return self
+
+    def __getnewargs__(self):
+        return (*self, self.bars)
+
+
 class BasePreProcessor:
     '''
     Base class for pre-processors. Pre-processors take XML paths or ScoreObject
@@ -52,15 +83,70 @@ class BasePreProcessor:
         '''
         raise NotImplementedError()
 
-    def process(self, path_pairs, **kwargs):
-        result = []
+    def process(self, path_pairs, n_jobs=1, **kwargs):
+        '''
+        Process a list of path pairs, each either an (in_path, out_path) tuple
+        or a string "in_path:out_path".
+
+        n_jobs: Number of worker processes. If greater than 1, the files are
+            processed in a process pool and compact entries (without the
+            score objects) are returned in the original order.
+
+        Files that fail to process are logged and listed in the failures of
+        the returned PreProcessedList, instead of aborting the whole batch.
+        '''
+        pairs = []
         for pair in path_pairs:
             if type(pair) == str:
                 in_path, _, out_path = pair.partition(':')
             else:
                 in_path, out_path = pair
-            result.append(self.process_path_pair(in_path, out_path))
-        return PreProcessedList(result)
+            pairs.append((in_path, out_path))
+
+        if n_jobs > 1 and len(pairs) > 1:
+            outcomes = self._process_in_pool(pairs, n_jobs)
+        else:
+            outcomes = []
+            for pair in pairs:
+                try:
+                    outcomes.append((self.process_path_pair(*pair), None))
+                except Exception as e:
+                    logging.exception('Failed to process {}'.format(pair[0]))
+                    outcomes.append((None, e))
+
+        result = []
+        failures = []
+        for pair, (entry, error) in zip(pairs, outcomes):
+            if error is None:
+                result.append(entry)
+            else:
+                failures.append((pair, '{}: {}'.format(type(error).__name__, error)))
+
+        if failures:
+            logging.error('{} of {} files failed:\n'.format(len(failures), len(pairs)) +
+                          '\n'.join('    {}: {}'.format(p[0], e) for p, e in failures))
+
+        return PreProcessedList(result, failures)
+
+    def _process_in_pool(self, pairs, n_jobs):
+        logging.info('Processing {} files with {} workers'.format(len(pairs), n_jobs))
+
+        # Fork where possible so that the pre-processor is not pickled
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+
+        outcomes = []
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(pairs)), mp_context=context,
+                                 initializer=_init_worker, initargs=(self,)) as executor:
+            futures = [executor.submit(_process_in_worker, *pair) for pair in pairs]
+            for pair, future in zip(pairs, futures):
+                try:
+                    outcomes.append((future.result(), None))
+                except Exception as e:
+                    logging.error('Failed to process {}'.format(pair[0]),
+                                  exc_info=e)
+                    outcomes.append((None, e))
+        return outcomes
 
     def post_predict(self, y_proba):
         '''
@@ -92,6 +178,19 @@ class BasePreProcessor:
         return y_pred, y_proba
 
 
+_worker_pre_processor = None
+
+
+def _init_worker(pre_processor):
+    global _worker_pre_processor
+    _worker_pre_processor = pre_processor
+
+
+def _process_in_worker(in_path, out_path):
+    entry = _worker_pre_processor.process_path_pair(in_path, out_path)
+    return entry.compact()
+
+
 class BottomUpPreProcessor(BasePreProcessor):
     def __init__(self, algorithms, alignment):
         super().__init__()
@@ -104,6 +203,11 @@ class BottomUpPreProcessor(BasePreProcessor):
         self.alignment = ensure_algorithm(alignment)
         self.label_type = self.alignment.key
 
+        # A FeatureStore to reuse the markings of previous runs, if any
+        self.feature_store = None
+        # Number of feature algorithms to run concurrently on each score
+        self.feature_jobs = 1
+
         self.args[1].update({
             'algorithms': [dump_algorithm(algo) for algo in self.algorithms],
             'alignment': dump_algorithm(self.alignment),
@@ -117,13 +221,13 @@ class BottomUpPreProcessor(BasePreProcessor):
             ret.name = name
 
         # Features
-        X = np.empty((ret.len, len(self.all_keys)), dtype='float')
-        for algo in self.algorithms:
-            algo.run(input)
+        scheduler = FeatureScheduler(self.algorithms, n_jobs=self.feature_jobs,
+                                     feature_store=self.feature_store)
+        scheduler.run(input)
 
-            for i, key in enumerate(algo.all_keys):
-                X[:, self.all_keys.index(key)] = \
-                    input.extract(key, dtype='float', default=0)
+        X = np.empty((ret.len, len(self.all_keys)), dtype='float')
+        for i, key in enumerate(self.all_keys):
+            X[:, i] = input.extract(key, dtype='float', default=0)
         ret.X = X
 
         # Labels
@@ -226,26 +330,24 @@ class StructuralPreProcessor(ContractingPreProcessor):
         ret.features = parent.X  # Renamed
 
         # Structures
-        n_edge_features = sum(a.n_features for a in self.structures)
-
         ret.structures = {}
-        all_structures = defaultdict(lambda: np.zeros(n_edge_features, dtype='float'))
-        d = 0
+        arrays = []
         for algo in self.structures:
-            ret.structures[algo.key] = list(algo.run(input))
-            for edge, features in ret.structures[algo.key]:
-                all_structures[tuple(sorted(edge))][d:d + algo.n_features] = features
-            d += algo.n_features
+            E, F = algo.run_arrays(input)
+            ret.structures[algo.key] = list(
+                zip(map(tuple, E.tolist()), map(tuple, F.tolist())))
+            arrays.append((E, F))
 
-        all_structures = ret.mapping.map_structure(all_structures)
+        E, F = ret.mapping.map_edges(*merge_structures(arrays))
 
-        E = np.empty((len(all_structures), 2), dtype='int')
-        F = np.empty((len(all_structures), n_edge_features), dtype='float')
-        for i, (k, v) in enumerate(all_structures.items()):
-            E[i], F[i] = k, v
+        # Each node is in the bar where its first note is
+        note_bars = input.note_table.bar
+        valid = ret.mapping.array >= 0
+        bars = np.full(ret.len, np.iinfo(note_bars.dtype).max, dtype=note_bars.dtype)
+        np.minimum.at(bars, ret.mapping.array[valid], note_bars[valid])
 
         ret.E, ret.F = E, F
-        ret.X = (ret.features, E, F)
+        ret.X = GraphInput(ret.features, E, F, bars)
 
         return ret
 
@@ -18,6 +18,9 @@ parser.add_argument("-n", "--no-output",
                     help="print the result only", action='store_true')
 parser.add_argument(
     "-p", "--pdf", help="output pdf instead of MusicXML", action='store_true')
+parser.add_argument(
+    "-s", "--sparse", help="cluster over candidate pairs only",
+    action='store_true')
 
 args = parser.parse_args()
 
@@ -28,7 +31,8 @@ print("============================================================")
 print(filename + '\n\n')
 
 analyzer = MotifAnalyzer(music21.converter.parse(args.input))
-clusters = analyzer.cluster(verbose=True)
+clusters = analyzer.cluster(
+    verbose=True, mode='sparse' if args.sparse else 'dense')
 
 # m = cm.ScalarMappable(colors.Normalize(vmin=0, vmax=len(clusters)), 'hsv')
 # rgba_list = m.to_rgba(range(len(clusters)))
@@ -0,0 +1,138 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import logging
+import multiprocessing
+import time
+
+
+logger = logging.getLogger('learning.piano.scheduler')
+
+
+def _expand(algorithms):
+    '''
+    Returns all algorithms and their (transitive) dependencies, with every
+    algorithm listed after its dependencies.
+    '''
+    nodes = []
+    seen = set()
+
+    def visit(algo):
+        if id(algo) in seen:
+            return
+        seen.add(id(algo))
+        for dep in algo.dependencies:
+            visit(dep)
+        nodes.append(algo)
+
+    for algo in algorithms:
+        visit(algo)
+    return nodes
+
+
+_worker_score_obj = None
+_worker_nodes = None
+
+
+def _init_worker(score_obj, nodes):
+    global _worker_score_obj, _worker_nodes
+    _worker_score_obj = score_obj
+    _worker_nodes = nodes
+
+
+def _run_node(index, dep_columns):
+    return _compute(_worker_score_obj, _worker_nodes[index], dep_columns)
+
+
+def _compute(score_obj, algo, dep_columns):
+    score_obj.annotations.columns.update(dep_columns)
+    start = time.time()
+    algo.compute(score_obj)
+    elapsed = time.time() - start
+    columns = {k: score_obj.annotations.columns[k]
+               for k in algo.all_keys if k in score_obj.annotations.columns}
+    return columns, elapsed
+
+
+class FeatureScheduler(object):
+    '''
+    Runs the feature algorithms on a score object, skipping those found in the
+    feature store (if any).
+
+    With n_jobs > 1, independent algorithms run concurrently in a process pool
+    where fork is available, and one at a time otherwise, as algorithms modify
+    the music21 streams they share. An algorithm only starts after the
+    algorithms in its `dependencies` have finished, and receives their
+    markings. The markings are merged back into the score object in the order
+    of the algorithms, so the result is the same as running them one at a
+    time.
+    '''
+    def __init__(self, algorithms, n_jobs=1, feature_store=None):
+        self.algorithms = algorithms
+        self.n_jobs = n_jobs
+        self.feature_store = feature_store
+
+    def run(self, score_obj):
+        pending = []
+        for algo in self.algorithms:
+            if self.feature_store and self.feature_store.load(score_obj, algo):
+                logger.info('Loaded {} from feature cache'.format(algo.key))
+            else:
+                pending.append(algo)
+
+        concurrent = self.n_jobs > 1 and len(pending) > 1
+        if concurrent and \
+                'fork' not in multiprocessing.get_all_start_methods():
+            logger.info('Ignoring n_jobs={}: fork is unavailable'
+                        .format(self.n_jobs))
+            concurrent = False
+
+        if concurrent:
+            self._run_concurrently(score_obj, pending)
+        else:
+            for algo in pending:
+                start = time.time()
+                algo.run(score_obj)
+                self._log_time(algo, time.time() - start)
+
+        if self.feature_store:
+            for algo in pending:
+                self.feature_store.save(score_obj, algo)
+
+    def _run_concurrently(self, score_obj, algorithms):
+        nodes = _expand(algorithms)
+        index = {id(algo): i for i, algo in enumerate(nodes)}
+        deps = [[index[id(dep)] for dep in _expand(algo.dependencies)]
+                for algo in nodes]
+
+        # Build the lazy indices once, instead of once per worker
+        score_obj.by_bar
+        score_obj.voices_by_part
+
+        # Workers inherit the score object instead of unpickling it
+        executor = ProcessPoolExecutor(
+            max_workers=self.n_jobs,
+            mp_context=multiprocessing.get_context('fork'),
+            initializer=_init_worker, initargs=(score_obj, nodes))
+
+        results = [None] * len(nodes)
+        futures = {}
+        with executor:
+            while not all(results):
+                for i in range(len(nodes)):
+                    if i not in futures and all(results[d] for d in deps[i]):
+                        dep_columns = {}
+                        for d in deps[i]:
+                            dep_columns.update(results[d][0])
+                        futures[i] = executor.submit(_run_node, i, dep_columns)
+
+                running = [f for i, f in futures.items() if not results[i]]
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for i, f in futures.items():
+                    if f in done:
+                        results[i] = f.result()
+                        self._log_time(nodes[i], results[i][1])
+
+        for columns, _ in results:
+            score_obj.annotations.columns.update(columns)
+
+    def _log_time(self, algo, elapsed):
+        logger.info('{} took {:.2f}s'.format(algo.key, elapsed))
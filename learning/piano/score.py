@@ -1,10 +1,14 @@
 from music21 import converter, layout, stream
 from collections import defaultdict
-import copy
+import copy as copy_module
 from itertools import zip_longest
 import logging
 import numpy as np
-from .util import iter_notes, iter_notes_with_offset
+from .annotation import attach_annotation_store
+from .disk_cache import hash_file
+from .note_table import NoteTable
+from .score_cache import get_default_cache
+from .util import iter_notes_with_offset
 
 
 logger = logging.getLogger('learning.piano.score')
@@ -42,15 +46,53 @@ class ScoreObject(object):
     reduction system. This also defines a standardized way to convert the score
     into matrix representations.
     '''
-    def __init__(self, score):
+    def __init__(self, score, copy=True, preprocessed=False):
         '''
         Preprocess the score.
+
+        copy: Whether to preprocess a deep copy of the score. Pass False to
+            hand over ownership of the score, which is then modified in place.
+        preprocessed: Whether the score has already gone through
+            ScoreObject.preprocess, e.g. when it comes from the score cache.
+        '''
+        if preprocessed:
+            result = score
+        else:
+            result = self.preprocess(score, copy=copy)
+
+        self.original_score = score
+        self._score = result
+        self.content_hash = None
+
+        # Built on first access
+        self._by_bar = None
+        self._voices_by_part = None
+
+        logger.info('Note table')
+        self.note_table = NoteTable(result)
+        self.annotations = attach_annotation_store(self.note_table.notes)
+
+        logger.info('Done')
+
+    @staticmethod
+    def preprocess(score, copy=True):
+        '''
+        Return a preprocessed version of the score. Remember to bump
+        score_cache.PREPROCESS_VERSION when changing this.
+
+        copy: If False, the given score is modified in place and returned.
         '''
-        result = copy.deepcopy(score)
+        result = copy_module.deepcopy(score) if copy else score
 
-        for n in iter_notes(result, recurse=True):
+        # Collect first and remove in batch, as removing elements while
+        # recursing may skip some of them
+        zero_duration = defaultdict(list)
+        for n in result.recurse(skipSelf=False).notes:
             if not n.duration.quarterLength:
-                result.remove(n, recurse=True)  # Probably quite slow
+                zero_duration[id(n.activeSite)].append((n.activeSite, n))
+        for items in zero_duration.values():
+            site = items[0][0]
+            site.remove([n for _, n in items])
 
         logger.info('Instrument transposition')
         # Remove instrument transposition
@@ -58,61 +100,84 @@ class ScoreObject(object):
             if part.atSoundingPitch == False:  # atSoundingPitch can be 'unknown'
                 part.toSoundingPitch(inPlace=True)
 
-        self.original_score = score
-        self._score = result
-
-        logger.info('Bar indexing')
-        # Group each bar into a Score => Part -> Measure object.
-        self.by_bar = []
-        iters = [part.getElementsByClass(stream.Measure)
-                 for part in result.parts]
-        for i, measures in enumerate(zip_longest(*iters)):
-            assert all(m is not None for m in measures), \
-                'Measures missing at index {}'.format(i)
-            bar = result.cloneEmpty(derivationMethod='by_bar')
-            bar.offset = measures[0].offset
-            for part, m in zip(result.parts, measures):
-                p = part.cloneEmpty(derivationMethod='by_bar')
-                p.insert(0, m)
-                bar.insert(0, p)
-            self.by_bar.append(bar)
-
-        logger.info('Voice indexing')
-        self.voices_by_part = []
-        for part in result.parts:
-            self.voices_by_part.append(_group_by_voices(part))
+        return result
 
-        self._len = sum(1 for _ in self)
-
-        self._index = {}
-        for i, n in enumerate(self.notes):
-            self._index[id(n)] = i
+    @property
+    def by_bar(self):
+        '''
+        A list with each bar grouped into a Score => Part -> Measure object.
+        '''
+        if self._by_bar is None:
+            logger.info('Bar indexing')
+            self._by_bar = []
+            iters = [part.getElementsByClass(stream.Measure)
+                     for part in self.score.parts]
+            for i, measures in enumerate(zip_longest(*iters)):
+                assert all(m is not None for m in measures), \
+                    'Measures missing at index {}'.format(i)
+                bar = self.score.cloneEmpty(derivationMethod='by_bar')
+                bar.offset = measures[0].offset
+                for part, m in zip(self.score.parts, measures):
+                    p = part.cloneEmpty(derivationMethod='by_bar')
+                    p.insert(0, m)
+                    bar.insert(0, p)
+                self._by_bar.append(bar)
+        return self._by_bar
 
-        logger.info('Done')
+    @property
+    def voices_by_part(self):
+        '''
+        For each part, a list of its voices each as a Stream of measures.
+        '''
+        if self._voices_by_part is None:
+            logger.info('Voice indexing')
+            self._voices_by_part = [_group_by_voices(part)
+                                    for part in self.score.parts]
+        return self._voices_by_part
 
     @property
     def score(self):
         return self._score
 
     @classmethod
-    def from_file(cls, fp, *args, **kwargs):
+    def from_file(cls, fp, *args, cache=True, **kwargs):
         '''
         Create a ScoreObject from a file. Uses music21.converter.parseFile to
         do so.
+
+        cache: A ScoreCache to look up the preprocessed score in, True to use
+            the default cache or False to always parse the file.
         '''
-        score = converter.parseFile(fp, *args, **kwargs)
+        if cache is True:
+            cache = get_default_cache()
+
+        content_hash = hash_file(fp)
+        key = cache.key(content_hash, *args, **kwargs) if cache else None
+
+        score = cache.get(key) if cache else None
+        if score is not None:
+            logger.info('Loaded {} from cache'.format(fp))
+            obj = cls(score, preprocessed=True)
+        else:
+            score = converter.parseFile(fp, *args, **kwargs)
+
+            # Make sure the file is not something else, e.g. an Opus
+            assert isinstance(score, stream.Score), \
+                'File is not a single score!'
 
-        # Make sure the file is not something else, e.g. an Opus
-        assert isinstance(score, stream.Score), 'File is not a single score!'
+            obj = cls(score, copy=False)
+            if cache:
+                cache.put(key, obj.score)
 
-        return cls(score)
+        obj.content_hash = content_hash
+        return obj
 
     def __iter__(self):
         # deprecated
         return self.notes
 
     def __len__(self):
-        return self._len
+        return len(self.note_table)
 
     @property
     def notes(self):
@@ -120,7 +185,7 @@ class ScoreObject(object):
         Return an iterator that yields the list of note objects in the order
         used in the matrix representation.
         '''
-        return iter_notes(self.score, recurse=True)
+        return iter(self.note_table.notes)
 
     def iter_offsets(self):
         for bar in self.by_bar:
@@ -137,29 +202,18 @@ class ScoreObject(object):
         default: The default value to use if the key does not exist in a Note.
         '''
         # We use kwargs for default so that we can distinguish None and unspecified
-        out = np.empty(len(self), dtype=dtype)
+        return self.annotations.extract(key, dtype, **kwargs)
 
-        for i, n in enumerate(self.notes):
-            try:
-                out[i] = n.editorial.misc[key]
-            except KeyError:
-                if 'default' in kwargs:
-                    out[i] = kwargs['default']
-                else:
-                    raise
-
-        return out
-
-    def annotate(self, vector, key):
+    def annotate(self, vector, key, where=None):
         '''
         Annotate the given vector to the score.
+
+        where: If given, a boolean mask of the notes to annotate.
         '''
-        for v, n in zip(vector, self.notes):
-            if v is not None:
-                n.editorial.misc[key] = v
+        self.annotations.annotate(vector, key, where=where)
 
     def index(self, n):
         '''
         Returns the index of a note.
         '''
-        return self._index[id(n)]
+        return self.note_table.index(n)
@@ -0,0 +1,69 @@
+import logging
+import music21
+from music21 import freezeThaw
+from .. import config
+from .disk_cache import DiskCache, hash_key
+
+
+logger = logging.getLogger('learning.piano.score_cache')
+
+# Bump this whenever ScoreObject preprocessing (transposition, removal of
+# zero-duration notes, ...) changes so that stale cache entries are ignored.
+PREPROCESS_VERSION = 2
+
+
+class ScoreCache(DiskCache):
+    '''
+    An on-disk cache of preprocessed scores, keyed by the content hash of the
+    source file. Entries are invalidated by the music21 version and
+    PREPROCESS_VERSION. When the total size exceeds max_size (in bytes), the
+    least recently used entries are evicted.
+    '''
+    suffix = '.m21'
+
+    def __init__(self, directory=None, max_size=None):
+        super().__init__(
+            directory or config.SCORE_CACHE_DIR,
+            max_size if max_size is not None else config.SCORE_CACHE_SIZE)
+
+    def key(self, content_hash, *args, **kwargs):
+        return hash_key(content_hash, music21.VERSION_STR, PREPROCESS_VERSION,
+                        args, sorted(kwargs.items()))
+
+    def get(self, key):
+        '''
+        Returns the cached preprocessed music21 score, or None on a miss.
+        '''
+        data = self.read(key)
+        if data is None:
+            return None
+
+        try:
+            thawer = freezeThaw.StreamThawer()
+            thawer.openStr(data)
+            return thawer.stream
+        except Exception:
+            self.discard(key)
+            return None
+
+    def put(self, key, score):
+        '''
+        Store a preprocessed music21 score. The score itself is not modified.
+        '''
+        self.write(key, freezeThaw.StreamFreezer(score).writeStr(fmt='pickle'))
+
+
+_default_cache = None
+
+
+def get_default_cache():
+    '''
+    Returns the ScoreCache used by ScoreObject.from_file, or None if caching
+    is disabled (config.SCORE_CACHE_SIZE set to 0).
+    '''
+    global _default_cache
+    if not config.SCORE_CACHE_SIZE:
+        return None
+    if _default_cache is None:
+        _default_cache = ScoreCache()
+    return _default_cache
@@ -0,0 +1,57 @@
+import numpy as np
+import scipy.special
+
+
+def gaussian_cdf(x, sigma):
+    return 0.5 * (1 + scipy.special.erf(x / sigma / np.sqrt(2)))
+
+
+def gaussian_filter(seq, offsets, durations, *, sigma, size=5,
+                    block_size=1024):
+    '''
+    Smooth a piecewise-constant sequence with a Gaussian filter.
+
+    seq[i] is the value on the interval [offsets[i], offsets[i] + durations[i]),
+    where the offsets are sorted and the intervals do not overlap. The result
+    is sampled at each offset, with the filter truncated at `size` standard
+    deviations (`sigma`).
+
+    The intervals in the window of each offset are found by binary search,
+    and the weights of all (offset, interval) pairs in a block of
+    `block_size` offsets are computed with one erf call.
+    '''
+    seq = np.asarray(seq)
+    offsets = np.asarray(offsets, dtype='float')
+    durations = np.asarray(durations, dtype='float')
+    radius = size * sigma
+    ends = offsets + durations
+
+    result = np.empty_like(seq)
+    for begin in range(0, len(seq), block_size):
+        centres = np.arange(begin, min(begin + block_size, len(seq)))
+
+        # A superset of the windows, trimmed exactly below
+        lo = np.searchsorted(ends, offsets[centres] - radius - sigma, 'left')
+        hi = np.searchsorted(offsets, offsets[centres] + radius + sigma,
+                             'right')
+        counts = hi - lo
+        first = np.cumsum(counts) - counts
+        i = np.repeat(centres, counts)
+        j = np.repeat(lo, counts) + np.arange(counts.sum()) - \
+            np.repeat(first, counts)
+
+        # The window is [-radius, radius] around the centre. Intervals before
+        # the centre are clipped on the left, the others on the right.
+        left = offsets[j] - offsets[i]
+        right = ends[j] - offsets[i]
+        before = j < i
+        inside = np.where(before, right > -radius, left < radius)
+        left = np.where(before, np.maximum(-radius, left), left)
+        right = np.where(before, right, np.minimum(radius, right))
+
+        weights = gaussian_cdf(right, sigma) - gaussian_cdf(left, sigma)
+        result[centres] = np.bincount(
+            i - begin, weights=np.where(inside, seq[j] * weights, 0.0),
+            minlength=len(centres))
+
+    return result
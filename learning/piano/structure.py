@@ -1,6 +1,7 @@
 from collections import defaultdict
 import math
 from music21 import chord, note, stream
+import numpy as np
 from .algorithm.base import iter_notes_with_offset
 
 
@@ -27,8 +28,30 @@ class StructureAlgorithm:
         Returns an iterator of (edge, features), where
         -   `edge` is a pair with the indices of the two endpoints, and
         -   `features` is a length-n_features vector with the edge features.
+
+        Subclasses implement either this or run_arrays.
         '''
-        raise NotImplementedError()
+        if type(self).run_arrays is StructureAlgorithm.run_arrays:
+            raise NotImplementedError()
+        E, F = self.run_arrays(score_obj)
+        return zip(map(tuple, E.tolist()), map(tuple, F.tolist()))
+
+    def run_arrays(self, score_obj):
+        '''
+        Returns a pair of arrays (E, F), where
+        -   E is an int32 array of shape (m, 2) with the endpoints of the edges,
+        -   F is a float array of shape (m, n_features) with the edge features.
+
+        By default, the edges yielded by run are collected.
+        '''
+        if type(self).run is StructureAlgorithm.run:
+            raise NotImplementedError()
+        edges, features = [], []
+        for edge, f in self.run(score_obj):
+            edges.append(edge)
+            features.append(f)
+        return (np.array(edges, dtype='int32').reshape(-1, 2),
+                np.array(features, dtype='float').reshape(-1, self.n_features))
 
     def get_weights(self, label_type, var_fn):
         '''
@@ -107,18 +130,55 @@ class SimultaneousNotes(StructureAlgorithm):
     get_weights = get_repelling_weights
 
 
+def _onset_pairs(score_obj):
+    '''
+    Returns arrays (u, v) with the indices of all ordered pairs of notes
+    (including u == v) at the same onset, in the order of iter_offsets.
+    '''
+    table = score_obj.note_table
+    # Stable, so notes at the same onset stay in index order
+    order = np.lexsort((table.local_offset, table.bar))
+    bar, offset = table.bar[order], table.local_offset[order]
+    new_group = np.ones(len(order), dtype='bool')
+    new_group[1:] = (bar[1:] != bar[:-1]) | (offset[1:] != offset[:-1])
+    starts = np.flatnonzero(new_group)
+    sizes = np.diff(np.append(starts, len(order)))
+
+    # Every note is paired with each note in its group
+    pair_counts = np.repeat(sizes, sizes)
+    u = np.repeat(order, pair_counts)
+    first_pair = np.cumsum(pair_counts) - pair_counts
+    within = np.arange(len(u)) - np.repeat(first_pair, pair_counts)
+    v = order[np.repeat(np.repeat(starts, sizes), pair_counts) + within]
+    return u, v
+
+
+def _edge_arrays(u, v, feature):
+    # For algorithms with a single feature
+    return (np.column_stack([u, v]).astype('int32'),
+            np.asarray(feature, dtype='float').reshape(-1, 1))
+
+
 class OnsetNotes(StructureAlgorithm):
     '''
     Connects notes at the same onset.
     '''
     n_features = 1
 
-    def run(self, score_obj):
-        for offset, notes in score_obj.iter_offsets():
-            for u in notes:
-                for v in notes:
-                    if u != v:
-                        yield (score_obj.index(u), score_obj.index(v)), (1,)
+    def run_arrays(self, score_obj):
+        table = score_obj.note_table
+        u, v = _onset_pairs(score_obj)
+        keep = u != v
+
+        # music21 compares notes by value, so doublings that are equal in
+        # pitch, duration, articulations, etc. are not connected
+        maybe_equal = keep & (table.ps[u] == table.ps[v]) & \
+            (table.duration[u] == table.duration[v])
+        for k in np.flatnonzero(maybe_equal):
+            keep[k] = table.notes[u[k]] != table.notes[v[k]]
+
+        u, v = u[keep], v[keep]
+        return _edge_arrays(u, v, np.ones(len(u)))
 
     get_weights = get_repelling_weights
 
@@ -129,14 +189,17 @@ class OnsetBadIntervalNotes(StructureAlgorithm):
     '''
     n_features = 1
 
-    def run(self, score_obj):
-        BAD_INTERVALS = (1, 2, 6, 10, 11)
+    BAD_INTERVALS = (1, 2, 6, 10, 11)
+
+    def run_arrays(self, score_obj):
+        # Notes at the same pitch class are never connected, so the notes
+        # need not be compared as in OnsetNotes
+        ps = np.trunc(score_obj.note_table.ps).astype('int')
+        u, v = _onset_pairs(score_obj)
+        keep = np.isin((ps[u] - ps[v] + 12) % 12, self.BAD_INTERVALS)
 
-        for offset, notes in score_obj.iter_offsets():
-            for u in notes:
-                for v in notes:
-                    if (u != v and (int(u.pitch.ps) - int(v.pitch.ps) + 12) % 12 in BAD_INTERVALS):
-                        yield (score_obj.index(u), score_obj.index(v)), (1,)
+        u, v = u[keep], v[keep]
+        return _edge_arrays(u, v, np.ones(len(u)))
 
     get_weights = get_repelling_weights
 
@@ -147,16 +210,15 @@ class OnsetDurationVaryingNotes(StructureAlgorithm):
     '''
     n_features = 1
 
-    def run(self, score_obj):
-        for offset, notes in score_obj.iter_offsets():
-            for u in notes:
-                for v in notes:
-                    if (u != v and u.duration.quarterLength != v.duration.quarterLength):
-                        d1, d2 = sorted((u.duration.quarterLength, v.duration.quarterLength))
-                        if d1 == 0.0:  # e.g. grace note
-                            continue
-                        log_ratio = math.log2(d2/d1)
-                        yield (score_obj.index(u), score_obj.index(v)), (log_ratio,)
+    def run_arrays(self, score_obj):
+        duration = score_obj.note_table.duration
+        u, v = _onset_pairs(score_obj)
+        d1 = np.minimum(duration[u], duration[v])
+        d2 = np.maximum(duration[u], duration[v])
+        keep = (d1 != d2) & (d1 != 0.0)  # d1 == 0 e.g. for grace notes
+
+        u, v = u[keep], v[keep]
+        return _edge_arrays(u, v, np.log2(d2[keep] / d1[keep]))
 
     get_weights = get_repelling_weights
 
@@ -194,3 +256,34 @@ class AdjacentNotes(StructureAlgorithm):
 
     def get_weights(self, *args, **kwargs):
         return [get_hand_only_repelling_weights(self, *args, **kwargs) for _ in range(3)]
+
+
+def merge_structures(arrays):
+    '''
+    Merge the (E, F) arrays returned by several structure algorithms into one
+    undirected edge list with the features of each algorithm side by side.
+
+    Edges are sorted. If an algorithm returns an edge more than once (in
+    either direction), its last features are kept.
+    '''
+    n_features = [F.shape[1] for E, F in arrays]
+    deduped = []
+    for E, F in arrays:
+        E = np.sort(E, axis=1)
+        # The first occurrence in reverse order is the last one
+        _, index = np.unique(E[::-1], axis=0, return_index=True)
+        last = len(E) - 1 - index
+        deduped.append((E[last], F[last]))
+
+    all_edges = np.concatenate(
+        [E for E, F in deduped] + [np.empty((0, 2), dtype='int32')])
+    E, inverse = np.unique(all_edges, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+
+    F = np.zeros((len(E), sum(n_features)), dtype='float')
+    start, d = 0, 0
+    for (E_algo, F_algo), n in zip(deduped, n_features):
+        F[inverse[start:start + len(E_algo)], d:d + n] = F_algo
+        start += len(E_algo)
+        d += n
+    return E, F
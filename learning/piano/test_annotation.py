@@ -0,0 +1,72 @@
+import copy
+import numpy as np
+import pytest
+from .annotation import AnnotationStore, MarkingsView
+from .score import ScoreObject
+
+
+def test_typed_columns():
+    store = AnnotationStore(3)
+    store.annotate(np.array([True, False, True]), 'b')
+    store.annotate(np.array([0.5, 1.5, 2.5]), 'f')
+    store.annotate(np.array([2, 0, 1]), 'i')
+    store.set(0, 'c', 'x')
+    store.set(2, 'c', [1, 2])
+
+    assert store.columns['b'].kind == 'bool'
+    assert store.columns['f'].kind == 'float'
+    assert store.columns['i'].kind == 'int'
+    assert store.get(0, 'i') == 2 and type(store.get(0, 'i')) is int
+    assert store.columns['c'].kind == 'categorical'
+    assert store.get(0, 'b') is True
+    assert store.get(2, 'c') == [1, 2]
+    with pytest.raises(KeyError):
+        store.get(1, 'c')
+
+    # Values that do not fit the column type turn it into a categorical one
+    store.set(1, 'b', None)
+    assert store.columns['b'].kind == 'categorical'
+    assert [store.get(i, 'b') for i in range(3)] == [True, None, True]
+
+    # Also for whole vectors of another type
+    store.annotate(np.array([1, 2, 3]), 'f', where=np.array([True, True, False]))
+    assert store.columns['f'].kind == 'categorical'
+    assert [store.get(i, 'f') for i in range(3)] == [1, 2, 2.5]
+    assert store.extract('f', 'float').tolist() == [1.0, 2.0, 2.5]
+
+
+def test_extract():
+    store = AnnotationStore(3)
+    store.set(0, 'k', 1.0)
+    store.set(2, 'k', 3.0)
+
+    with pytest.raises(KeyError):
+        store.extract('k', 'float')
+    assert store.extract('k', 'float', default=0).tolist() == [1.0, 0.0, 3.0]
+    assert store.extract('missing', 'int', default=5).tolist() == [5, 5, 5]
+
+
+def test_markings_view():
+    s = ScoreObject.from_file(
+        'learning/piano/test_sample/algorithm_input_small.xml')
+    notes = list(s.notes)
+    misc = notes[1].editorial.misc
+    assert isinstance(misc, MarkingsView)
+
+    misc['a'] = True
+    misc['b'] = 'text'
+    assert dict(misc) == {'a': True, 'b': 'text'}
+    assert s.extract('a', 'float', default=0)[:3].tolist() == [0, 1, 0]
+
+    s.annotate([None, 0.25] + [None] * (len(s) - 2), 'c')
+    assert misc['c'] == 0.25
+    assert 'c' not in notes[0].editorial.misc
+
+    del misc['b']
+    assert 'b' not in misc
+
+    # Copies are detached from the store
+    assert copy.deepcopy(misc) == {'a': True, 'c': 0.25}
+    n = copy.deepcopy(notes[1])
+    n.editorial.misc['a'] = False
+    assert misc['a'] is True
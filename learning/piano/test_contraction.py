@@ -43,3 +43,36 @@ def test_contract_by():
 
     C = list(range(5))
     assert np.all(IndexMapping(C).map_matrix(data) == data)
+
+
+def test_aggregators():
+    data = np.array([[1, 0], [2, 1], [3, 0], [4, 1], [5, 0]])
+    C = [0, 1, 0, None, 1]
+
+    assert np.all(IndexMapping(C).map_matrix(data) == [[3, 0], [5, 1]])
+    assert np.all(IndexMapping(C, aggregator=np.add).map_matrix(data) == [[4, 0], [7, 1]])
+    assert np.all(IndexMapping(C, aggregator=lambda i: i[0]).map_matrix(data) == [[1, 0], [2, 1]])
+
+    assert np.all(IndexMapping(C).unmap_matrix([[1, 1], [2, 2]], default=0) ==
+                  [[1, 1], [2, 2], [1, 1], [0, 0], [2, 2]])
+
+
+def test_map_structure():
+    C = [0, 0, 1, 2, None]
+    structure = {
+        (2, 3): np.array([1.0]),
+        (0, 2): np.array([2.0]),
+        (1, 0): np.array([3.0]),  # Self-loop
+        (2, 1): np.array([4.0]),  # Same as (0, 2) after mapping
+        (3, 4): np.array([5.0]),  # Vertex removed
+        }
+    mapped = IndexMapping(C).map_structure(structure)
+
+    assert list(mapped.keys()) == [(1, 2), (0, 1)]
+    assert mapped[(1, 2)] == [1.0]
+    assert mapped[(0, 1)] == [4.0]
+
+    E, F = IndexMapping(C).map_edges(
+        list(structure.keys()), np.array(list(structure.values())))
+    assert E.tolist() == [[0, 1], [1, 2]]
+    assert F.tolist() == [[4.0], [1.0]]
@@ -0,0 +1,129 @@
+import copy
+import numpy as np
+from .algorithm.base import FeatureAlgorithm, get_markings
+from .alignment.base import AlignmentMethod
+from . import feature_store
+from .algorithm import (Harmony, HighestPitch, Motif, OutputCountEstimate,
+                        ProductTerms)
+from .feature_store import FeatureStore, code_version, get_code_modules
+from .pre_processor import BottomUpPreProcessor
+from .score import ScoreObject
+
+path = 'learning/piano/test_sample/chromatic_scale.xml'
+
+
+class CountingPitchSpace(FeatureAlgorithm):
+    runs = 0
+
+    def run(self, score_obj):
+        CountingPitchSpace.runs += 1
+        for i, n in enumerate(score_obj.notes):
+            get_markings(n)[self.key] = n.pitch.ps
+            if i % 2:
+                get_markings(n)[self.key + '_odd'] = i
+
+    @property
+    def all_keys(self):
+        return [self.key, self.key + '_odd']
+
+
+class Unstorable(FeatureAlgorithm):
+    runs = 0
+
+    def run(self, score_obj):
+        Unstorable.runs += 1
+        for i, n in enumerate(score_obj.notes):
+            get_markings(n)[self.key] = None if i % 2 else 1
+
+
+class AlignDummy(AlignmentMethod):
+    def run(self, input_score_obj, output_score_obj, extra=False):
+        pass
+
+
+def edit_smoothing(monkeypatch):
+    '''
+    Makes learning.piano.smoothing look edited to code_version.
+    '''
+    find_module = feature_store.find_module
+
+    def edited(name):
+        spec = find_module(name)
+        if name == 'learning.piano.smoothing':
+            # A copy, as this is the __spec__ of the imported module
+            spec = copy.copy(spec)
+            spec.origin = __file__
+        return spec
+    monkeypatch.setattr(feature_store, 'find_module', edited)
+
+
+def test_feature_store(tmpdir):
+    store = FeatureStore(str(tmpdir), max_size=1024 ** 2)
+
+    pre = BottomUpPreProcessor(
+        algorithms=[CountingPitchSpace(), Unstorable()],
+        alignment=AlignDummy())
+    pre.feature_store = store
+    X1 = pre.process_path_pair(path, None).X
+    assert (CountingPitchSpace.runs, Unstorable.runs) == (1, 1)
+    assert (store.hits, store.misses) == (0, 2)
+
+    # Another position, i.e. key prefix, in a different configuration
+    pre = BottomUpPreProcessor(
+        algorithms=[Unstorable(), CountingPitchSpace()],
+        alignment=AlignDummy())
+    pre.feature_store = store
+    entry = pre.process_path_pair(path, None)
+    assert (CountingPitchSpace.runs, Unstorable.runs) == (1, 2)
+    assert (store.hits, store.misses) == (1, 3)
+
+    assert np.all(entry.X[:, 1:] == X1[:, :2])
+    notes = list(entry.input.notes)
+    assert get_markings(notes[1])['1_CountingPitchSpace_odd'] == 1
+    assert '1_CountingPitchSpace_odd' not in get_markings(notes[0])
+
+
+def test_code_modules():
+    common = {'learning.piano.algorithm.base', 'learning.piano.note_table',
+              'learning.piano.score'}
+    assert common | {
+        'learning.piano.algorithm.motif.analyzer',
+        'learning.piano.algorithm.motif.similarity',
+        'learning.piano.algorithm.motif.alignment',
+        'learning.piano.algorithm.motif.algorithms',
+        } <= set(get_code_modules(Motif()))
+    assert common | {
+        'learning.tonalanalysis.eventanalysis.chord_flow',
+        'learning.tonalanalysis.eventanalysis.event_analyzer',
+        'learning.tonalanalysis.eventanalysis.tonal_model',
+        } <= set(get_code_modules(Harmony()))
+    assert common | {'learning.piano.smoothing'} <= \
+        set(get_code_modules(OutputCountEstimate()))
+
+
+def test_code_version(monkeypatch):
+    algo = OutputCountEstimate()
+    version = code_version(algo)
+    assert code_version(OutputCountEstimate()) == version
+
+    # Editing a dependency changes the version
+    edit_smoothing(monkeypatch)
+    assert code_version(algo) != version
+
+
+def test_store_key_versions(tmpdir, monkeypatch):
+    s = ScoreObject.from_file(path, cache=False)
+    pitch = ProductTerms([HighestPitch()])
+    count = ProductTerms([OutputCountEstimate()])
+
+    # The code version of the first ProductTerms is not reused for the second
+    store = FeatureStore(str(tmpdir))
+    pitch_key = store.key(s, pitch)
+    count_key = store.key(s, count)
+    assert count_key == FeatureStore(str(tmpdir)).key(s, count)
+
+    # Editing a module only the second one uses only changes its key
+    edit_smoothing(monkeypatch)
+    store = FeatureStore(str(tmpdir))
+    assert store.key(s, pitch) == pitch_key
+    assert store.key(s, count) != count_key
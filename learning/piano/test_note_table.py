@@ -0,0 +1,61 @@
+from music21 import note, stream
+from .score import ScoreObject
+from .note_table import TIE_TYPES
+from .util import iter_notes
+
+
+def test_note_table_columns():
+    s = ScoreObject.from_file('learning/piano/test_sample/algorithm_input.xml')
+    table = s.note_table
+
+    assert len(table) == len(s)
+    for i, n in enumerate(s.notes):
+        assert table.notes[i] is n
+        assert s.index(n) == i
+        assert table.ps[i] == n.pitch.ps
+        assert table.pitch_class[i] == n.pitch.pitchClass
+        assert table.names[table.name[i]] == n.pitch.name
+        assert table.duration[i] == n.duration.quarterLength
+        assert TIE_TYPES[table.tie[i]] == (n.tie.type if n.tie else None)
+
+
+def test_note_table_offsets_and_voices():
+    # Contains chords and multiple voices
+    s = ScoreObject.from_file('learning/piano/test_sample/alignment_a.xml')
+    table = s.note_table
+
+    for offset, notes in s.iter_offsets():
+        for n in notes:
+            assert table.offset[s.index(n)] == offset
+
+    for pidx, voices in enumerate(s.voices_by_part):
+        for vidx, voice in enumerate(voices):
+            for n in iter_notes(voice, recurse=True):
+                assert table.part[s.index(n)] == pidx
+                assert table.voice[s.index(n)] == vidx
+
+    assert table.voice.max() == 1
+    assert set(table.measure_voice) == {0, 1}
+    for bar in s.by_bar:
+        for n in iter_notes(bar, recurse=True):
+            assert table.site_offset[s.index(n)] == n.offset
+    assert (table.chord >= 0).sum() == 4
+
+
+def test_note_table_notes_outside_voices():
+    # A measure with a voice and a note directly in the measure
+    m = stream.Measure()
+    v = stream.Voice(id='3')
+    v.insert(0, note.Note('C4', quarterLength=4))
+    m.insert(0, v)
+    m.insert(0, note.Note('E4', quarterLength=4))
+    p = stream.Part()
+    p.append(m)
+    sc = stream.Score()
+    sc.insert(0, p)
+
+    s = ScoreObject(sc)
+    table = s.note_table
+    # Voice '1' holds the notes outside voices, and sorts before voice '3'
+    voices = {n.pitch.name: table.voice[s.index(n)] for n in s.notes}
+    assert voices == {'E': 0, 'C': 1}
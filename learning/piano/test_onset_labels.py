@@ -0,0 +1,35 @@
+import numpy as np
+from .onset_labels import get_label_vectors
+
+
+def naive_label_vectors(note_count, max_kept, count):
+    out = []
+    for i in range(2 ** note_count):
+        if len(out) == count:
+            break
+        if bin(i).count('1') <= max_kept:
+            out.append([int(bool((1 << j) & i)) for j in range(note_count)])
+    return np.array(out, dtype='int').reshape(len(out), note_count)
+
+
+def test_get_label_vectors():
+    for note_count in range(9):
+        for max_kept in range(note_count + 2):
+            for count in (1, 7, 1024):
+                labels = get_label_vectors(note_count, max_kept, count)
+                expected = naive_label_vectors(note_count, max_kept, count)
+                assert labels.shape == expected.shape
+                assert np.all(labels == expected)
+
+
+def test_get_label_vectors_count():
+    # At most 1 of 4 notes kept, truncated after the first 3 vectors
+    assert get_label_vectors(4, 1, 3).tolist() == [
+        [0, 0, 0, 0], [1, 0, 0, 0], [0, 1, 0, 0]]
+    assert len(get_label_vectors(12, 12, 100)) == 100
+
+
+def test_get_label_vectors_shared():
+    labels = get_label_vectors(5, 2, 1024)
+    assert not labels.flags.writeable
+    assert get_label_vectors(5, 2, 1024) is labels
@@ -1,10 +1,12 @@
 import numpy as np
 import os
+import pickle
 from unittest.mock import Mock
 from .algorithm.base import FeatureAlgorithm, get_markings
 from .alignment.base import AlignmentMethod
-from .pre_processor import BottomUpPreProcessor
+from .pre_processor import BottomUpPreProcessor, StructuralPreProcessor
 from .score import ScoreObject
+from .structure import AdjacentNotes
 
 
 class PitchSpace(FeatureAlgorithm):
@@ -74,3 +76,34 @@ def test_pre_process_from_object():
     assert np.all(d.X == X)
     assert np.all(d.y == y)
     assert d.input
+
+
+def test_pre_process_in_parallel():
+    pre = BottomUpPreProcessor(algorithms=[PitchSpace(), DummySequences()], alignment=AlignDummy())
+
+    pairs = [path + ':' + path, ('missing.xml', None), (path, None)]
+    d = pre.process(pairs, n_jobs=2)
+
+    # Failed files are reported, and the rest keep their order
+    assert [p for p, _ in d.failures] == [('missing.xml', None)]
+    assert len(d.entries) == 2
+    assert np.all(d.X[0] == X) and np.all(d.y[0] == y)
+    assert np.all(d.X[1] == X) and d.y[1] is None
+    assert d.entries[0].input is None
+
+
+def test_structural_pre_process_bars():
+    pre = StructuralPreProcessor(
+        algorithms=[PitchSpace()], alignment=AlignDummy(),
+        structures=[AdjacentNotes()])
+
+    s = ScoreObject.from_file(path)
+    d = pre.process_score_obj_pair(s, None)
+    features, E, F = d.X
+    assert np.all(features == X[:, :1])
+    assert np.all(d.X.bars == s.note_table.bar)
+
+    # The bars survive pickling, e.g. to worker processes
+    X2 = pickle.loads(pickle.dumps(d.X))
+    assert isinstance(X2, tuple) and len(X2) == 3
+    assert np.all(X2[1] == E) and np.all(X2.bars == d.X.bars)
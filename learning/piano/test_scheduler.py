@@ -0,0 +1,69 @@
+import numpy as np
+from .algorithm import ProductTerms
+from .algorithm.base import FeatureAlgorithm, get_markings
+from .alignment.base import AlignmentMethod
+from .pre_processor import BottomUpPreProcessor
+from . import scheduler
+
+path = 'learning/piano/test_sample/algorithm_input.xml'
+
+
+class HighNote(FeatureAlgorithm):
+    def run(self, score_obj):
+        for n in score_obj.notes:
+            get_markings(n)[self.key] = n.pitch.ps >= 67
+
+
+class LongNote(FeatureAlgorithm):
+    def run(self, score_obj):
+        for n in score_obj.notes:
+            get_markings(n)[self.key] = n.duration.quarterLength >= 1
+
+
+class PitchSpace(FeatureAlgorithm):
+    def run(self, score_obj):
+        for n in score_obj.notes:
+            get_markings(n)[self.key] = n.pitch.ps
+
+
+class AlignDummy(AlignmentMethod):
+    def run(self, input_score_obj, output_score_obj, extra=False):
+        pass
+
+
+def create_pre_processor():
+    return BottomUpPreProcessor(
+        algorithms=[
+            PitchSpace(),
+            ProductTerms([HighNote(), LongNote()]),
+            HighNote(),
+            ],
+        alignment=AlignDummy())
+
+
+def test_concurrent_features():
+    pre = create_pre_processor()
+    expected = pre.process_path_pair(path, None)
+
+    pre = create_pre_processor()
+    pre.feature_jobs = 3
+    actual = pre.process_path_pair(path, None)
+
+    assert np.all(actual.X == expected.X)
+    for n, m in zip(actual.input.notes, expected.input.notes):
+        assert dict(get_markings(n)) == dict(get_markings(m))
+
+
+def test_features_without_fork(monkeypatch):
+    pre = create_pre_processor()
+    expected = pre.process_path_pair(path, None)
+
+    # Algorithms share the score object, so they are not run in threads
+    monkeypatch.setattr(scheduler.multiprocessing, 'get_all_start_methods',
+                        lambda: ['spawn'])
+    monkeypatch.setattr(scheduler, 'ProcessPoolExecutor', None)
+    pre = create_pre_processor()
+    pre.feature_jobs = 3
+    actual = pre.process_path_pair(path, None)
+
+    assert np.all(actual.X == expected.X)
@@ -1,5 +1,5 @@
 from .score import ScoreObject
-from music21 import interval, pitch
+from music21 import converter, interval, pitch
 
 
 def test_instrument_transposition():
@@ -24,3 +24,19 @@ def test_instrument_transposition():
         for part in parts:
             assert part.recurse(skipSelf=False).notes[0].pitch == expected, \
                 'Transposition incorrect for ' + name
+
+
+def test_copy_free_construction():
+    score = converter.parseFile(
+        'learning/piano/test_sample/algorithm_input_small.xml')
+    copied = ScoreObject(score)
+    owned = ScoreObject(score, copy=False)
+
+    assert copied.score is not score
+    assert owned.score is score
+    assert owned._by_bar is None and owned._voices_by_part is None
+    assert len(owned.by_bar) == len(copied.by_bar)
+    assert [len(v) for v in owned.voices_by_part] == \
+        [len(v) for v in copied.voices_by_part]
+    assert [n.pitch.ps for n in owned.notes] == \
+        [n.pitch.ps for n in copied.notes]
@@ -0,0 +1,32 @@
+import os
+from .score import ScoreObject
+from .score_cache import ScoreCache
+
+SAMPLE = 'learning/piano/test_sample/algorithm_input_small.xml'
+
+
+def test_score_cache_hit(tmpdir):
+    cache = ScoreCache(str(tmpdir), max_size=1024 ** 2)
+
+    s1 = ScoreObject.from_file(SAMPLE, cache=cache)
+    assert len(os.listdir(str(tmpdir))) == 1
+    s2 = ScoreObject.from_file(SAMPLE, cache=cache)
+
+    assert s1.content_hash == s2.content_hash
+    assert [n.pitch.ps for n in s1.notes] == [n.pitch.ps for n in s2.notes]
+    assert [o for o, _ in s1.iter_offsets()] == \
+        [o for o, _ in s2.iter_offsets()]
+
+
+def test_score_cache_eviction(tmpdir):
+    cache = ScoreCache(str(tmpdir), max_size=1024 ** 2)
+    ScoreObject.from_file(SAMPLE, cache=cache)
+    path, = [os.path.join(str(tmpdir), i) for i in os.listdir(str(tmpdir))]
+
+    # Another key with the same content, used later
+    cache.max_size = os.path.getsize(path) + 1
+    os.utime(path, (0, 0))
+    ScoreObject.from_file(SAMPLE, 'musicxml', cache=cache)
+
+    assert not os.path.exists(path)
+    assert len(os.listdir(str(tmpdir))) == 1
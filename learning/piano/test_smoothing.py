@@ -0,0 +1,35 @@
+import numpy as np
+import scipy.special
+from .smoothing import gaussian_filter
+
+
+def reference_gaussian_filter(seq, offsets, durations, sigma, size):
+    # Sum the weight of each interval in the window of each offset
+    def cdf(x):
+        return 0.5 * (1 + scipy.special.erf(x / sigma / np.sqrt(2)))
+
+    radius = size * sigma
+    result = np.empty_like(seq)
+    for i, centre in enumerate(offsets):
+        total = 0
+        for j in range(len(seq)):
+            left = offsets[j] - centre
+            right = offsets[j] + durations[j] - centre
+            if j < i and right > -radius:
+                total += seq[j] * (cdf(right) - cdf(max(-radius, left)))
+            elif j >= i and left < radius:
+                total += seq[j] * (cdf(min(radius, right)) - cdf(left))
+        result[i] = total
+    return result
+
+
+def test_gaussian_filter():
+    rng = np.random.RandomState(0)
+    durations = rng.choice([0.0, 0.25, 0.5, 1.0, 1 / 3, 3.0, 8.0], size=300)
+    offsets = np.concatenate([[0.0], np.cumsum(durations)[:-1]])
+    seq = rng.rand(300) * 4
+
+    expected = reference_gaussian_filter(seq, offsets, durations, 2.0, 3)
+    actual = gaussian_filter(seq, offsets, durations, sigma=2.0, size=3,
+                             block_size=64)
+    assert np.allclose(actual, expected, rtol=0, atol=1e-9)
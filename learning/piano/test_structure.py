@@ -1,5 +1,9 @@
+import numpy as np
+from .contraction import IndexMapping
 from .score import ScoreObject
-from .structure import SimultaneousNotes, OnsetNotes
+from .structure import (
+    SimultaneousNotes, OnsetNotes, OnsetDurationVaryingNotes,
+    merge_structures)
 
 
 def test_simulateneous_notes():
@@ -50,3 +54,32 @@ def test_onset_notes():
         (14, 16),
         }
 
+
+
+def test_run_arrays():
+    s = ScoreObject.from_file('learning/piano/test_sample/algorithm_input_small.xml')
+
+    # Adapted from run
+    E, F = SimultaneousNotes().run_arrays(s)
+    assert E.dtype == np.int32 and F.shape == (len(E), 1)
+    assert set(map(tuple, E.tolist())) == set(dict(SimultaneousNotes().run(s)))
+
+    # Vectorised
+    E, F = OnsetDurationVaryingNotes().run_arrays(s)
+    assert E.dtype == np.int32 and F.shape == (len(E), 1)
+    for (u, v), f in zip(E.tolist(), F[:, 0]):
+        d1, d2 = sorted((s.note_table.duration[u], s.note_table.duration[v]))
+        assert d1 != d2 and f == np.log2(d2 / d1)
+
+
+def test_merge_structures():
+    a = (np.array([[2, 1], [0, 1], [1, 2]], dtype='int32'),
+         np.array([[1.], [2.], [3.]]))
+    b = (np.array([[1, 3]], dtype='int32'), np.array([[4., 5.]]))
+    E, F = merge_structures([a, b])
+    assert E.tolist() == [[0, 1], [1, 2], [1, 3]]
+    assert F.tolist() == [[2., 0., 0.], [3., 0., 0.], [0., 4., 5.]]
+
+    # No structure algorithms
+    E, F = IndexMapping([0, 1]).map_edges(*merge_structures([]))
+    assert E.shape == (0, 2) and F.shape == (0, 0)
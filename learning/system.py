@@ -9,6 +9,7 @@ from pprint import pformat, pprint
 import numpy as np
 from .piano.alignment.difference import AlignDifference
 from .piano.contraction_writing import create_contracted_score_obj
+from .piano.dataset import DEFAULT_SAMPLES
 from .piano.score import ScoreObject
 from .piano.pre_processor import PreProcessedEntry, PreProcessedList
 from .piano.post_processor import PostProcessor
@@ -55,8 +56,8 @@ class PianoReductionSystem:
             'Model': class_path,
             }
 
-    def train(self, entries):
-        entries = self._ensure_entries(entries)
+    def train(self, entries, n_jobs=1):
+        entries = self._ensure_entries(entries, n_jobs=n_jobs)
         logging.info('Reading sample scores')
 
         logging.info('Feature set:\n' +
@@ -98,11 +99,29 @@ class PianoReductionSystem:
 
     def reduce(self, entry):
         entry = self._ensure_entry(entry)
-        target = entry.input
 
         logging.info('Predicting')
 
         y_proba = self.model.predict_structured(entry.X)
+        return self._generate_score(entry, y_proba)
+
+    def reduce_many(self, entries):
+        '''
+        Reduce several entries, predicting them in one batch so that the model
+        can run inference on them in parallel. Returns a list of what reduce
+        returns for each entry.
+        '''
+        entries = [self._ensure_entry(entry) for entry in entries]
+
+        logging.info('Predicting {} scores'.format(len(entries)))
+
+        y_probas = self.model.predict_many([entry.X for entry in entries])
+        return [self._generate_score(entry, y_proba)
+                for entry, y_proba in zip(entries, y_probas)]
+
+    def _generate_score(self, entry, y_proba):
+        target = entry.input
+
         y_pred, y_proba = self.pre_processor.post_predict(y_proba)
 
         target.annotate(entry.mapping.unmap_matrix(y_pred), self.pre_processor.label_type)
@@ -247,8 +266,10 @@ class PianoReductionSystem:
             entry = self.pre_processor.process_path_pair(*entry)
         return entry
 
-    def _ensure_entries(self, entries):
+    def _ensure_entries(self, entries, n_jobs=1):
         if not isinstance(entries, PreProcessedList):
             logging.info('Loading scores')
-            entries = self.pre_processor.process(entries)
+            if entries is None:
+                entries = DEFAULT_SAMPLES
+            entries = self.pre_processor.process(entries, n_jobs=n_jobs)
         return entries
@@ -1,10 +1,11 @@
 import logging
 import os
+from collections import OrderedDict, defaultdict
 from itertools import permutations, combinations, groupby
-import msgpack
 
 from ... import config
 from .lib import MusicManager
+from .tonal_model import get_tonal_model
 
 # ===== logger setting =====
 log_file_name = "chord_flow.log"
@@ -22,6 +23,36 @@ logger.propagate = False
 
 data_path = os.path.join(config.DATA_DIR, "recognition_model")
 
+
+class ChordMatchCache:
+    """ A bounded LRU cache of chord matching results, counting hits and
+        misses
+    """
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key, compute):
+        """ Return the entry of key, calling compute() on a miss """
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            value = self._entries[key] = compute()
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return value
+
+    def log_stats(self):
+        logger.info("Chord match cache: {} hits, {} misses, {} entries".format(
+            self.hits, self.misses, len(self._entries)))
+
+
 class FlowState:
 
     all_pitch = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
@@ -42,13 +73,27 @@ class FlowState:
     def sheet_minor(self):
         return self._minor
 
-    def __init__(self):
-        cache_path = os.path.join(config.TEMP_DIR, 'chord_flow.msgpack')
-        if os.path.exists(cache_path):
-            print('Loading ChordFlow from cache')
-            with open(cache_path, 'rb') as f:
-                self.__dict__.update(msgpack.unpack(f, encoding='utf-8'))
-            return
+    def __init__(self, model=None, match_cache_size=4096):
+        """ Load the compiled tonal model (see tonal_model.py), building it
+            from the flow sheets if needed.
+
+            The chord matching results of events are kept in an LRU cache of
+            match_cache_size entries, shared by all scores analysed with this
+            flow state.
+        """
+        if model is None:
+            model = get_tonal_model()
+        self._map = model.flow_map
+        self._seven = model.seven
+        for name, sheet in model.sheets.items():
+            setattr(self, "_" + name, sheet)
+        self.build_index()
+        self.match_cache = ChordMatchCache(match_cache_size)
+
+    @classmethod
+    def from_sheets(cls):
+        """ Build the flow state from the flow sheets, with a dict map """
+        self = cls.__new__(cls)
 
         # Path
         major_path = os.path.join(data_path, "Chord Flow - Major keys.xlsx")
@@ -83,11 +128,9 @@ class FlowState:
         self.make_map(chord_list[0], "Major", self._major_index, self._majweight)
         self.make_map(chord_list[1], "Minor", self._minor_index, self._minweight)
 
-        if not os.path.exists(config.TEMP_DIR):
-            os.mkdir(config.TEMP_DIR)
-        print('Writing ChordFlow to cache')
-        with open(cache_path, 'wb') as f:
-            msgpack.pack(self.__dict__, f, use_bin_type=True)
+        self.build_index()
+        self.match_cache = ChordMatchCache()
+        return self
 
                             # map data structure: dict(index)-> dict(target index)
                             # -> list(list(pitch, Maj/Min, index roman, target roman, weight))
@@ -99,14 +142,61 @@ class FlowState:
         print("minor: ", self._minor)
         print("index: ", self._minor_index)
 
+    def build_index(self):
+        """ Index the chords of the map and the seventh chords by the set of
+            pitch names, so that matching does not try every permutation.
+
+            Each pitch name is a bit of a mask. Names are kept spelled (e.g.
+            C# and D- are different bits), since the keys of the map are.
+        """
+        self._name_bits = {}
+        # Masks of the keys in the map
+        self._map_masks = set()
+        # mask -> keys in the map whose first flow is not an inversion
+        self._root_positions_by_mask = defaultdict(list)
+        # mask -> keys in self._seven
+        self._seven_by_mask = defaultdict(list)
+
+        for key in list(self._map) + list(self._seven):
+            for name in key.split(","):
+                self._name_bits.setdefault(name, 1 << len(self._name_bits))
+
+        for key, flows in self._map.items():
+            names = key.split(",")
+            mask = self.pitch_mask(names)
+            self._map_masks.add(mask)
+
+            first_flow = next(iter(flows.values()))
+            roman = next(iter(first_flow.values()))[0]
+            if '6' not in roman and '4' not in roman:
+                self._root_positions_by_mask[mask].append(names)
+
+        for key in self._seven:
+            names = key.split(",")
+            self._seven_by_mask[self.pitch_mask(names)].append(key)
+
+    def pitch_mask(self, input_list):
+        """ Return the mask of the pitch names, or None if there is a duplicated
+            name or a name not in the map.
+        """
+        mask = 0
+        for name in input_list:
+            bit = self._name_bits.get(name)
+            if bit is None or mask & bit:
+                return None
+            mask |= bit
+        return mask
+
+    @staticmethod
+    def permutation_order(input_list, names):
+        # Position of the permutation `names` of input_list in permutations()
+        position = {name: i for i, name in enumerate(input_list)}
+        return [position[name] for name in names]
+
     def match_chord_exact(self, input_list):
         # Found exact match chord including inversion
-        input_copy = input_list
-        for permutated_input in permutations(input_copy):
-            key = ",".join(permutated_input)
-            if key in self._map:
-                return True
-        return False
+        mask = self.pitch_mask(input_list)
+        return mask is not None and mask in self._map_masks
 
     def match_chord_subset(self, input_list):
         # Found exact match chord from the subset of input
@@ -136,18 +226,12 @@ class FlowState:
 
     def eliminate_inversion(self, input_list):
         # Change the permutation of note to roman without inversion
-        input_copy = input_list
-        output_list = []
-        for permutated_chord in permutations(input_copy):
-            key = ",".join(permutated_chord)
-            if(key in self._map):
-                index = list(self._map[key].keys())[0]
-                music_key = list(self._map[key][index].keys())[0]
-                roman = self._map[key][index][music_key][0]
-                # Check whether 6 or 4 exist in roman
-                if('6' not in roman and '4' not in roman):
-                    output_list = list(permutated_chord)
-        return output_list
+        mask = self.pitch_mask(input_list)
+        candidates = self._root_positions_by_mask.get(mask)
+        if not candidates:
+            return []
+        # The last one in the order of permutations()
+        return list(max(candidates, key=lambda names: self.permutation_order(input_list, names)))
 
     def add_seven_chord(self, input_list):
 
@@ -164,11 +248,11 @@ class FlowState:
 
     def find_seven_chord(self, input_list):
         output_list = []
-        input_copy = input_list
-        for permutated_list in permutations(input_copy):
-            key = ",".join(permutated_list)
-            if key in self._seven:
-                output_list = output_list + self._seven[key]
+        mask = self.pitch_mask(input_list)
+        keys = self._seven_by_mask.get(mask, []) if mask is not None else []
+        # In the order of permutations()
+        for key in sorted(keys, key=lambda key: self.permutation_order(input_list, key.split(","))):
+            output_list = output_list + self._seven[key]
         return output_list
 
     def remove_seven_chord(self, input_list):
@@ -185,6 +269,38 @@ class FlowState:
             return output_list
         return [input_list]
 
+    def exact_chords(self, pitch_classes):
+        """ The chords matched exactly by the pitch classes of an event: []
+            if they are not a chord, the triads of a seventh chord (see
+            remove_seven_chord), or else the pitch classes themselves.
+
+            The pitch classes are in bass-up order (see
+            EventGroup.sort_single_event_notes), which is the cache key.
+        """
+        def compute():
+            if not self.match_chord_exact(pitch_classes):
+                return []
+            if len(pitch_classes) == 4:
+                return self.remove_seven_chord(list(pitch_classes))
+            return [list(pitch_classes)]
+        result = self.match_cache.get(("exact", tuple(pitch_classes)), compute)
+        return [list(chord) for chord in result]
+
+    def partial_chords(self, pitch_classes):
+        """ The triads partially matched by the pitch classes of an event (see
+            match_chord_partial), cached like exact_chords.
+        """
+        def compute():
+            return [chord for chord in self.match_chord_partial(list(pitch_classes))
+                    if len(chord) == 3]
+        result = self.match_cache.get(("partial", tuple(pitch_classes)), compute)
+        return [list(chord) for chord in result]
+
+    def root_position_key(self, chord):
+        """ The map key of eliminate_inversion(chord), cached like exact_chords """
+        return self.match_cache.get(
+            ("root", tuple(chord)), lambda: ",".join(self.eliminate_inversion(chord)))
+
     def print_map(self):
         for key in self._map:
             print("MAP(",key,"): ", self._map[key])
@@ -302,10 +418,10 @@ class FlowState:
     def get_event_all_flow_results(self, current_event, next_event):
         output_full_list = []
         for current_chord in current_event.matched_chord:
-            current_chord_key = ",".join(self.eliminate_inversion(current_chord))
+            current_chord_key = self.root_position_key(current_chord)
             current_dict = {}
             for next_chord in next_event.matched_chord:
-                next_chord_key = ",".join(self.eliminate_inversion(next_chord))
+                next_chord_key = self.root_position_key(next_chord)
                 flow_result = self.compare_chords(current_chord_key, next_chord_key)
                 if flow_result != None:
                     for key in flow_result:
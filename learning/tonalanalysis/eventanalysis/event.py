@@ -6,6 +6,7 @@ import logging
 import os
 
 from .lib import MusicManager, Interval
+from .tonal_model import get_chord_database
 from ... import config
 
 # ===== logger setting =====
@@ -165,12 +166,13 @@ class Event:
         Return:
             None
         """
-        if Flow.match_chord_exact(chord):
+        matched_chords = Flow.exact_chords(chord)
+        if matched_chords:
 
             self._event_group.add_candidate_chord(chord, self.event_index)
             if len(chord) == 4:
                 # Also add the chord without 7
-                for chord in Flow.remove_seven_chord(chord):
+                for chord in matched_chords:
                     self._event_group.add_candidate_chord(chord, self.event_index)
                     self.add_matched_chord(chord)
                 return
@@ -203,8 +205,7 @@ class Event:
     def match_partial(self, Flow):
         if self._is_chord_match is False:
             if len(self._pitch_classes) != 1:
-                chord_partials = Flow.match_chord_partial(self._corrected_pitch_classes)
-                chord_partials_triad = [chord for chord in chord_partials if len(chord) == 3]
+                chord_partials_triad = Flow.partial_chords(self._corrected_pitch_classes)
                 self._matched_chord += chord_partials_triad
                 for chord in chord_partials_triad:
                     self._event_group.add_candidate_chord(chord , self.event_index)
@@ -597,7 +598,7 @@ class EventContainer:
 
     def __init__(self):
         self._event_groups = []
-        self._chord_data = MusicManager.get_instance().make_chord_database()
+        self._chord_data = get_chord_database()
 
     def display(self):
         """display result"""
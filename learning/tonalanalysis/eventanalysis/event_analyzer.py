@@ -1,8 +1,11 @@
+import heapq
 import math
 import music21
+import numpy as np
 import os
 from .event import *
 from .chord_flow import FlowState
+from .tonal_model import get_chord_database
 
 
 def remove_identical(list):
@@ -55,7 +58,7 @@ class EventAnalyzer:
         self._recognized = []
         self._score = score
         self._number_of_measures = len(self._score.getElementsByClass(music21.stream.Part)[0].getElementsByClass(music21.stream.Measure))
-        self._chord_data = MusicManager.get_instance().make_chord_database()
+        self._chord_data = get_chord_database()
         self._event_container = EventContainer()
         self._flow_state = flow
         self._measures_data = []
@@ -63,7 +66,8 @@ class EventAnalyzer:
 
     def set_measure_by_data(self, measure_data):
         # To improve speed on data input by setting the measure_data and number of measure
-        self._measures_data = measure_data
+        self._measures_data = [self.measure_onsets(measure_data[i])
+                               for i in range(len(measure_data))]
         self._number_of_measures = len(measure_data)
 
     def set_measure_by_score(self, scoreObj):
@@ -77,57 +81,92 @@ class EventAnalyzer:
                         measure_data[midx].append(noteObj)
         self.set_measure_by_data(measure_data)
 
+    def set_measure_by_arrays(self, bar, offset, duration, name, octave, number_of_measures=None):
+        """ Set the measure data from note arrays instead of music21 notes.
+
+        Each argument has one entry per note, in score order: the measure index
+        (from 0), the offset in the measure, the quarter length, the pitch name
+        and the octave. Offsets and durations are converted with opFrac so that
+        they compare like music21 offsets.
+        """
+        bar = np.asarray(bar)
+        if number_of_measures is None:
+            number_of_measures = int(bar.max()) + 1 if len(bar) else 0
+        measures_data = [[] for _ in range(number_of_measures)]
+        for b, o, d, n, octv in zip(bar.tolist(), np.asarray(offset).tolist(),
+                                    np.asarray(duration).tolist(), list(name),
+                                    np.asarray(octave).tolist()):
+            measures_data[b].append(
+                (music21.common.opFrac(o), n, octv, music21.common.opFrac(d)))
+        self._measures_data = measures_data
+        self._number_of_measures = number_of_measures
+
+    @staticmethod
+    def measure_onsets(measure):
+        """ (offset, name, octave, quarter length) of each note in a list of
+            music21 notes and chords
+        """
+        onsets = []
+        for note_obj in measure:
+            notes = note_obj if isinstance(note_obj, music21.chord.Chord) else [note_obj]
+            for note in notes:
+                onsets.append((note_obj.offset, note.name, note.octave, note.duration.quarterLength))
+        return onsets
+
+    def build_event_group(self, measure_number, onsets, global_index):
+        """ Build the events of a measure from its (offset, name, octave,
+        quarter length) onsets, one event per distinct offset.
+
+        Half notes also sound as a quarter note from their middle, which adds
+        an event there. The notes sounding at each offset are found by a sweep
+        over the sorted offsets, keeping the sounding notes in a heap by their
+        end, so each note is added and removed once.
+        """
+        # Notes grouped by offset, in order of appearance
+        notes_at = {}
+        for offset, name, octave, length in onsets:
+            notes_at.setdefault(offset, []).append((name, octave, length))
+            if length == 2.0:
+                notes_at.setdefault(offset + 1.0, []).append((name, octave, 1.0))
+        # Notes are numbered in order of appearance, which is the order of the
+        # notes within an event
+        starts, note_of = [], []
+        for key, notes in notes_at.items():
+            for name, octave, length in notes:
+                starts.append((key, len(note_of), length + key))
+                note_of.append((name, octave))
+        starts.sort(key=lambda t: t[0])
+        corr_group = sorted(notes_at)
+
+        event_group = EventGroup()
+        event_group.measure = measure_number
+        event_group.number_of_events = len(corr_group)
+        sounding = []
+        active = set()
+        i = 0
+        for index, corr in enumerate(corr_group):
+            while i < len(starts) and starts[i][0] <= corr:
+                heapq.heappush(sounding, (starts[i][2], starts[i][1]))
+                active.add(starts[i][1])
+                i += 1
+            while sounding and sounding[0][0] <= corr:
+                active.discard(heapq.heappop(sounding)[1])
+            single_event = [note_of[j] for j in sorted(active)]
+            bass_note = self.find_bass_note(single_event)
+            event = Event(single_event, bass_note, corr, index, global_index, event_group, self.event_container)
+            event_group.events.append(event)
+            global_index = global_index + 1
+        return event_group
+
     def analyze_oo(self, num_of_flow = 4, tolerance = -0.5):
         global_index = 0
         for i in range(1, self._number_of_measures + 1):
-            measure = []
             if not self._measures_data:
-                measure = self._score.measure(i).flat.notes
+                onsets = self.measure_onsets(self._score.measure(i).flat.notes)
             else:
-                measure = self._measures_data[i-1]
-            # build a list of offset numbers
-            dict = {}
-            corr_group = []
-            for note_obj in measure:
-                key = note_obj.offset
-                if key not in dict:
-                    dict[key] = []
-                    corr_group.append(note_obj.offset)
-                if isinstance(note_obj, music21.chord.Chord):
-                    for note in note_obj:
-                        dict[key].append((note.name, note.octave, note.duration.quarterLength))
-                        if note.duration.quarterLength == 2.0:
-                            half_key = note_obj.offset + 1.0
-                            if half_key not in dict:
-                                dict[half_key] = []
-                                corr_group.append(half_key)
-                            dict[half_key].append((note.name, note.octave, 1.0))
-                else:
-                    dict[key].append((note_obj.name, note_obj.octave, note_obj.duration.quarterLength))
-                    if note_obj.duration.quarterLength == 2.0:
-                        half_key = note_obj.offset + 1.0
-                        if half_key not in dict:
-                            dict[half_key] = []
-                            corr_group.append(half_key)
-                        dict[half_key].append((note_obj.name, note_obj.octave, 1.0))
-            event_group = EventGroup()
-            event_group.measure = i
-            event_group.number_of_events = len(corr_group)
-            corr_group.sort()
-            # extract notes from measures to build a list of events sorted by offset
-            for corr in corr_group:
-                single_event = []
-                for key in dict:
-                    if key > corr:
-                        continue
-                    for note in dict[key]:
-                        if(note[2]+key > corr):
-                            single_event.append((note[0],note[1]))
-                bass_note = self.find_bass_note(single_event)
-                # append the single event without any duplicated notes
-                event = Event(single_event, bass_note, corr, corr_group.index(corr), global_index, event_group,self.event_container)
-                event_group.events.append(event)
-                global_index = global_index + 1
+                onsets = self._measures_data[i-1]
+            event_group = self.build_event_group(i, onsets, global_index)
+            global_index = global_index + len(event_group.events)
             self.event_container.event_groups.append(event_group)
 
         for event_group in self.event_container.event_groups:
@@ -149,6 +188,7 @@ class EventAnalyzer:
 
         self._modulations = self._flow_state.get_modulations(self, num_of_flow, tolerance)
         self.fix_modulation_format()
+        self._flow_state.match_cache.log_stats()
 
     def get_all_modulations(self):
         return self._modulations
@@ -0,0 +1,282 @@
+"""
+A compiled, memory-mapped form of the chord flow model used by FlowState.
+
+The flow map, the seventh chords, the flow sheets and the chord database are
+built once from the sheets in data/recognition_model and written to a single
+file (config.TONAL_MODEL_PATH). Loading it only parses a small JSON header;
+the flow map stays in NumPy arrays backed by the memory-mapped file, so
+processes using the model share its pages.
+
+Build it explicitly with
+
+    python -m learning.tonalanalysis.eventanalysis.tonal_model
+
+or let get_tonal_model() build it on first use.
+"""
+from collections.abc import Mapping
+import hashlib
+import inspect
+import json
+import logging
+import os
+import struct
+import sys
+import tempfile
+
+import numpy as np
+
+from ... import config
+from . import lib
+
+logger = logging.getLogger("TonalModel")
+
+# Bump this when the file format or the way the model is built changes
+TONAL_MODEL_VERSION = 1
+
+MAGIC = b"TONALMDL"
+# Magic, version and header length
+PREAMBLE = struct.Struct("<8sIQ")
+ALIGNMENT = 64
+
+SHEETS = ["Chord Flow - Major keys.xlsx", "Chord Flow - Minor keys.xlsx",
+          "major_flow_weight.xlsx", "minor_flow_weight.xlsx"]
+
+
+def source_digest():
+    """ Digest of the flow sheets and of the chord tables in lib.py """
+    data_path = os.path.join(config.DATA_DIR, "recognition_model")
+    h = hashlib.sha1()
+    for name in SHEETS:
+        with open(os.path.join(data_path, name), "rb") as f:
+            h.update(f.read())
+    h.update(inspect.getsource(lib).encode("utf-8"))
+    return h.hexdigest()
+
+
+def compile_tonal_model(flow_state, path, digest=None):
+    """ Write the model of a FlowState built from the sheets (with a dict map)
+        to path.
+    """
+    keys = list(flow_state.map.keys())
+    key_ids = {key: i for i, key in enumerate(keys)}
+    music_keys, romans = {}, {}
+
+    key_ptr, target_key, pair_ptr = [0], [], [0]
+    music_key, roman, target_roman, weight, is_int = [], [], [], [], []
+    for key in keys:
+        for target, flows in flow_state.map[key].items():
+            target_key.append(key_ids[target])
+            for mkey, (r1, r2, w) in flows.items():
+                music_key.append(music_keys.setdefault(mkey, len(music_keys)))
+                roman.append(romans.setdefault(r1, len(romans)))
+                target_roman.append(romans.setdefault(r2, len(romans)))
+                weight.append(w)
+                is_int.append(isinstance(w, int))
+            pair_ptr.append(len(music_key))
+        key_ptr.append(len(target_key))
+
+    arrays = {
+        "key_ptr": np.array(key_ptr, dtype="int32"),
+        "target_key": np.array(target_key, dtype="int32"),
+        "pair_ptr": np.array(pair_ptr, dtype="int32"),
+        "music_key": np.array(music_key, dtype="int16"),
+        "roman": np.array(roman, dtype="int16"),
+        "target_roman": np.array(target_roman, dtype="int16"),
+        "weight": np.array(weight, dtype="float64"),
+        "is_int": np.array(is_int, dtype="bool"),
+    }
+
+    header = {
+        "digest": digest,
+        "keys": keys,
+        "music_keys": list(music_keys),
+        "romans": list(romans),
+        "seven": flow_state._seven,
+        "sheets": {name: getattr(flow_state, "_" + name) for name in (
+            "major", "majweight", "minor", "minweight", "major_index",
+            "minor_index")},
+        "chord_database":
+            lib.MusicManager.get_instance().make_chord_database(),
+        "arrays": {},
+    }
+
+    # Lay out the arrays after the header, aligned
+    offset = 0
+    for name, a in arrays.items():
+        header["arrays"][name] = {
+            "dtype": a.dtype.str, "shape": a.shape, "offset": offset}
+        offset += -(-a.nbytes // ALIGNMENT) * ALIGNMENT
+    header_bytes = json.dumps(header).encode("utf-8")
+    header_bytes += b" " * (-(PREAMBLE.size + len(header_bytes)) % ALIGNMENT)
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # Write atomically so that concurrent readers never see partial files
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(PREAMBLE.pack(
+                MAGIC, TONAL_MODEL_VERSION, len(header_bytes)))
+            f.write(header_bytes)
+            for a in arrays.values():
+                f.write(a.tobytes())
+                f.write(b"\0" * (-a.nbytes % ALIGNMENT))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+class TonalModel:
+    """ A compiled model file opened with read_tonal_model """
+    def __init__(self, header, buffer, start):
+        self.digest = header["digest"]
+        self.keys = header["keys"]
+        self.music_keys = header["music_keys"]
+        self.romans = header["romans"]
+        self.seven = header["seven"]
+        self.sheets = header["sheets"]
+        self.chord_database = header["chord_database"]
+
+        for name, spec in header["arrays"].items():
+            begin = start + spec["offset"]
+            dtype = np.dtype(spec["dtype"])
+            size = int(np.prod(spec["shape"])) * dtype.itemsize
+            a = buffer[begin:begin + size].view(dtype).reshape(spec["shape"])
+            setattr(self, name, a)
+
+        self.flow_map = FlowMap(self)
+
+    def flows(self, pair):
+        """ The flows of a (chord, target chord) pair, as in FlowState.map """
+        begin, end = self.pair_ptr[pair], self.pair_ptr[pair + 1]
+        result = {}
+        for mkey, r1, r2, w, is_int in zip(
+                self.music_key[begin:end].tolist(),
+                self.roman[begin:end].tolist(),
+                self.target_roman[begin:end].tolist(),
+                self.weight[begin:end].tolist(),
+                self.is_int[begin:end].tolist()):
+            result[self.music_keys[mkey]] = [
+                self.romans[r1], self.romans[r2], int(w) if is_int else w]
+        return result
+
+
+class FlowMap(Mapping):
+    """ A read-only view of the flow map of a TonalModel:
+        chord -> target chord -> music key -> [roman, target roman, weight]
+    """
+    def __init__(self, model):
+        self._model = model
+        self._ids = {key: i for i, key in enumerate(model.keys)}
+        self._targets = {}
+
+    def __getitem__(self, key):
+        targets = self._targets.get(key)
+        if targets is None:
+            targets = self._targets[key] = FlowTargets(
+                self._model, self._ids[key])
+        return targets
+
+    def __contains__(self, key):
+        return key in self._ids
+
+    def __iter__(self):
+        return iter(self._model.keys)
+
+    def __len__(self):
+        return len(self._model.keys)
+
+
+class FlowTargets(Mapping):
+    """ The target chords of a chord in a FlowMap """
+    def __init__(self, model, key_id):
+        self._model = model
+        self._begin = int(model.key_ptr[key_id])
+        self._end = int(model.key_ptr[key_id + 1])
+        self._pairs = None
+
+    @property
+    def pairs(self):
+        # target chord -> index of the (chord, target chord) pair
+        if self._pairs is None:
+            keys = self._model.keys
+            target_key = self._model.target_key[self._begin:self._end]
+            self._pairs = {keys[t]: self._begin + i
+                           for i, t in enumerate(target_key.tolist())}
+        return self._pairs
+
+    def __getitem__(self, target):
+        return self._model.flows(self.pairs[target])
+
+    def __contains__(self, target):
+        return target in self.pairs
+
+    def __iter__(self):
+        keys = self._model.keys
+        for t in self._model.target_key[self._begin:self._end].tolist():
+            yield keys[t]
+
+    def __len__(self):
+        return self._end - self._begin
+
+    # Iterate in pair order without building the lookup dict
+    def values(self):
+        for pair in range(self._begin, self._end):
+            yield self._model.flows(pair)
+
+    def items(self):
+        return zip(self, self.values())
+
+
+def read_tonal_model(path):
+    """ Open a compiled model. Returns None if the file does not exist or has
+        another version.
+    """
+    try:
+        with open(path, "rb") as f:
+            magic, version, header_size = PREAMBLE.unpack(
+                f.read(PREAMBLE.size))
+            if magic != MAGIC or version != TONAL_MODEL_VERSION:
+                return None
+            header = json.loads(f.read(header_size).decode("utf-8"))
+    except (FileNotFoundError, struct.error):
+        return None
+
+    buffer = np.memmap(path, dtype="uint8", mode="r")
+    return TonalModel(header, buffer, PREAMBLE.size + header_size)
+
+
+def build_tonal_model(path=None):
+    """ Build the model from the flow sheets and compile it to path """
+    from .chord_flow import FlowState
+
+    path = path or config.TONAL_MODEL_PATH
+    logger.info("Building tonal model {}".format(path))
+    compile_tonal_model(FlowState.from_sheets(), path, source_digest())
+
+
+_default_model = None
+
+
+def get_tonal_model():
+    """ Returns the model at config.TONAL_MODEL_PATH, (re)building it if it
+        is missing or out of date. The model is loaded once per process.
+    """
+    global _default_model
+    if _default_model is None:
+        model = read_tonal_model(config.TONAL_MODEL_PATH)
+        if model is None or model.digest != source_digest():
+            build_tonal_model()
+            model = read_tonal_model(config.TONAL_MODEL_PATH)
+        _default_model = model
+    return _default_model
+
+
+def get_chord_database():
+    return get_tonal_model().chord_database
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    build_tonal_model(sys.argv[1] if len(sys.argv) > 1 else None)
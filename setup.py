@@ -9,7 +9,13 @@ setup(
     ext_modules=[
         Extension('learning.piano.onset_chain_ext',
                   ['learning/piano/onset_chain_ext.pyx'],
-                  include_dirs=[np.get_include()])
+                  include_dirs=[np.get_include()]),
+        Extension('learning.piano.algorithm.motif.alignment_ext',
+                  ['learning/piano/algorithm/motif/alignment_ext.pyx'],
+                  include_dirs=[np.get_include()]),
+        Extension('learning.models.mincut_ext',
+                  ['learning/models/mincut_ext.pyx'],
+                  include_dirs=[np.get_include()]),
         ],
     )
 